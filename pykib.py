@@ -26,17 +26,14 @@ import atexit
 from functools import partial
 from os.path import exists
 
-import pykib_base.ui
 import pykib_base.arguments
-import pykib_base.mainWindow
-import pykib_base.remotePykibWebsocketServer
 import faulthandler
 
 from remotePykib import RemotePykib
 
 #
 
-from PyQt6.QtCore import PYQT_VERSION_STR, Qt
+from PyQt6.QtCore import PYQT_VERSION_STR, Qt, QCoreApplication
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
 from PyQt6.QtGui import QGuiApplication, QIcon, QAction
 
@@ -56,6 +53,9 @@ class Pykib():
         #register at Exit Function
         atexit.register(self.exitCleanup)
 
+        # QtWebEngine is imported after the QApplication is created, so the remote browser daemon can start
+        # listening before loading it. This requires shared OpenGL contexts.
+        QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
         self.app = QApplication(sys.argv)
 
         #faulthandler.enable()
@@ -291,7 +291,9 @@ class Pykib():
             logging.error("When Autologin is enabled at least autoLogonUser and autoLogonPassword has to be set also")
             sys.exit()      
 
-        self.view = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, tray)
+        # Imported here, so pykib_base stays the module global in this method
+        from pykib_base.mainWindow import MainWindow
+        self.view = MainWindow(self.args, self.dirname, None, tray)
 
         # ----------------------------------------------------------
         # Show Tray If configured and Add Menu
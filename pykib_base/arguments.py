@@ -26,7 +26,7 @@ import sys
 __version_info__ = ('devel', '4.0.18')
 __version__ = '-'.join(__version_info__)
 
-__remote_daemon_protocol_version__ = '1.2.0.0'
+__remote_daemon_protocol_version__ = '1.11.0.0'
 
 def getArguments(dirname):
     parser = ArgumentParser(
@@ -167,6 +167,19 @@ def getArguments(dirname):
                         help="Shows a Tab Bar")
     parser.add_argument("-amt", "--allowManageTabs", dest="allowManageTabs", action='store_true', default=False,
                         help="Allows to close tabs and open new windows in a new Tab by clicking on the plus-symbol or hitting CTRL+T. If set, enableTabs will be set to True also")
+    parser.add_argument("-tfa", "--tabFreezeAfter", dest="tabFreezeAfter", type=int, default=0,
+                        help="Time in seconds after which a background tab is frozen, its JavaScript and timers are stopped until "
+                             "it is selected again. Only used with enableTabs. 0 disables freezing - Default 0")
+    parser.add_argument("-tda", "--tabDiscardAfter", dest="tabDiscardAfter", type=int, default=0,
+                        help="Time in minutes after which a background tab is discarded to release its memory. The tab is "
+                             "reloaded at its last scroll position when it is selected again. Only used with enableTabs. "
+                             "0 disables discarding - Default 0")
+    parser.add_argument("-tmb", "--tabMemoryBudget", dest="tabMemoryBudget", type=int, default=0,
+                        help="Memory in MB the browser including its renderer processes should use at most. Above it background "
+                             "tabs are discarded, least recently used first. Only used with enableTabs. 0 disables it - Default 0")
+    parser.add_argument("-mlt", "--maxLiveTabs", dest="maxLiveTabs", type=int, default=0,
+                        help="Maximum number of tabs which are not discarded. Above it background tabs are discarded, least "
+                             "recently used first. Only used with enableTabs. 0 disables the limit - Default 0")
     parser.add_argument("-b", "--bookmarks", dest="bookmarks", nargs="+",
                         help="Define Bookmarks which should be shown in the Bookmark Bar. Format: #name#|#url# ")
 
@@ -244,6 +257,9 @@ def getArguments(dirname):
                         help="start a remote browser daemon")
     parser.add_argument("-rbmi", "--remoteBrowserMoveInterval", dest="remoteBrowserMoveInterval", type=int, default=50,
                         help="Define Interval in ms in which movement requests are send when moving the remote browser window - Default 50ms")
+    parser.add_argument("-rbme", "--remoteBrowserMoveExtrapolation", dest="remoteBrowserMoveExtrapolation", type=int, default=100,
+                        help="Maximum time in ms a dragged remote browser window is moved ahead of the last received position "
+                             "to hide the move interval. 0 disables the extrapolation - Default 100ms")
     parser.add_argument("-rbmpmi", "--remoteBrowserPixmapMonitorInterval", dest="remoteBrowserPixmapMonitorInterval", type=int, default=500,
                         help="This option allows you to define the interval at which the optionally installed "
                              "server-side connector app monitors the viewport of the server-side browser for "
@@ -258,6 +274,47 @@ def getArguments(dirname):
     parser.add_argument("-rbix11", "--remoteBrowserIgnoreX11", dest="remoteBrowserIgnoreX11", action='store_true',
                         help="With this Option X11BypassWindowManagerHint will be used to force the browser to top. Usually not needed")
 
+    parser.add_argument("-rbwps", "--remoteBrowserWindowPoolSize", dest="remoteBrowserWindowPoolSize", type=int, default=2,
+                        help="Number of hidden browser windows the remote browser daemon keeps prepared for new remote tabs. "
+                             "Closed remote tabs are returned to this pool instead of being destroyed. 0 disables the pool - Default 2")
+    parser.add_argument("-rbpt", "--remoteBrowserPreloadTimeout", dest="remoteBrowserPreloadTimeout", type=int, default=10,
+                        help="Time in seconds a url preloaded with the preloadTab action is kept in a hidden window for a "
+                             "following setTab. 0 disables preloading - Default 10")
+    parser.add_argument("-rbkc", "--remoteBrowserKeepComposited", dest="remoteBrowserKeepComposited", type=int, default=0,
+                        help="Number of recently hidden remote tabs which are moved off the screens instead of being hidden, so "
+                             "their pages keep rendering and are shown again without delay. 0 hides all tabs - Default 0")
+    parser.add_argument("-rbhfa", "--remoteBrowserHibernateFreezeAfter", dest="remoteBrowserHibernateFreezeAfter", type=int, default=0,
+                        help="Time in seconds after which a hidden remote tab is frozen. 0 disables freezing - Default 0")
+    parser.add_argument("-rbhda", "--remoteBrowserHibernateDiscardAfter", dest="remoteBrowserHibernateDiscardAfter", type=int, default=0,
+                        help="Time in seconds after which a hidden remote tab is discarded to release its memory. The tab is "
+                             "reloaded at its last scroll position when it is shown again. 0 disables discarding - Default 0")
+    parser.add_argument("-rbmb", "--remoteBrowserMemoryBudget", dest="remoteBrowserMemoryBudget", type=int, default=0,
+                        help="Memory in MB the remote browser daemon and its renderers may use. When exceeded, the least recently "
+                             "used hidden remote tabs are discarded. 0 disables the budget - Default 0")
+    parser.add_argument("-rbsi", "--remoteBrowserStatsInterval", dest="remoteBrowserStatsInterval", type=int, default=300,
+                        help="Interval in seconds in which the latency and throughput stats of the remote browser daemon "
+                             "are written to the log with level INFO. 0 disables it - Default 300")
+    parser.add_argument("-rblrl", "--remoteBrowserLogRateLimit", dest="remoteBrowserLogRateLimit", type=int, default=10,
+                        help="Maximum number of log entries per second for each of the frequent remote browser actions like "
+                             "moveTab, keepAlive and setPixmap. 0 disables the limit - Default 10")
+    parser.add_argument("-rblrb", "--remoteBrowserLogRingBuffer", dest="remoteBrowserLogRingBuffer", type=int, default=0,
+                        help="Number of log entries of all levels the remote browser daemon keeps in memory. Clients can "
+                             "read them with the getLog action. 0 disables the buffer - Default 0")
+    parser.add_argument("-rbsrg", "--remoteBrowserSessionResumeGrace", dest="remoteBrowserSessionResumeGrace", type=int, default=30,
+                        help="Time in seconds the remote browser tabs are kept hidden when the connection to the client is lost. "
+                             "A reconnecting client can resume them within this time. 0 closes them immediately - Default 30")
+    parser.add_argument("-rbw", "--remoteBrowserWorkers", dest="remoteBrowserWorkers", type=int, default=0,
+                        help="Number of worker processes the remote browser windows are distributed across. The daemon "
+                             "keeps the client connection and forwards the actions of each window to its worker. "
+                             "0 opens all windows in the daemon process - Default 0")
+    parser.add_argument("-rbsf", "--remoteBrowserStateFile", dest="remoteBrowserStateFile", default="",
+                        help="File the remote browser daemon keeps its tabs, urls and geometries in. After a restart the tabs are "
+                             "restored hidden and loaded when they are shown again, reconnecting clients can resume them within "
+                             "the session resume grace period. Not supported with remoteBrowserWorkers. Empty disables the snapshot - Default empty")
+    parser.add_argument("-rbiel", "--remoteBrowserIntegratedEventLoop", dest="remoteBrowserIntegratedEventLoop", action='store_true',
+                        help="Run the socket server of the remote browser daemon on the Qt event loop instead of its own thread, "
+                             "the actions are applied without passing them between threads. Requires qasync")
+
     # Settings only for Running Remote Browser Daemon in Unix Socket Mode
     parser.add_argument("-rbsp", "--remoteBrowserSocketPath", dest="remoteBrowserSocketPath", help="When this option is set, the remote browser Deamon will only listen "
                                                                                                    "to commands send to this socket. Any other communication options will be disabled")
@@ -38,6 +38,8 @@ from pykib_base.memoryCap import MemoryCap
 from pykib_base.memoryDebug import MemoryDebug
 from pykib_base.inactivityTimer import InactivityTimer
 from pykib_base.oAuthFileHandler import OAuthFileHandler
+from pykib_base.tabHibernator import TabHibernator
+from pykib_base import x11FocusHandler
 
 #
 from PyQt6.QtWebEngineCore import QWebEnginePage
@@ -63,6 +65,7 @@ class MainWindow(QWidget):
         self.browserProfile = browserProfile
         self.tabs = {}
         self.currentTabIndex = 0
+        self.tabHibernator = None
 
         if (self.args.remoteBrowserDaemon):
             super(MainWindow, self).__init__(parent, Qt.WindowType.Tool)
@@ -71,6 +74,11 @@ class MainWindow(QWidget):
 
         self.applyWindowHints()
 
+        if (self.args.enableTabs):
+            self.tabHibernator = TabHibernator(self, self.args.tabFreezeAfter, self.args.tabDiscardAfter * 60,
+                                               self.args.tabMemoryBudget, self.args.maxLiveTabs)
+            self.tabHibernator.start()
+
         # Setup UI
         pykib_base.ui.setupUi(self, self.args, dirname)
 
@@ -260,6 +268,9 @@ class MainWindow(QWidget):
     def enterEvent(self, event):
         # When working with a remote Daemon, the Browse need to get focussed on Enter
         if (self.args.remoteBrowserDaemon):
+            # A focus change of a previous leave is not needed any more
+            if (platform.system().lower() == "linux"):
+                x11FocusHandler.sharedHandler().cancel()
             self.activateWindow()
             logging.debug("Enter window")
 
@@ -267,7 +278,7 @@ class MainWindow(QWidget):
         if (self.args.remoteBrowserDaemon):
             # Workaround for Applications which don't grab the focus when click on them (like VMWare View)
             if (platform.system().lower() == "linux"):
-                os.system("activeWindow=$(xdotool getactivewindow) && xdotool windowfocus $activeWindow")
+                x11FocusHandler.sharedHandler().requestFocus()
             logging.debug("Leave window")
 
     def onFeaturePermissionRequested(self, url, feature):
@@ -838,9 +849,15 @@ class MainWindow(QWidget):
         for tabIndex in self.tabs:
             if(self.currentTabIndex != tabIndex):
                 logging.debug("Hiding Tab " + str(tabIndex))
+                if (self.tabHibernator and not self.tabs[tabIndex]['web'].isHidden()):
+                    # The tab was shown until now
+                    self.tabHibernator.touch(self.tabs[tabIndex]['web'])
                 self.tabs[tabIndex]['web'].hide()
 
         if (self.currentTabIndex in self.tabs):
+            if (self.tabHibernator):
+                # Frozen and discarded pages are made active again, discarded ones are reloaded
+                self.tabHibernator.restore(self.tabs[self.currentTabIndex]['web'])
             self.tabs[self.currentTabIndex]['web'].show()
             self.adjustTitle()
             self.adjustAdressbar()
@@ -887,6 +904,8 @@ class MainWindow(QWidget):
                 pass
 
             # Delete WebView and Page
+            if (self.tabHibernator):
+                self.tabHibernator.forget(self.tabs[index]['web'])
             self.tabs[index]['web'].deleteLater()
             self.tabs[index]['page'].deleteLater()
 
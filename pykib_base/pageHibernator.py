@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import os
+import time
+
+import psutil
+
+from PyQt6.QtCore import QTimer
+
+
+class PageHibernator():
+    # Base of TabHibernator and RemotePykibTabHibernator. Background tabs are frozen after freezeAfter seconds,
+    # which stops their JavaScript and timers, and discarded after discardAfter seconds, which releases their
+    # renderer. If more than memoryBudget MB are used, background tabs are discarded least recently used first.
+    # A discarded page keeps its url and is reloaded by Qt when it becomes active again, the scroll position
+    # is restored by restore().
+    # Tabs are tracked by a key, the subclasses return the tabs of their windows by backgroundTabs() and the
+    # view of a key by viewOf().
+    # The lifecycle states are taken from the pages, so QtWebEngine is not loaded before the first window.
+    checkInterval = 5000
+
+    def __init__(self, freezeAfter, discardAfter, memoryBudget):
+        self.freezeAfter = freezeAfter
+        self.discardAfter = discardAfter
+        self.memoryBudget = memoryBudget
+        # key -> time the tab was used last
+        self.lastUsed = {}
+        # key -> (url, scrollPosition) of frozen and discarded tabs
+        self.hibernatedTabs = {}
+        self.process = psutil.Process(os.getpid())
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.check)
+
+    def enabled(self):
+        return bool(self.freezeAfter or self.discardAfter or self.memoryBudget)
+
+    def settings(self):
+        return ("Freeze after " + str(self.freezeAfter) + "s, Discard after " + str(self.discardAfter) +
+                "s, Memory budget " + str(self.memoryBudget) + "MB")
+
+    def start(self):
+        if self.enabled():
+            logging.info(self.__class__.__name__ + ": " + self.settings())
+            self.timer.start(self.checkInterval)
+
+    def touch(self, key):
+        self.lastUsed[key] = time.monotonic()
+
+    def forget(self, key):
+        self.lastUsed.pop(key, None)
+        self.hibernatedTabs.pop(key, None)
+
+    def viewOf(self, key):
+        raise NotImplementedError
+
+    def backgroundTabs(self, now):
+        # Returns the keys of all tabs and (lastUsed, key) of the background tabs
+        raise NotImplementedError
+
+    def tabName(self, key):
+        return str(key)
+
+    def check(self):
+        now = time.monotonic()
+        keys, backgroundTabs = self.backgroundTabs(now)
+
+        for key in [key for key in self.lastUsed if key not in keys]:
+            self.forget(key)
+
+        # Least recently used first
+        backgroundTabs.sort(key=lambda backgroundTab: backgroundTab[0])
+        for lastUsed, key in backgroundTabs:
+            if self.discardAfter and now - lastUsed >= self.discardAfter:
+                self.discard(key)
+            elif self.freezeAfter and now - lastUsed >= self.freezeAfter:
+                self.freeze(key)
+
+        self.enforceLimits(keys, backgroundTabs)
+
+    def enforceLimits(self, keys, backgroundTabs):
+        if self.memoryBudget:
+            self.enforceMemoryBudget(keys, backgroundTabs)
+
+    def isDiscarded(self, key):
+        try:
+            page = self.viewOf(key).page()
+            return page.lifecycleState() == page.LifecycleState.Discarded
+        except (RuntimeError, AttributeError) as e:
+            logging.debug(e)
+            return True
+
+    def enforceMemoryBudget(self, keys, backgroundTabs):
+        totalUsage, rendererUsage = self.memoryUsage(keys)
+        for lastUsed, key in backgroundTabs:
+            if totalUsage <= self.memoryBudget:
+                return
+            if self.isDiscarded(key):
+                continue
+            logging.info(self.__class__.__name__ + ": Memory usage of " + str(int(totalUsage)) + "MB exceeds budget")
+            pid = self.viewOf(key).page().renderProcessPid()
+            self.discard(key)
+            # Discarding releases the renderer asynchronously, so its last usage is subtracted
+            totalUsage -= rendererUsage.pop(pid, 0)
+
+    def memoryUsage(self, keys):
+        # Usage in MB of this process and of every renderer process of the tabs
+        rendererUsage = {}
+        for key in keys:
+            try:
+                pid = self.viewOf(key).page().renderProcessPid()
+                if pid and pid not in rendererUsage:
+                    rendererUsage[pid] = psutil.Process(pid).memory_info().rss / 1024 / 1024
+            except (RuntimeError, AttributeError, psutil.Error) as e:
+                logging.debug(e)
+        totalUsage = self.process.memory_info().rss / 1024 / 1024 + sum(rendererUsage.values())
+        return totalUsage, rendererUsage
+
+    def freeze(self, key):
+        self.setLifecycleState(key, 'Frozen')
+
+    def discard(self, key):
+        self.setLifecycleState(key, 'Discarded')
+
+    def setLifecycleState(self, key, stateName):
+        try:
+            view = self.viewOf(key)
+            page = view.page()
+            state = getattr(page.LifecycleState, stateName)
+            if page.lifecycleState() == state or page.lifecycleState() == page.LifecycleState.Discarded:
+                return
+            if key not in self.hibernatedTabs:
+                self.hibernatedTabs[key] = (view.url(), page.scrollPosition())
+            logging.debug(self.__class__.__name__ + ": Tab " + self.tabName(key) + " -> " + state.name)
+            page.setLifecycleState(state)
+        except (RuntimeError, AttributeError) as e:
+            logging.debug(e)
+
+    def wake(self, key):
+        # Makes the page of a tab active again and returns its hibernation state or None
+        self.touch(key)
+        hibernatedTab = self.hibernatedTabs.pop(key, None)
+        if hibernatedTab is None:
+            return None
+        page = self.viewOf(key).page()
+        if page.lifecycleState() != page.LifecycleState.Active:
+            page.setLifecycleState(page.LifecycleState.Active)
+        return hibernatedTab
+
+    def restore(self, key):
+        # Called when the tab is shown again, a discarded page is reloaded at its last scroll position
+        try:
+            view = self.viewOf(key)
+            discarded = view.page().lifecycleState() == view.page().LifecycleState.Discarded
+            hibernatedTab = self.wake(key)
+        except (RuntimeError, AttributeError) as e:
+            logging.debug(e)
+            return
+        if hibernatedTab is None or not discarded:
+            return
+
+        url, scrollPosition = hibernatedTab
+        logging.debug(self.__class__.__name__ + ": Restoring discarded Tab " + self.tabName(key))
+        if view.url().isEmpty():
+            view.load(url)
+
+        def restoreScrollPosition(ok):
+            view.loadFinished.disconnect(restoreScrollPosition)
+            if ok:
+                view.page().runJavaScript("window.scrollTo(" + str(scrollPosition.x()) + ", " + str(scrollPosition.y()) + ");")
+        view.loadFinished.connect(restoreScrollPosition)
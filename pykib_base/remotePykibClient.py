@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# asyncio client of the remote browser daemon protocol (see remotePykibProtocol) for connectors and tests.
+#
+#   async with RemotePykibClient.unixSocket("/tmp/pykib.sock") as client:
+#       await client.setTab(1, 1, "https://example.com")
+#       await client.moveTab(1, 1, [0, 0, 800, 600])
+#
+# All actions of a client share one connection. Every message carries a requestId, so actions of several
+# coroutines are pipelined and each one waits only for its own reply. A lost connection is opened again by
+# the next action, which registers again and resumes the session, so the tabs of the client are kept.
+# On the unix socket heartbeats are sent at the keep alive interval of the daemon.
+# moveTab only keeps the latest geometry of a tab, the pending moves are sent at most once per move interval
+# of the daemon and before any other action, so they never overtake an action sent after them.
+
+import asyncio
+import base64
+import json
+import logging
+
+from pykib_base import remotePykibProtocol
+
+
+class RemotePykibClientError(Exception):
+    # The daemon answered with an error
+    def __init__(self, reply):
+        super(RemotePykibClientError, self).__init__(reply.get("Error", "ErrorCode " + str(reply.get("ErrorCode"))))
+        self.reply = reply
+
+
+class UnixSocketTransport():
+    maxMessageSize = 16 * 1024 * 1024
+    supportsHeartbeat = True
+
+    def __init__(self, path):
+        self.path = path
+        self.binary = False
+        self.writer = None
+
+    async def open(self):
+        self.binary = False
+        self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=self.maxMessageSize)
+
+    async def send(self, data):
+        if self.binary:
+            self.writer.write(remotePykibProtocol.encodeFrame(data))
+        else:
+            self.writer.write(json.dumps(data).encode() + b'\r\n')
+        await self.writer.drain()
+
+    async def sendHeartbeat(self):
+        # An empty frame or line refreshes the keep alive deadline and is not answered
+        self.writer.write(remotePykibProtocol.FRAME_HEADER.pack(0) if self.binary else b'\r\n')
+        await self.writer.drain()
+
+    async def receive(self):
+        if self.binary:
+            reply = remotePykibProtocol.decodeReply(await remotePykibProtocol.readFrame(self.reader, self.maxMessageSize))
+        else:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("Connection closed by the daemon")
+            reply = json.loads(line)
+        # The unix socket answers with a list containing the reply
+        return reply[0] if isinstance(reply, list) and reply else reply
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+
+class WebsocketTransport():
+    maxMessageSize = 16 * 1024 * 1024
+    # The websocket server has no keep alive watchdog
+    supportsHeartbeat = False
+
+    def __init__(self, port, sessionToken=None, host="127.0.0.1"):
+        self.url = "ws://" + host + ":" + str(port)
+        self.sessionToken = sessionToken
+        self.binary = False
+        self.websocket = None
+
+    async def open(self):
+        import websockets
+        self.binary = False
+        self.websocket = await websockets.connect(self.url, max_size=self.maxMessageSize)
+
+    async def send(self, data):
+        if self.sessionToken:
+            data = dict(data, sessionToken=self.sessionToken)
+        if self.binary:
+            await self.websocket.send(remotePykibProtocol.encodePayload(data))
+        else:
+            await self.websocket.send(json.dumps(data))
+
+    async def receive(self):
+        message = await self.websocket.recv()
+        if isinstance(message, bytes):
+            return remotePykibProtocol.decodeReply(message)
+        return json.loads(message)
+
+    async def close(self):
+        if self.websocket:
+            await self.websocket.close()
+            self.websocket = None
+
+
+class RemotePykibClient():
+    replyTimeout = 10
+
+    def __init__(self, transport, protocolMode=remotePykibProtocol.PROTOCOL_MODE_BINARY, keepAliveInterval=None,
+                 sessionId=None):
+        # keepAliveInterval in ms, None asks the daemon for its interval, 0 disables the heartbeats.
+        # A sessionId of a previous connection, e.g. of a daemon restored from its state file, is resumed on connect.
+        self.transport = transport
+        if protocolMode not in remotePykibProtocol.supportedProtocolModes():
+            protocolMode = remotePykibProtocol.PROTOCOL_MODE_JSON
+        self.protocolMode = protocolMode
+        self.keepAliveInterval = keepAliveInterval
+        self.sessionId = sessionId
+        self.config = None
+        self.resumedTabs = None
+        self.connected = False
+        self.connectLock = asyncio.Lock()
+        self.nextRequestId = 0
+        # requestId -> future of the reply
+        self.pending = {}
+        # (windowId, tabId) -> moveTab message
+        self.pendingMoves = {}
+        self.moveInterval = 0
+        self.lastMovesSentAt = 0
+        self.moveSender = None
+        self.receiver = None
+        self.heartbeat = None
+
+    @classmethod
+    def unixSocket(cls, path, **kwargs):
+        return cls(UnixSocketTransport(path), **kwargs)
+
+    @classmethod
+    def websocket(cls, port, sessionToken=None, host="127.0.0.1", **kwargs):
+        return cls(WebsocketTransport(port, sessionToken, host), **kwargs)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, excType, exc, traceback):
+        await self.close()
+
+    async def connect(self):
+        # Opens the connection if it is not open, registers and resumes the session. Returns the daemon config.
+        async with self.connectLock:
+            if self.connected:
+                return self.config
+            await self.transport.open()
+            await self.transport.send({"action": "register", "protocolMode": self.protocolMode, "persistentSession": True})
+            config = await self.transport.receive()
+            if not isinstance(config, dict) or "Error" in config or "ErrorCode" in config:
+                await self.transport.close()
+                raise RemotePykibClientError(config if isinstance(config, dict) else {"Error": str(config)})
+            # Messages after the register reply use the negotiated protocol mode. The websocket server answers
+            # in the mode of each message, so the requested mode is used if the daemon supports it.
+            protocolMode = config.get("protocolMode")
+            if protocolMode is None and self.protocolMode in config.get("supportedProtocolModes", []):
+                protocolMode = self.protocolMode
+            self.transport.binary = protocolMode == remotePykibProtocol.PROTOCOL_MODE_BINARY
+            self.config = config
+            self.moveInterval = config.get("remoteBrowserMoveInterval", 0)
+            self.connected = True
+            self.receiver = asyncio.ensure_future(self.receiveReplies())
+
+            # register suspends the tabs of the previous connection, they are taken over by resuming the session
+            previousSessionId = self.sessionId
+            self.sessionId = config.get("sessionId")
+            if previousSessionId:
+                reply = await self.request("resume", sessionId=previousSessionId)
+                if reply.get("resumed"):
+                    self.sessionId = previousSessionId
+                    self.resumedTabs = reply.get("tabs", [])
+                else:
+                    self.resumedTabs = None
+                logging.info("RemotePykibClient: Resume session " + ("succeeded" if reply.get("resumed") else "failed"))
+
+            keepAliveInterval = self.keepAliveInterval
+            if keepAliveInterval is None and self.transport.supportsHeartbeat:
+                keepAliveInterval = await self.getKeepAliveInterval()
+            if keepAliveInterval and self.transport.supportsHeartbeat:
+                self.heartbeat = asyncio.ensure_future(self.sendHeartbeats(keepAliveInterval))
+            return config
+
+    async def close(self):
+        if self.connected:
+            try:
+                await self.flushMoves()
+            except (ConnectionError, OSError) as e:
+                logging.debug(e)
+        self.disconnected(ConnectionError("Client closed"))
+        await self.transport.close()
+
+    def disconnected(self, error):
+        self.connected = False
+        for task in (self.receiver, self.heartbeat, self.moveSender):
+            if task and task is not asyncio.current_task():
+                task.cancel()
+        self.receiver = self.heartbeat = self.moveSender = None
+        pending = self.pending
+        self.pending = {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def receiveReplies(self):
+        try:
+            while True:
+                reply = await self.transport.receive()
+                if not isinstance(reply, dict):
+                    continue
+                future = self.pending.pop(reply.get("requestId"), None)
+                if future and not future.done():
+                    future.set_result(reply)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.info("RemotePykibClient: Connection lost: " + str(e))
+            self.disconnected(ConnectionError("Connection to the daemon lost: " + str(e)))
+
+    async def sendHeartbeats(self, interval):
+        try:
+            while self.connected:
+                await asyncio.sleep(interval / 1000)
+                await self.transport.sendHeartbeat()
+        except (ConnectionError, OSError) as e:
+            logging.info("RemotePykibClient: Heartbeat failed: " + str(e))
+
+    async def post(self, data):
+        # Sends a message and returns the future of its reply
+        if not self.connected:
+            await self.connect()
+        self.nextRequestId += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.nextRequestId] = future
+        try:
+            await self.transport.send(dict(data, requestId=self.nextRequestId))
+        except Exception as e:
+            self.pending.pop(self.nextRequestId, None)
+            self.disconnected(ConnectionError("Connection to the daemon lost: " + str(e)))
+            raise
+        return future
+
+    async def request(self, action, **data):
+        # Sends an action and returns its reply, errors of the daemon are raised as RemotePykibClientError
+        await self.flushMoves()
+        future = await self.post(dict(data, action=action))
+        try:
+            reply = await asyncio.wait_for(future, self.replyTimeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(action + ": No reply after " + str(self.replyTimeout) + "s")
+        if "Error" in reply or "ErrorCode" in reply:
+            raise RemotePykibClientError(reply)
+        return reply
+
+    async def flushMoves(self):
+        if not self.pendingMoves:
+            return
+        moves = self.pendingMoves
+        self.pendingMoves = {}
+        self.lastMovesSentAt = asyncio.get_running_loop().time()
+        for move in moves.values():
+            future = await self.post(move)
+            future.add_done_callback(self.moveAcknowledged)
+
+    def moveAcknowledged(self, future):
+        # The unix socket suggests a move interval the daemon can keep up with
+        if not future.cancelled() and future.exception() is None:
+            self.moveInterval = future.result().get("moveInterval", self.moveInterval)
+
+    async def sendMovesLater(self):
+        delay = self.lastMovesSentAt + self.moveInterval / 1000 - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.moveSender = None
+        try:
+            await self.flushMoves()
+        except (ConnectionError, OSError) as e:
+            logging.info("RemotePykibClient: Sending moves failed: " + str(e))
+
+    # Actions
+
+    async def resume(self, sessionId):
+        return await self.request("resume", sessionId=sessionId)
+
+    async def keepAlive(self):
+        return await self.request("keepAlive")
+
+    async def tabAlive(self, tabId, windowId):
+        return await self.request("tabAlive", tabId=tabId, windowId=windowId)
+
+    async def setTab(self, tabId, windowId, url):
+        return await self.request("setTab", tabId=tabId, windowId=windowId, url=url)
+
+    async def setTabActive(self, tabId, windowId):
+        # tabId 0 hides all tabs of the window
+        return await self.request("setTabActive", tabId=tabId, windowId=windowId)
+
+    async def closeTab(self, tabId, windowId):
+        return await self.request("closeTab", tabId=tabId, windowId=windowId)
+
+    async def closeAllTabs(self, windowId):
+        return await self.request("closeAllTabs", windowId=windowId)
+
+    async def moveTab(self, tabId, windowId, geometry, zoomFactor=1):
+        # Returns without waiting for the daemon, see sendMovesLater
+        self.pendingMoves[(windowId, tabId)] = {"action": "moveTab", "tabId": tabId, "windowId": windowId,
+                                                "geometry": list(geometry), "zoomFactor": zoomFactor}
+        if self.moveSender is None:
+            self.moveSender = asyncio.ensure_future(self.sendMovesLater())
+
+    async def changeTabWindow(self, tabId, oldWindowId, newWindowId):
+        return await self.request("changeTabWindow", tabId=tabId, oldWindowId=oldWindowId, newWindowId=newWindowId)
+
+    async def setPixmap(self, tabId, pixmap):
+        # pixmap is the image data, e.g. a PNG, json mode sends it base64 encoded
+        if not self.connected:
+            await self.connect()
+        if isinstance(pixmap, bytes) and not self.transport.binary:
+            pixmap = base64.b64encode(pixmap).decode()
+        return await self.request("setPixmap", tabId=tabId, pixmap=pixmap)
+
+    async def setMaskRegions(self, tabId, rects):
+        # rects are (x, y, width, height) of the areas cut out of the window, they replace the previous ones
+        return await self.request("setMaskRegions", tabId=tabId, regions=[value for rect in rects for value in rect])
+
+    async def updateMaskRegions(self, tabId, add=(), remove=()):
+        # Adds and removes rectangles of the previous setMaskRegions
+        return await self.request("setMaskRegions", tabId=tabId, delta=True,
+                                  add=[value for rect in add for value in rect],
+                                  remove=[value for rect in remove for value in rect])
+
+    async def preloadTab(self, url, windowId=0):
+        if windowId:
+            return await self.request("preloadTab", url=url, windowId=windowId)
+        return await self.request("preloadTab", url=url)
+
+    async def batch(self, actions):
+        # actions are messages like {"action": "setTab", "tabId": 1, "windowId": 1, "url": "..."}
+        return await self.request("batch", actions=list(actions))
+
+    async def getStats(self):
+        return await self.request("getStats")
+
+    async def getLog(self):
+        return (await self.request("getLog"))["lines"]
+
+    async def getKeepAliveInterval(self):
+        return int((await self.request("getRemoteBrowserKeepAliveInterval"))["result"])
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+from collections import OrderedDict
+
+
+class RemotePykibInstanceRegistry():
+    # Keeps track of the MainWindows of the remote daemon.
+    # Tab ids are unique over all windows, so every lookup by tab id is a single dict access.
+    # The shown tabs are tracked per window, so activating a tab only hides the tabs
+    # which are actually visible.
+    # hide() unmaps the native window, Chromium then drops the compositor resources of the page and has to
+    # render it completely when it is shown again. The keepComposited tabs hidden last are moved next to the
+    # screens instead, so they stay mapped and switching back to them takes one frame. Older tabs are hidden.
+    parkingMargin = 100
+
+    def __init__(self, keepComposited=0):
+        self.keepComposited = keepComposited
+        # windowId -> {tabId: MainWindow} in the order the tabs were added
+        self.windows = {}
+        # tabId -> windowId
+        self.tabIndex = {}
+        # windowId -> tabId of the tab brought to front last
+        self.activeTabs = {}
+        # windowId -> set of tabIds which are currently shown
+        self.shownTabs = {}
+        # tabId -> (parked position, position before parking) of hidden tabs kept composited, oldest first
+        self.parkedTabs = OrderedDict()
+
+    def __contains__(self, tabId):
+        return tabId in self.tabIndex
+
+    def __len__(self):
+        return len(self.tabIndex)
+
+    def get(self, tabId, windowId=None):
+        # Returns the MainWindow of a tab or None. If windowId is given the tab has to belong to it.
+        currentWindowId = self.tabIndex.get(tabId)
+        if currentWindowId is None or (windowId is not None and windowId != currentWindowId):
+            return None
+        return self.windows[currentWindowId][tabId]
+
+    def windowOf(self, tabId):
+        return self.tabIndex.get(tabId)
+
+    def tabs(self, windowId):
+        return self.windows.get(windowId, {})
+
+    def items(self):
+        # (tabId, windowId, MainWindow) of all registered tabs
+        for windowId, tabs in self.windows.items():
+            for tabId, window in tabs.items():
+                yield tabId, windowId, window
+
+    def hasWindow(self, windowId):
+        return windowId in self.windows
+
+    def add(self, windowId, tabId, window):
+        if tabId in self.tabIndex and self.tabIndex[tabId] != windowId:
+            self.remove(tabId)
+        self.windows.setdefault(windowId, {})[tabId] = window
+        self.shownTabs.setdefault(windowId, set())
+        self.tabIndex[tabId] = windowId
+
+    def remove(self, tabId):
+        # Unregisters a tab and returns its MainWindow
+        windowId = self.tabIndex.pop(tabId, None)
+        if windowId is None:
+            return None
+        window = self.windows[windowId].pop(tabId)
+        self.shownTabs[windowId].discard(tabId)
+        self.unpark(tabId, window)
+        if self.activeTabs.get(windowId) == tabId:
+            del self.activeTabs[windowId]
+        return window
+
+    def removeWindow(self, windowId):
+        # Unregisters all tabs of a window and returns their MainWindows
+        return [self.remove(tabId) for tabId in list(self.tabs(windowId))]
+
+    def removeAll(self):
+        windows = []
+        for tabId, windowId, window in self.items():
+            self.unpark(tabId, window)
+            windows.append(window)
+        self.windows = {}
+        self.tabIndex = {}
+        self.activeTabs = {}
+        self.shownTabs = {}
+        return windows
+
+    def move(self, tabId, newWindowId):
+        oldWindowId = self.tabIndex.get(tabId)
+        if oldWindowId is None:
+            return False
+        shown = tabId in self.shownTabs[oldWindowId]
+        window = self.remove(tabId)
+        self.add(newWindowId, tabId, window)
+        if shown:
+            self.shownTabs[newWindowId].add(tabId)
+        return True
+
+    def activeTab(self, windowId):
+        return self.activeTabs.get(windowId)
+
+    def isShown(self, tabId):
+        windowId = self.tabIndex.get(tabId)
+        return windowId is not None and tabId in self.shownTabs[windowId]
+
+    def showTab(self, tabId):
+        windowId = self.tabIndex.get(tabId)
+        if windowId is None:
+            return False
+        window = self.windows[windowId][tabId]
+        parkedTab = self.parkedTabs.pop(tabId, None)
+        # A parked window moved by moveTab in the meantime already has its new position
+        if parkedTab and window.pos() == parkedTab[0]:
+            window.move(parkedTab[1])
+        if not window.isVisible():
+            window.show()
+        self.shownTabs[windowId].add(tabId)
+        return True
+
+    def hideTab(self, tabId):
+        windowId = self.tabIndex.get(tabId)
+        if windowId is None:
+            return
+        window = self.windows[windowId][tabId]
+        self.shownTabs[windowId].discard(tabId)
+        try:
+            if window.isVisible() and tabId not in self.parkedTabs:
+                if self.keepComposited:
+                    self.park(tabId, window)
+                else:
+                    window.hide()
+        except RuntimeError as e:
+            # Window was deleted, e.g. closed by the user with the context menu
+            logging.debug(e)
+
+    def park(self, tabId, window):
+        # Moves the window right of all screens, where it stays mapped but cannot be seen
+        position = window.pos()
+        desktop = window.screen().virtualGeometry()
+        window.move(desktop.right() + 1 + self.parkingMargin, desktop.top())
+        self.parkedTabs[tabId] = (window.pos(), position)
+        while len(self.parkedTabs) > self.keepComposited:
+            oldestTabId = next(iter(self.parkedTabs))
+            oldestWindow = self.get(oldestTabId)
+            logging.debug("  Hiding parked Tab: " + str(oldestTabId))
+            self.unpark(oldestTabId, oldestWindow)
+
+    def unpark(self, tabId, window):
+        # Hides a parked window at its previous position
+        parkedTab = self.parkedTabs.pop(tabId, None)
+        if parkedTab is None:
+            return
+        try:
+            window.hide()
+            if window.pos() == parkedTab[0]:
+                window.move(parkedTab[1])
+        except RuntimeError as e:
+            logging.debug(e)
+
+    def activate(self, windowId, tabId):
+        # Hides the shown tabs of the window except tabId and shows tabId if it belongs to the window
+        for shownTabId in list(self.shownTabs.get(windowId, ())):
+            if shownTabId != tabId:
+                logging.debug("  Hiding Tab: " + str(shownTabId) + " WindowID: " + str(windowId))
+                self.hideTab(shownTabId)
+        if self.get(tabId, windowId) is None:
+            self.activeTabs.pop(windowId, None)
+            return False
+        self.activeTabs[windowId] = tabId
+        return self.showTab(tabId)
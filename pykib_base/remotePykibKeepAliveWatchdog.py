@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import asyncio
+import logging
+import time
+
+
+class RemotePykibKeepAliveWatchdog():
+    # Keeps a monotonic deadline per keep alive sending connection, driven by the asyncio loop of the server.
+    # A connection which sent a keep alive has to send the next one within
+    # keepAliveInterval * keepAliveErrorLimit ms. The deadline of a closed connection keeps running until
+    # another connection sends a keep alive, so a client which disappears is still detected.
+    # Like before, the first connection is watched as soon as it is opened.
+    # All methods have to be called from the thread running the asyncio loop.
+
+    def __init__(self, keepAliveInterval, keepAliveErrorLimit, onExpired):
+        self.timeout = keepAliveInterval * keepAliveErrorLimit / 1000
+        self.onExpired = onExpired
+        self.deadlines = {}
+        self.timers = {}
+        self.heartbeatConnections = set()
+        self.closedConnections = set()
+
+    def enabled(self):
+        return self.timeout > 0
+
+    def watch(self, connection):
+        if self.enabled() and not self.deadlines:
+            self.heartbeat(connection, False)
+
+    def heartbeat(self, connection, alive=True):
+        if not self.enabled():
+            return
+        if alive:
+            # The client is alive, closed connections and connections which never sent a keep alive
+            # do not have to be watched any more
+            for watchedConnection in list(self.deadlines):
+                if watchedConnection in self.closedConnections or watchedConnection not in self.heartbeatConnections:
+                    self.forget(watchedConnection)
+            self.heartbeatConnections.add(connection)
+        self.deadlines[connection] = time.monotonic() + self.timeout
+        # The timer is only rescheduled when it fired before the refreshed deadline
+        if connection not in self.timers:
+            self.schedule(connection)
+
+    def closed(self, connection):
+        if connection in self.deadlines:
+            self.closedConnections.add(connection)
+        else:
+            self.heartbeatConnections.discard(connection)
+
+    def forget(self, connection):
+        self.deadlines.pop(connection, None)
+        self.heartbeatConnections.discard(connection)
+        self.closedConnections.discard(connection)
+        timer = self.timers.pop(connection, None)
+        if timer:
+            timer.cancel()
+
+    def schedule(self, connection):
+        loop = asyncio.get_running_loop()
+        self.timers[connection] = loop.call_at(loop.time() + self.deadlines[connection] - time.monotonic(),
+                                               self.check, connection)
+
+    def check(self, connection):
+        del self.timers[connection]
+        deadline = self.deadlines.get(connection)
+        if deadline is None:
+            return
+        if time.monotonic() < deadline:
+            self.schedule(connection)
+            return
+        logging.warning("UnixSocket: No keep alive received for " + str(self.timeout) + "s")
+        self.forget(connection)
+        self.onExpired(connection)
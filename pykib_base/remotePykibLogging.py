@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Logging of the remote browser daemon.
+#
+# The daemon logs from the GUI thread and the server threads for every protocol message. setup() moves the
+# formatting and writing of log records to a listener thread, the logging threads only put the record into
+# a queue. Records of the frequent actions (moveTab, keepAlive, setPixmap, ...) are rate limited per action,
+# messages are truncated and the records can additionally be kept in a ring buffer which clients can read
+# with the getLog action.
+#
+# Hot path log calls pass their arguments lazily and name their action:
+#   logging.debug("UnixSocket moveTab tabId=%s windowId=%s", tabId, windowId, extra={"action": "moveTab"})
+
+import atexit
+import collections
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Actions whose records are rate limited
+RATE_LIMITED_ACTIONS = ('moveTab', 'keepAlive', 'heartbeat', 'setPixmap', 'setMaskRegions', 'tabAlive', 'message',
+                        'preloadTab')
+
+LOG_FORMAT = '%(asctime)s.%(msecs)03d %(levelname).1s %(threadName)s %(module)s:%(lineno)d %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+ringBuffer = None
+
+
+class RemotePykibLogPayload():
+    # Truncates a logged payload when the record is formatted, not when it is logged
+    def __init__(self, payload, maxLength=200):
+        self.payload = payload
+        self.maxLength = maxLength
+
+    def __str__(self):
+        text = str(self.payload)
+        if len(text) > self.maxLength:
+            return text[:self.maxLength] + "...(" + str(len(text)) + " chars)"
+        return text
+
+
+class RemotePykibRateLimitFilter(logging.Filter):
+    # Lets at most ratePerSecond records per action and second pass. The first record after a
+    # suppressed period reports how many records were dropped.
+    def __init__(self, ratePerSecond):
+        super(RemotePykibRateLimitFilter, self).__init__()
+        self.ratePerSecond = ratePerSecond
+        self.lock = threading.Lock()
+        # action -> [start of the current second, passed records, suppressed records]
+        self.windows = {}
+
+    def filter(self, record):
+        action = getattr(record, 'action', None)
+        if not self.ratePerSecond or action not in RATE_LIMITED_ACTIONS:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.setdefault(action, [now, 0, 0])
+            if now - window[0] >= 1:
+                window[0] = now
+                window[1] = 0
+            if window[1] >= self.ratePerSecond:
+                window[2] += 1
+                return False
+            window[1] += 1
+            suppressed = window[2]
+            window[2] = 0
+        if suppressed:
+            record.msg = str(record.msg) + " [" + str(suppressed) + " " + action + " records suppressed]"
+        return True
+
+
+class RemotePykibQueueListener(logging.handlers.QueueListener):
+    # Truncates the messages in the listener thread, before the records are passed to the handlers
+    def __init__(self, logQueue, handlers, maxLength):
+        super(RemotePykibQueueListener, self).__init__(logQueue, *handlers, respect_handler_level=True)
+        self.maxLength = maxLength
+
+    def prepare(self, record):
+        try:
+            message = record.getMessage()
+        except Exception:
+            # Left to the handlers, they report the broken record
+            return record
+        if len(message) > self.maxLength:
+            record.msg = message[:self.maxLength] + "...(" + str(len(message)) + " chars)"
+            record.args = None
+        return record
+
+
+class RemotePykibQueueHandler(logging.handlers.QueueHandler):
+    # The records stay in this process, so they are queued unformatted and formatted by the listener thread
+    def prepare(self, record):
+        return record
+
+
+class RemotePykibRingBufferHandler(logging.Handler):
+    def __init__(self, size, formatter):
+        super(RemotePykibRingBufferHandler, self).__init__()
+        self.records = collections.deque(maxlen=size)
+        self.setFormatter(formatter)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def lines(self):
+        # Formats the buffered records when they are requested
+        lines = []
+        for record in list(self.records):
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                lines.append(str(record.msg) + " " + str(record.args))
+        return lines
+
+
+def setup(level, rateLimit, ringBufferSize, maxLength=1000):
+    # Replaces the handlers of the root logger by a queue handler. The former handlers are served by a
+    # listener thread and keep their level and formatter. The ring buffer captures the records of the
+    # configured level, the level of the root logger is not changed.
+    global ringBuffer
+    rootLogger = logging.getLogger()
+    handlers = list(rootLogger.handlers)
+    for handler in handlers:
+        rootLogger.removeHandler(handler)
+
+    if ringBufferSize:
+        ringBuffer = RemotePykibRingBufferHandler(ringBufferSize, logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+        ringBuffer.setLevel(level)
+        handlers.append(ringBuffer)
+
+    logQueue = queue.SimpleQueue()
+    queueHandler = RemotePykibQueueHandler(logQueue)
+    queueHandler.addFilter(RemotePykibRateLimitFilter(rateLimit))
+    rootLogger.addHandler(queueHandler)
+
+    listener = RemotePykibQueueListener(logQueue, handlers, maxLength)
+    listener.start()
+    # Write the queued records before the process exits
+    atexit.register(listener.stop)
+    return listener
+
+
+def ringBufferLines():
+    if ringBuffer is None:
+        return None
+    return ringBuffer.lines()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal
+
+
+class RemotePykibMoveCoalescer(QtCore.QObject):
+    # Collects moveTab requests from the socket server threads. Only the newest geometry per
+    # (windowId, tabId) is kept until the GUI thread takes all pending moves at once.
+    movesPending = pyqtSignal()
+
+    # Weight of a new sample for the smoothed apply latency
+    latencySmoothing = 0.2
+    # Upper limit for the move interval suggested to the clients in ms
+    maxMoveInterval = 1000
+
+    def __init__(self, moveInterval):
+        super(RemotePykibMoveCoalescer, self).__init__()
+        self.moveInterval = moveInterval
+        self.lock = threading.Lock()
+        self.pendingMoves = {}
+        self.applyLatency = 0.0
+        self.coalescedMoves = 0
+
+    def push(self, tabId, windowId, geometry, zoomFactor):
+        with self.lock:
+            wakeUp = not self.pendingMoves
+            if (windowId, tabId) in self.pendingMoves:
+                self.coalescedMoves += 1
+            self.pendingMoves[(windowId, tabId)] = (geometry, zoomFactor, time.monotonic())
+        # The GUI thread is only notified once until it has taken the pending moves
+        if wakeUp:
+            self.movesPending.emit()
+
+    def discardWindow(self, windowId, keepTabId=None):
+        # Drops pending moves of the tabs of a window which are going to be hidden, a pending move would
+        # show them again
+        with self.lock:
+            for key in [key for key in self.pendingMoves if key[0] == windowId and key[1] != keepTabId]:
+                del self.pendingMoves[key]
+
+    def splitBatch(self, commands):
+        # Returns the commands of a batch without its moves and the moves. The moves are pushed after the
+        # other commands were emitted, so they reach tabs configured by the same batch and are coalesced like
+        # single moveTab messages. Moves of tabs which the batch hides afterwards are dropped.
+        moves = []
+        otherCommands = []
+        for command, arguments in commands:
+            if command == 'moveInstance':
+                moves.append(arguments)
+                continue
+            if command == 'activateInstance':
+                # tabId 0 hides all tabs of the window, otherwise all tabs except the activated one
+                tabId, windowId = arguments
+                self.discardWindow(windowId, tabId)
+                moves = [move for move in moves if move[1] != windowId or move[0] == tabId]
+            otherCommands.append((command, arguments))
+        return otherCommands, moves
+
+    def takePendingMoves(self):
+        with self.lock:
+            pendingMoves = self.pendingMoves
+            self.pendingMoves = {}
+        return pendingMoves
+
+    def reportApplied(self, receivedAt):
+        latency = (time.monotonic() - receivedAt) * 1000
+        self.applyLatency += (latency - self.applyLatency) * self.latencySmoothing
+
+    def feedback(self):
+        # Measured latency between receiving and applying a move and the interval the client
+        # should use for sending moves so the GUI thread does not fall behind
+        suggestedInterval = min(max(self.moveInterval, int(self.applyLatency * 2)), self.maxMoveInterval)
+        return {
+            "applyLatency": round(self.applyLatency, 1),
+            "moveInterval": suggestedInterval
+        }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import time
+
+from PyQt6.QtCore import QTimer, Qt
+from PyQt6.QtGui import QGuiApplication
+
+
+class RemotePykibMoveScheduler():
+    # Applies the moves collected by the RemotePykibMoveCoalescer on the refresh rate of the screen.
+    # While a window is dragged, its position is extrapolated from the velocity of the last two moves,
+    # so the window keeps moving smoothly between moves which arrive only every 50-100ms. The extrapolation
+    # is limited to 1.5 times the interval between the moves and maxExtrapolation ms. When no further move
+    # arrives, the window is set to the last received geometry.
+
+    # Moves further apart start a new drag instead of being used for the velocity
+    maxSampleGap = 0.25
+    # Weight of a new sample for the smoothed interval between moves
+    intervalSmoothing = 0.3
+
+    def __init__(self, moveCoalescer, stats, applyMove, maxExtrapolation):
+        self.moveCoalescer = moveCoalescer
+        self.stats = stats
+        self.applyMove = applyMove
+        self.maxExtrapolation = maxExtrapolation / 1000
+        # (windowId, tabId) -> state of the moving window
+        self.motions = {}
+
+        screen = QGuiApplication.primaryScreen()
+        refreshRate = screen.refreshRate() if screen else 0
+        self.frameInterval = int(1000 / refreshRate) if refreshRate > 0 else 16
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def wake(self):
+        # Called when new moves are pending. The first move is applied immediately,
+        # following moves on the next frame
+        if not self.timer.isActive():
+            self.tick()
+            if self.motions:
+                self.timer.start(self.frameInterval)
+
+    def discardWindow(self, windowId, keepTabId=None):
+        # Stops moving the tabs of a window which are going to be hidden
+        for key in [key for key in self.motions if key[0] == windowId and key[1] != keepTabId]:
+            del self.motions[key]
+
+    def tick(self):
+        now = time.monotonic()
+        newSamples = set()
+        for key, (geometry, zoomFactor, receivedAt) in self.moveCoalescer.takePendingMoves().items():
+            self.addSample(key, list(geometry), zoomFactor, receivedAt)
+            newSamples.add(key)
+
+        for key, motion in list(self.motions.items()):
+            elapsed = now - motion["receivedAt"]
+            horizon = min(motion["interval"] * 1.5, self.maxExtrapolation) if motion["interval"] else 0
+            # A late move keeps the window at the end of the extrapolation instead of jumping back,
+            # if the next move is missing as well the drag ended
+            settleAfter = min(horizon + (motion["interval"] or 0), self.maxSampleGap)
+            if motion["velocity"] and elapsed < settleAfter:
+                extrapolated = min(elapsed, horizon)
+                geometry = [motion["geometry"][0] + motion["velocity"][0] * extrapolated,
+                            motion["geometry"][1] + motion["velocity"][1] * extrapolated] + motion["geometry"][2:]
+                lag = (elapsed - extrapolated) * 1000
+            elif motion["applied"] == motion["geometry"]:
+                # The window is at the last received geometry. The motion is kept for the velocity
+                # of the next move until no move can belong to the same drag any more
+                if elapsed >= self.maxSampleGap:
+                    del self.motions[key]
+                continue
+            else:
+                geometry = motion["geometry"]
+                lag = elapsed * 1000
+
+            if geometry != motion["applied"]:
+                windowId, tabId = key
+                self.applyMove(tabId, windowId, geometry, motion["zoomFactor"])
+                motion["applied"] = geometry
+                self.stats.record('moveTab', 'frameLag', lag)
+            if key in newSamples:
+                self.moveCoalescer.reportApplied(motion["receivedAt"])
+                self.stats.applied('moveTab', motion["receivedAt"])
+
+        if not self.motions:
+            self.timer.stop()
+
+    def addSample(self, key, geometry, zoomFactor, receivedAt):
+        motion = self.motions.get(key)
+        velocity = None
+        interval = None
+        if motion:
+            sampleGap = receivedAt - motion["receivedAt"]
+            interval = motion["interval"]
+            # Only moves of the same size are extrapolated, resizes are applied as received
+            if 0 < sampleGap < self.maxSampleGap and geometry[2:] == motion["geometry"][2:]:
+                velocity = ((geometry[0] - motion["geometry"][0]) / sampleGap,
+                            (geometry[1] - motion["geometry"][1]) / sampleGap)
+                if velocity == (0, 0):
+                    velocity = None
+                if interval:
+                    interval += (sampleGap - interval) * self.intervalSmoothing
+                else:
+                    interval = sampleGap
+            elif sampleGap >= self.maxSampleGap:
+                interval = None
+
+        self.motions[key] = {
+            "geometry": geometry,
+            "zoomFactor": zoomFactor,
+            "receivedAt": receivedAt,
+            "velocity": velocity if self.maxExtrapolation else None,
+            "interval": interval,
+            "applied": motion["applied"] if motion else None
+        }
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtGui import QImage
+
+
+class RemotePykibPixmapDecoder(QtCore.QThread):
+    # Decodes setPixmap payloads and extracts their masks outside of the GUI thread.
+    # Only the newest payload per tab is decoded, masks are cached by the hash of the payload.
+    maskDecoded = pyqtSignal(int, str, QImage, float)
+
+    cacheSize = 32
+
+    def __init__(self):
+        super(RemotePykibPixmapDecoder, self).__init__()
+        self.condition = threading.Condition()
+        self.pendingPixmaps = {}
+        self.maskCache = OrderedDict()
+
+    def push(self, tabId, pixmapData, receivedAt=None):
+        with self.condition:
+            self.pendingPixmaps[tabId] = (pixmapData, receivedAt or time.monotonic())
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pendingPixmaps:
+                    self.condition.wait()
+                pendingPixmaps = self.pendingPixmaps
+                self.pendingPixmaps = {}
+
+            for tabId, (pixmapData, receivedAt) in pendingPixmaps.items():
+                try:
+                    digest, mask = self.decode(pixmapData)
+                except Exception as e:
+                    logging.info(e)
+                    continue
+                self.maskDecoded.emit(tabId, digest, mask, receivedAt)
+
+    def decode(self, pixmapData):
+        if isinstance(pixmapData, str):
+            pixmapData = pixmapData.encode()
+            encoded = True
+        else:
+            encoded = False
+        digest = hashlib.blake2b(pixmapData, digest_size=16).hexdigest()
+
+        if digest in self.maskCache:
+            self.maskCache.move_to_end(digest)
+            return digest, self.maskCache[digest]
+
+        # json clients send base64 encoded images, binary clients the raw image data
+        if encoded:
+            pixmapData = base64.b64decode(pixmapData)
+        image = QImage()
+        image.loadFromData(pixmapData)
+        mask = image.createAlphaMask()
+
+        self.maskCache[digest] = mask
+        if len(self.maskCache) > self.cacheSize:
+            self.maskCache.popitem(last=False)
+        return digest, mask
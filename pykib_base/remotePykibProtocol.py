@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Wire format helpers shared by the remote daemon servers.
+#
+# Two protocol modes exist:
+#   json   - legacy mode, one JSON document per message terminated by \r\n (unix socket)
+#            or one JSON text message (websocket)
+#   binary - msgpack encoded messages. On the unix socket every message is prefixed
+#            with its length as 4 byte unsigned big endian integer, on the websocket
+#            binary messages are used.
+# A client switches to binary mode by sending "protocolMode": "binary" with its register
+# message. The register reply is still sent in json mode and contains the negotiated mode.
+#
+# setMaskRegions describes the areas covered by overlapping applications as rectangles, which
+# are cut out of the remote browser window. It replaces setPixmap for clients that know the
+# geometry of the overlapping windows.
+#
+# A websocket client which sends "persistentSession": true with its register message keeps its
+# connection for all following actions instead of reconnecting after register, setTab and setPixmap.
+#
+# On the unix socket an empty line (json) or an empty frame (binary) is a heartbeat. It refreshes the
+# keep alive deadline of the connection like keepAlive, but is not answered.
+#
+# The register reply contains a "sessionId", the tabs set over the connection belong to this session. When the
+# client is lost, the tabs of its session are hidden and kept for the session resume grace period, the tabs of
+# other clients are not affected. A reconnecting client sends {"action": "resume", "sessionId": ...} and
+# receives the tabs of the session, or "resumed": false if the grace period is over.
+# With a state file the tabs and the session id are kept over a restart of the daemon. The restored tabs
+# are hidden and loaded when they are shown again, so a client resumes them like after a lost connection.
+#
+# preloadTab announces a url the client expects to be opened soon, e.g. on link hover. The daemon loads it into
+# a hidden window and a following setTab with the same url adopts that window. An optional windowId is used
+# by a sharded daemon to preload in the worker of that window, without it the worker with the fewest windows
+# preloads the url and a new window opening it is assigned to that worker.
+#
+# getStats returns the latency histograms and counters of the daemon (see RemotePykibStats).
+# getLog returns the log entries of the ring buffer if it is enabled (see remotePykibLogging).
+#
+# In both modes a message may carry a "requestId". Its reply contains the same id, so a client
+# can send many messages without waiting and match the replies afterwards.
+#
+# remotePykibClient implements an asyncio client of this protocol for both transports.
+
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PROTOCOL_MODE_JSON = 'json'
+PROTOCOL_MODE_BINARY = 'binary'
+
+FRAME_HEADER = struct.Struct('>I')
+
+# Required fields and their allowed types for the actions validated in binary mode
+ACTION_SCHEMAS = {
+    'setTab': {'tabId': int, 'windowId': int, 'url': str},
+    'moveTab': {'tabId': int, 'windowId': int, 'geometry': (list, tuple), 'zoomFactor': (int, float)},
+    'setPixmap': {'tabId': int, 'pixmap': (str, bytes)},
+    'keepAlive': {},
+    'batch': {'actions': list},
+    'setMaskRegions': {'tabId': int},
+    'preloadTab': {'url': str},
+}
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def supportedProtocolModes():
+    if msgpack is None:
+        return [PROTOCOL_MODE_JSON]
+    return [PROTOCOL_MODE_JSON, PROTOCOL_MODE_BINARY]
+
+
+def negotiateProtocolMode(requestedMode):
+    # Returns the mode which will be used after the register reply
+    if requestedMode in supportedProtocolModes():
+        return requestedMode
+    return PROTOCOL_MODE_JSON
+
+
+def encodePayload(data):
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def decodePayload(payload):
+    try:
+        data = msgpack.unpackb(payload, raw=False)
+    except Exception as e:
+        raise ProtocolError("Unable to decode message: " + str(e))
+    validateMessage(data)
+    return data
+
+
+def decodeReply(payload):
+    # Replies are decoded by clients, they are not validated like messages
+    try:
+        return msgpack.unpackb(payload, raw=False)
+    except Exception as e:
+        raise ProtocolError("Unable to decode reply: " + str(e))
+
+
+def encodeFrame(data):
+    payload = encodePayload(data)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def readFrame(reader, maxSize):
+    # Reads one length prefixed frame from an asyncio StreamReader.
+    # Raises asyncio.IncompleteReadError when the peer closed the connection.
+    header = await reader.readexactly(FRAME_HEADER.size)
+    length = FRAME_HEADER.unpack(header)[0]
+    if length > maxSize:
+        raise ProtocolError("Frame of " + str(length) + " bytes exceeds limit of " + str(maxSize) + " bytes")
+    return await reader.readexactly(length)
+
+
+def validateMessage(data):
+    if not isinstance(data, dict):
+        raise ProtocolError("Message is not a map")
+    action = data.get('action')
+    if not isinstance(action, str):
+        raise ProtocolError("Action Missing")
+    schema = ACTION_SCHEMAS.get(action)
+    if schema is None:
+        return
+    for field, fieldType in schema.items():
+        if field not in data:
+            raise ProtocolError(action + ": field '" + field + "' missing")
+        # bool is a subclass of int but never a valid id
+        if isinstance(data[field], bool) or not isinstance(data[field], fieldType):
+            raise ProtocolError(action + ": field '" + field + "' has invalid type " + type(data[field]).__name__)
+    if action == 'moveTab' and (len(data['geometry']) != 4 or
+                                not all(isinstance(value, (int, float)) for value in data['geometry'])):
+        raise ProtocolError("moveTab: geometry has to contain 4 numbers")
+
+
+def attachRequestId(reply, requestId):
+    # Adds the request id of a pipelined message to its reply
+    if isinstance(reply, list) and reply and isinstance(reply[0], dict):
+        return [dict(reply[0], requestId=requestId)] + reply[1:]
+    if isinstance(reply, dict):
+        return dict(reply, requestId=requestId)
+    return {"requestId": requestId, "result": reply}
+
+
+def batchCommands(actions, protocolMode=PROTOCOL_MODE_BINARY):
+    # Translates the actions of a batch into RemotePykib method calls, so the whole batch
+    # can be applied in one pass on the GUI thread. Like single messages, the actions are only
+    # validated against ACTION_SCHEMAS in binary mode, json clients may send ids as strings.
+    if not isinstance(actions, list):
+        raise ProtocolError("batch: field 'actions' has to be a list")
+    commands = []
+    for data in actions:
+        if protocolMode == PROTOCOL_MODE_BINARY:
+            validateMessage(data)
+        elif not isinstance(data, dict) or not isinstance(data.get('action'), str):
+            raise ProtocolError("batch: action missing")
+        action = data['action']
+        try:
+            if action == 'setTab':
+                commands.append(('configureInstance', [int(data["tabId"]), int(data["windowId"]), data['url']]))
+            elif action == 'setTabActive':
+                commands.append(('activateInstance', [int(data["tabId"]), int(data["windowId"])]))
+            elif action == 'closeTab':
+                windowId = data["windowId"]
+                if isinstance(windowId, dict):
+                    windowId = windowId["windowId"]
+                commands.append(('closeInstance', [int(data["tabId"]), int(windowId)]))
+            elif action == 'closeAllTabs':
+                commands.append(('closeInstance', [0, int(data["windowId"])]))
+            elif action == 'moveTab':
+                if data['geometry'][1] < 0:
+                    commands.append(('activateInstance', [0, int(data["windowId"])]))
+                else:
+                    commands.append(('moveInstance', [int(data["tabId"]), int(data["windowId"]), data['geometry'],
+                                                      float(data['zoomFactor'])]))
+            elif action == 'changeTabWindow':
+                commands.append(('changeTabWindow', [int(data["tabId"]), int(data["oldWindowId"]),
+                                                     int(data['newWindowId'])]))
+            elif action == 'setPixmap':
+                commands.append(('setPixmap', [int(data["tabId"]), data['pixmap']]))
+            elif action == 'setMaskRegions':
+                commands.append(('setMaskRegions', maskRegionsArguments(data)))
+            elif action == 'preloadTab':
+                commands.append(('preloadInstance', [data['url'], int(data.get("windowId", 0))]))
+            else:
+                raise ProtocolError("batch: action '" + action + "' is not allowed in a batch")
+        except ProtocolError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise ProtocolError("batch: invalid " + action + " action: " + str(e))
+    return commands
+
+
+def parseRects(values):
+    # Rectangles are sent as flat list [x1, y1, width1, height1, x2, y2, ...]
+    if not isinstance(values, (list, tuple)) or len(values) % 4 != 0:
+        raise ProtocolError("setMaskRegions: rectangles have to be a flat list of x, y, width, height")
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise ProtocolError("setMaskRegions: rectangle values have to be integers")
+    return [tuple(values[i:i + 4]) for i in range(0, len(values), 4)]
+
+
+def maskRegionsArguments(data):
+    # Returns tabId, the rectangles to add, the rectangles to remove and if the message is a delta
+    # against the previous rectangles of the tab. Without delta "regions" replaces all rectangles.
+    if data.get('delta'):
+        return [int(data["tabId"]), parseRects(data.get('add', [])), parseRects(data.get('remove', [])), True]
+    return [int(data["tabId"]), parseRects(data.get('regions', [])), [], False]
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import os
+import tempfile
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal, QTimer
+
+from pykib_base.remotePykibWindowPool import RemotePykibWindowPool
+from pykib_base.remotePykibWorker import RemotePykibWorker
+
+
+class RemotePykibRouter(QtCore.QObject):
+    # Distributes the windows of the remote daemon across worker processes, so a heavy page only stalls the
+    # tabs of its own worker. The router keeps the socket of the connector and receives the actions from the
+    # socket server like RemotePykib, it has the same methods. Every windowId is assigned to the worker with
+    # the fewest windows when it is seen first, all actions of the window are forwarded to that worker.
+    # The router keeps the state of all tabs, so a restarted worker gets its tabs, active tabs, geometries
+    # and masks again.
+    # The socket servers push pixmaps to the router instead of the pixmap decoder, they are decoded by the worker.
+    pixmapReceived = pyqtSignal(int, object)
+
+    def __init__(self, workerCount, dirname, arguments, moveCoalescer, stats, session):
+        super(RemotePykibRouter, self).__init__()
+        self.moveCoalescer = moveCoalescer
+        self.stats = stats
+        self.session = session
+        # tabId -> {"windowId", "url"}
+        self.tabs = {}
+        # windowId -> index of the worker
+        self.windowWorkers = {}
+        # windowId -> tabId
+        self.activeTabs = {}
+        # windowId -> moveTab message of the last geometry
+        self.geometries = {}
+        # tabId -> setPixmap or setMaskRegions message of the current mask
+        self.masks = {}
+        # tabId -> rectangles of the last setMaskRegions
+        self.maskRects = {}
+        # url -> index of the worker which preloads it for a window which is not known yet
+        self.preloads = {}
+
+        self.workers = []
+        for index in range(workerCount):
+            socketPath = os.path.join(tempfile.gettempdir(), "pykibWorker-" + str(os.getpid()) + "-" + str(index) + ".sock")
+            worker = RemotePykibWorker(index, dirname, arguments, socketPath)
+            worker.connected.connect(self.restoreWorker)
+            self.workers.append(worker)
+
+        self.pixmapReceived.connect(self.setPixmap)
+        self.moveCoalescer.movesPending.connect(self.forwardPendingMoves)
+
+        self.graceTimer = QTimer()
+        self.graceTimer.setSingleShot(True)
+        self.graceTimer.timeout.connect(self.expireSession)
+        self.session.suspended.connect(self.suspendSession)
+        self.session.resumed.connect(self.scheduleSessionExpiry)
+
+    def start(self):
+        logging.info("RemotePykibRouter: Starting " + str(len(self.workers)) + " workers")
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def push(self, tabId, pixmapData, receivedAt=None):
+        # Called by the socket server threads in place of RemotePykibPixmapDecoder.push
+        self.pixmapReceived.emit(tabId, pixmapData)
+
+    def leastLoadedWorker(self):
+        # Index of the worker with the fewest windows
+        windowCounts = [0] * len(self.workers)
+        for index in self.windowWorkers.values():
+            windowCounts[index] += 1
+        return windowCounts.index(min(windowCounts))
+
+    def workerOf(self, windowId):
+        if windowId not in self.windowWorkers:
+            self.windowWorkers[windowId] = self.leastLoadedWorker()
+            logging.info("RemotePykibRouter: Window " + str(windowId) + " -> Worker " + str(self.windowWorkers[windowId]))
+        return self.workers[self.windowWorkers[windowId]]
+
+    def send(self, windowId, data):
+        self.workerOf(windowId).send(data)
+
+    def forgetWindow(self, windowId):
+        if not any(tab["windowId"] == windowId for tab in self.tabs.values()):
+            self.windowWorkers.pop(windowId, None)
+            self.activeTabs.pop(windowId, None)
+            self.geometries.pop(windowId, None)
+
+    def configureInstance(self, tabId, windowId, url):
+        # A new window opened with a preloaded url is assigned to the worker of the preload
+        preloadWorker = self.preloads.pop(url, None)
+        if preloadWorker is not None and windowId not in self.windowWorkers:
+            self.windowWorkers[windowId] = preloadWorker
+        # Tab ids are unique, a known tab reported for another window was moved there
+        if tabId in self.tabs and self.tabs[tabId]["windowId"] != windowId:
+            self.changeTabWindow(tabId, self.tabs[tabId]["windowId"], windowId)
+        self.tabs[tabId] = {"windowId": windowId, "url": url}
+        self.activeTabs[windowId] = tabId
+        self.send(windowId, {"action": "setTab", "tabId": tabId, "windowId": windowId, "url": url})
+        self.session.reclaim(tabId)
+        self.updateSessionTabs()
+
+    def closeInstance(self, tabId, windowId):
+        if tabId == 0:
+            windowIds = list(self.windowWorkers) if windowId == 0 else [windowId] if windowId in self.windowWorkers else []
+            for closedWindowId in windowIds:
+                self.send(closedWindowId, {"action": "closeAllTabs", "windowId": closedWindowId})
+            closedTabs = [closedTabId for closedTabId, tab in self.tabs.items() if tab["windowId"] in windowIds]
+        elif tabId in self.tabs and self.tabs[tabId]["windowId"] == windowId:
+            self.send(windowId, {"action": "closeTab", "tabId": tabId, "windowId": windowId})
+            closedTabs = [tabId]
+        else:
+            return
+        for closedTabId in closedTabs:
+            closedWindowId = self.tabs.pop(closedTabId)["windowId"]
+            self.masks.pop(closedTabId, None)
+            self.maskRects.pop(closedTabId, None)
+            if self.activeTabs.get(closedWindowId) == closedTabId:
+                self.activeTabs.pop(closedWindowId)
+            self.forgetWindow(closedWindowId)
+        if windowId == 0 and tabId == 0:
+            self.windowWorkers.clear()
+        self.updateSessionTabs()
+
+    def activateInstance(self, tabId, windowId):
+        if windowId not in self.windowWorkers:
+            return
+        # Pending moves of the tabs which are hidden now would show them again
+        self.moveCoalescer.discardWindow(windowId, tabId)
+        if tabId in self.tabs and self.tabs[tabId]["windowId"] == windowId:
+            self.activeTabs[windowId] = tabId
+        else:
+            # tabId 0 hides all tabs of the window
+            self.activeTabs.pop(windowId, None)
+            self.geometries.pop(windowId, None)
+        self.send(windowId, {"action": "setTabActive", "tabId": tabId, "windowId": windowId})
+
+    def moveInstance(self, tabId, windowId, geometry, zoomFactor=1):
+        if windowId not in self.windowWorkers:
+            return
+        move = {"action": "moveTab", "tabId": tabId, "windowId": windowId, "geometry": list(geometry),
+                "zoomFactor": zoomFactor}
+        self.geometries[windowId] = move
+        self.send(windowId, move)
+
+    def forwardPendingMoves(self):
+        # Moves are coalesced by the router and again by a busy worker
+        for (windowId, tabId), (geometry, zoomFactor, receivedAt) in self.moveCoalescer.takePendingMoves().items():
+            self.moveInstance(tabId, windowId, geometry, zoomFactor)
+            self.moveCoalescer.reportApplied(receivedAt)
+            self.stats.applied('moveTab', receivedAt)
+
+    def preloadInstance(self, url, windowId=0):
+        # Only the worker of the window can adopt the preload. Without a window the url is preloaded by the
+        # worker with the fewest windows, a new window opening it is assigned to that worker.
+        if windowId:
+            self.send(windowId, {"action": "preloadTab", "url": url, "windowId": windowId})
+            return
+        index = self.leastLoadedWorker()
+        self.preloads.pop(url, None)
+        self.preloads[url] = index
+        # The workers drop their oldest preloads as well
+        while len(self.preloads) > RemotePykibWindowPool.maxPreloads * len(self.workers):
+            self.preloads.pop(next(iter(self.preloads)))
+        self.workers[index].send({"action": "preloadTab", "url": url})
+
+    def changeTabWindow(self, tabId, oldWindowId, newWindowId):
+        tab = self.tabs.get(tabId)
+        if tab is None or tab["windowId"] != oldWindowId:
+            return
+        oldWorker = self.workerOf(oldWindowId)
+        newWorker = self.workerOf(newWindowId)
+        tab["windowId"] = newWindowId
+        if oldWorker is newWorker:
+            oldWorker.send({"action": "changeTabWindow", "tabId": tabId, "oldWindowId": oldWindowId,
+                            "newWindowId": newWindowId})
+        else:
+            # Tabs cannot move between processes, the tab is opened again by the worker of the new window
+            logging.info("RemotePykibRouter: Tab " + str(tabId) + " moves to Worker " + str(newWorker.index) + ", reloading")
+            oldWorker.send({"action": "closeTab", "tabId": tabId, "windowId": oldWindowId})
+            newWorker.send({"action": "setTab", "tabId": tabId, "windowId": newWindowId, "url": tab["url"]})
+            if tabId in self.masks:
+                newWorker.send(self.masks[tabId])
+            if self.activeTabs.get(newWindowId) not in (None, tabId):
+                newWorker.send({"action": "setTabActive", "tabId": self.activeTabs[newWindowId], "windowId": newWindowId})
+        if self.activeTabs.get(oldWindowId) == tabId:
+            self.activeTabs.pop(oldWindowId)
+        self.forgetWindow(oldWindowId)
+        self.updateSessionTabs()
+
+    def setPixmap(self, tabId, pixmapData):
+        if tabId not in self.tabs:
+            return
+        self.masks[tabId] = {"action": "setPixmap", "tabId": tabId, "pixmap": pixmapData}
+        self.maskRects.pop(tabId, None)
+        self.send(self.tabs[tabId]["windowId"], self.masks[tabId])
+
+    def setMaskRegions(self, tabId, rects, removeRects=(), delta=False):
+        if tabId not in self.tabs:
+            return
+        # The router keeps the resulting rectangles, so a restarted worker gets them without the deltas
+        if delta:
+            maskRects = [rect for rect in self.maskRects.get(tabId, []) if rect not in removeRects] + list(rects)
+        else:
+            maskRects = list(rects)
+        self.maskRects[tabId] = maskRects
+        self.masks[tabId] = {"action": "setMaskRegions", "tabId": tabId,
+                             "regions": [value for rect in maskRects for value in rect]}
+        self.send(self.tabs[tabId]["windowId"], self.masks[tabId])
+
+    def runBatch(self, commands):
+        for command, arguments in commands:
+            try:
+                getattr(self, command)(*arguments)
+            except Exception as e:
+                logging.warning(e)
+
+    def restoreWorker(self, index):
+        # Sends the state of the windows of a new worker process
+        worker = self.workers[index]
+        windowIds = [windowId for windowId, workerIndex in self.windowWorkers.items() if workerIndex == index]
+        if windowIds:
+            logging.warning("RemotePykibRouter: Restoring " + str(len(windowIds)) + " windows on Worker " + str(index))
+        for windowId in windowIds:
+            activeTabId = self.activeTabs.get(windowId)
+            for tabId, tab in self.tabs.items():
+                if tab["windowId"] == windowId and tabId != activeTabId:
+                    worker.send({"action": "setTab", "tabId": tabId, "windowId": windowId, "url": tab["url"]})
+                    if tabId in self.masks:
+                        worker.send(self.masks[tabId])
+            if activeTabId is not None:
+                # The active tab is set last, which hides the other tabs of the window
+                worker.send({"action": "setTab", "tabId": activeTabId, "windowId": windowId,
+                             "url": self.tabs[activeTabId]["url"]})
+                if activeTabId in self.masks:
+                    worker.send(self.masks[activeTabId])
+            else:
+                worker.send({"action": "setTabActive", "tabId": 0, "windowId": windowId})
+            if windowId in self.geometries:
+                worker.send(self.geometries[windowId])
+
+    def suspendSession(self, tabIds):
+        logging.info("RemotePykibRouter: Client lost - Hiding " + str(len(tabIds)) + " Tabs for " +
+                     str(self.session.resumeGrace) + "s")
+        # Only the active tab of a window is shown
+        for tabId in tabIds:
+            if tabId in self.tabs and self.activeTabs.get(self.tabs[tabId]["windowId"]) == tabId:
+                self.activateInstance(0, self.tabs[tabId]["windowId"])
+        self.scheduleSessionExpiry()
+
+    def scheduleSessionExpiry(self):
+        expiry = self.session.nextExpiry()
+        if expiry is None:
+            self.graceTimer.stop()
+        else:
+            self.graceTimer.start(expiry)
+
+    def expireSession(self):
+        logging.info("RemotePykibRouter: Session resume grace period ended")
+        for tabId in self.session.expire():
+            if tabId in self.tabs:
+                self.closeInstance(tabId, self.tabs[tabId]["windowId"])
+        self.scheduleSessionExpiry()
+
+    def updateSessionTabs(self):
+        self.session.updateTabs([(tabId, tab["windowId"], tab["url"]) for tabId, tab in self.tabs.items()])
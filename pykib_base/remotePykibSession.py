@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import secrets
+import threading
+import time
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal
+
+
+class RemotePykibSession(QtCore.QObject):
+    # Sessions of the clients using the remote daemon.
+    # Every register starts a new session, the tabs configured over a connection belong to the session
+    # of the connection. Tabs configured over connections which did not register belong to no session.
+    # When a client is lost (keep alive expired, connection closed with error) the tabs of its session are
+    # suspended instead of closed: they are hidden and closed after a grace period. Within the grace period
+    # the client can reclaim its tabs with resume and the session id of the register reply, or single tabs by
+    # sending setTab again. Without a grace period the tabs are closed immediately like before.
+    # The tabs of other sessions are not affected. Only a single legacy client, which is the only
+    # connection of the daemon, suspends all tabs with its register or when its keep alive expires.
+    # The server threads call register, claim, suspend and resume, the GUI thread keeps the tab list up to date.
+    suspended = pyqtSignal(list)
+    resumed = pyqtSignal()
+
+    def __init__(self, resumeGrace):
+        super(RemotePykibSession, self).__init__()
+        self.resumeGrace = resumeGrace
+        self.lock = threading.Lock()
+        # Session ids which can be resumed
+        self.sessionIds = set()
+        # tabId -> {"tabId", "windowId", "url"}
+        self.tabs = {}
+        # tabId -> session id of the session the tab belongs to
+        self.owners = {}
+        # session id (None for the tabs without session) -> [suspended tabIds, time the grace period ends]
+        self.suspendedSessions = {}
+
+    def register(self):
+        # Returns the session id of a newly registered client
+        with self.lock:
+            sessionId = secrets.token_hex(16)
+            self.sessionIds.add(sessionId)
+            return sessionId
+
+    def claim(self, tabId, sessionId):
+        # Called by the server threads when a tab is configured over a connection of the session.
+        # Connections without session do not take the tab from its session.
+        with self.lock:
+            if sessionId is not None or tabId not in self.owners:
+                self.owners[tabId] = sessionId
+            for suspendedTabs, expiresAt in self.suspendedSessions.values():
+                suspendedTabs.discard(tabId)
+
+    def ownerOf(self, tabId):
+        with self.lock:
+            return self.owners.get(tabId)
+
+    def tabsOf(self, sessionId):
+        # (tabId, windowId) of the tabs of a session
+        with self.lock:
+            return [(tabId, tab["windowId"]) for tabId, tab in self.tabs.items() if self.owners.get(tabId) == sessionId]
+
+    def suspend(self, sessionId=None, allTabs=False):
+        # Suspends the tabs of a session, with allTabs the tabs of all sessions.
+        # Returns False if there is no grace period and the tabs have to be closed immediately.
+        if not self.resumeGrace:
+            return False
+        suspendedTabIds = []
+        with self.lock:
+            expiresAt = time.monotonic() + self.resumeGrace
+            for tabId in self.tabs:
+                owner = self.owners.get(tabId)
+                if not allTabs and owner != sessionId:
+                    continue
+                # A session which is suspended again keeps the end of its first grace period
+                self.suspendedSessions.setdefault(owner, [set(), expiresAt])[0].add(tabId)
+                suspendedTabIds.append(tabId)
+        self.suspended.emit(suspendedTabIds)
+        return True
+
+    def resume(self, sessionId):
+        # Returns the tabs of the session or None if the session id is unknown or expired
+        with self.lock:
+            if not sessionId or sessionId not in self.sessionIds:
+                return None
+            self.suspendedSessions.pop(sessionId, None)
+            tabs = [tab for tabId, tab in self.tabs.items() if self.owners.get(tabId) == sessionId]
+        self.resumed.emit()
+        return tabs
+
+    def nextExpiry(self):
+        # ms until the next grace period ends, None if no session is suspended
+        with self.lock:
+            if not self.suspendedSessions:
+                return None
+            expiresAt = min(expiresAt for suspendedTabs, expiresAt in self.suspendedSessions.values())
+        return max(0, int((expiresAt - time.monotonic()) * 1000))
+
+    def expire(self):
+        # Called by the GUI thread when a grace period ended. Returns the tabIds to close.
+        now = time.monotonic()
+        expiredTabs = []
+        with self.lock:
+            for sessionId, (suspendedTabs, expiresAt) in list(self.suspendedSessions.items()):
+                if expiresAt > now:
+                    continue
+                del self.suspendedSessions[sessionId]
+                # Clients which knew the suspended session must not resume the remaining tabs
+                self.sessionIds.discard(sessionId)
+                for tabId in suspendedTabs:
+                    self.owners.pop(tabId, None)
+                expiredTabs += suspendedTabs
+        return expiredTabs
+
+    def updateTabs(self, tabs):
+        # Called by the GUI thread with the current (tabId, windowId, url) of all tabs
+        with self.lock:
+            self.tabs = {tabId: {"tabId": tabId, "windowId": windowId, "url": url} for tabId, windowId, url in tabs}
+            for tabId in [tabId for tabId in self.owners if tabId not in self.tabs]:
+                del self.owners[tabId]
+            for suspendedTabs, expiresAt in self.suspendedSessions.values():
+                suspendedTabs &= set(self.tabs)
+
+    def reclaim(self, tabId):
+        # A tab configured again while its session is suspended is kept after the grace period
+        with self.lock:
+            for suspendedTabs, expiresAt in self.suspendedSessions.values():
+                suspendedTabs.discard(tabId)
+
+    def restore(self, tabs):
+        # Called by the GUI thread with the (tabId, windowId, url, sessionId) of a state snapshot, so clients
+        # of the previous daemon process can resume their tabs
+        with self.lock:
+            for tabId, windowId, url, sessionId in tabs:
+                self.tabs[tabId] = {"tabId": tabId, "windowId": windowId, "url": url}
+                self.owners[tabId] = sessionId
+                if sessionId is not None:
+                    self.sessionIds.add(sessionId)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import logging
+import os
+import threading
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import QTimer
+
+
+class RemotePykibStateSnapshot(QtCore.QThread):
+    # Keeps the session id and the tabs of the remote daemon (tabId, windowId, url, geometry, zoomFactor)
+    # in a file, so a restarted daemon knows the tabs of its clients.
+    # Changes only mark the snapshot dirty. Once per collectInterval the GUI thread collects the state with
+    # collectState, this thread writes it to a temporary file which replaces the snapshot, so the file is
+    # always complete.
+    collectInterval = 1000
+    version = 1
+
+    def __init__(self, path, collectState):
+        super(RemotePykibStateSnapshot, self).__init__()
+        self.path = path
+        self.collectState = collectState
+        self.condition = threading.Condition()
+        self.pendingState = None
+        self.dirty = False
+        self.lastWrittenState = None
+
+        self.collectTimer = QTimer()
+        self.collectTimer.timeout.connect(self.collect)
+
+    def load(self):
+        # Returns the state of the last snapshot or None
+        try:
+            with open(self.path, "r") as snapshotFile:
+                state = json.load(snapshotFile)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning("RemotePykibStateSnapshot: Unable to read " + self.path + ": " + str(e))
+            return None
+        if not isinstance(state, dict) or state.get("version") != self.version:
+            return None
+        return state
+
+    def startWriting(self):
+        self.daemon = True  # Daemonize thread
+        self.start()
+        self.collectTimer.start(self.collectInterval)
+
+    def markDirty(self):
+        self.dirty = True
+
+    def collect(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        state = self.collectState()
+        if state == self.lastWrittenState:
+            return
+        self.lastWrittenState = state
+        with self.condition:
+            self.pendingState = dict(state, version=self.version)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pendingState is None:
+                    self.condition.wait()
+                state = self.pendingState
+                self.pendingState = None
+            try:
+                self.write(state)
+            except OSError as e:
+                logging.warning("RemotePykibStateSnapshot: Unable to write " + self.path + ": " + str(e))
+
+    def write(self, state):
+        temporaryPath = self.path + ".tmp"
+        with open(temporaryPath, "w") as snapshotFile:
+            json.dump(state, snapshotFile, separators=(",", ":"))
+        os.replace(temporaryPath, self.path)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import logging
+import threading
+import time
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal, QTimer
+
+
+class RemotePykibStats(QtCore.QObject):
+    # Latency histograms and counters of the actions handled by the remote daemon.
+    # Stages of an action:
+    #   parse  - message received until decoded
+    #   handle - decoded until handled by the server thread and the signal emitted
+    #   apply  - signal emitted until the GUI thread applied it
+    #   total  - message received until applied
+    #   frameLag - how far a moved window trails the received geometry, 0 while its position is extrapolated
+    # The object lives in the GUI thread. actionEmitted is emitted by the server threads right after
+    # the signal of an action, so it is queued behind it and its slot runs when the action was applied.
+    actionEmitted = pyqtSignal(str, float, float)
+
+    # Upper bounds of the histogram buckets in ms, the last bucket takes everything above
+    bucketBounds = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+    # Actions which are applied by a signal of the server, moveTab and setPixmap report their
+    # apply time themselves as they are coalesced
+    emittingActions = ('register', 'setTab', 'setTabActive', 'closeTab', 'closeAllTabs', 'changeTabWindow',
+                       'setMaskRegions', 'preloadTab', 'batch')
+
+    def __init__(self):
+        super(RemotePykibStats, self).__init__()
+        self.lock = threading.Lock()
+        self.startedAt = time.monotonic()
+        self.actions = {}
+        self.lastDumpAt = self.startedAt
+        self.lastDumpCounts = {}
+        self.actionEmitted.connect(self.markApplied)
+
+        self.dumpTimer = QTimer()
+        self.dumpTimer.timeout.connect(self.dump)
+
+    def startDump(self, dumpInterval):
+        # Writes the stats to the log every dumpInterval seconds
+        if dumpInterval:
+            self.dumpTimer.start(dumpInterval * 1000)
+
+    def record(self, action, stage, latency):
+        with self.lock:
+            entry = self.actions.setdefault(action, {"count": 0, "stages": {}})
+            histogram = entry["stages"].get(stage)
+            if histogram is None:
+                histogram = entry["stages"][stage] = {"buckets": [0] * (len(self.bucketBounds) + 1), "count": 0,
+                                                      "sum": 0.0, "max": 0.0}
+            histogram["buckets"][bisect.bisect_left(self.bucketBounds, latency)] += 1
+            histogram["count"] += 1
+            histogram["sum"] += latency
+            histogram["max"] = max(histogram["max"], latency)
+
+    def handled(self, action, receivedAt, parsedAt):
+        # Called by the server threads after a message was handled
+        handledAt = time.monotonic()
+        if not isinstance(action, str):
+            action = 'invalid'
+        with self.lock:
+            self.actions.setdefault(action, {"count": 0, "stages": {}})["count"] += 1
+        self.record(action, 'parse', (parsedAt - receivedAt) * 1000)
+        self.record(action, 'handle', (handledAt - parsedAt) * 1000)
+        if action in self.emittingActions:
+            self.actionEmitted.emit(action, receivedAt, handledAt)
+        else:
+            self.record(action, 'total', (handledAt - receivedAt) * 1000)
+
+    def markApplied(self, action, receivedAt, emittedAt):
+        appliedAt = time.monotonic()
+        self.record(action, 'apply', (appliedAt - emittedAt) * 1000)
+        self.record(action, 'total', (appliedAt - receivedAt) * 1000)
+
+    def applied(self, action, receivedAt):
+        # Called by the GUI thread for actions which are applied later than their signal
+        self.record(action, 'total', (time.monotonic() - receivedAt) * 1000)
+
+    def percentile(self, histogram, fraction):
+        # Upper bound of the bucket containing the percentile, never more than the maximum
+        threshold = histogram["count"] * fraction
+        seen = 0
+        for index, count in enumerate(histogram["buckets"]):
+            seen += count
+            if seen >= threshold and count:
+                if index < len(self.bucketBounds):
+                    return min(self.bucketBounds[index], round(histogram["max"], 2))
+                return round(histogram["max"], 2)
+        return 0
+
+    def snapshot(self):
+        now = time.monotonic()
+        uptime = now - self.startedAt
+        with self.lock:
+            actions = {}
+            for action, entry in self.actions.items():
+                stages = {}
+                for stage, histogram in entry["stages"].items():
+                    stages[stage] = {
+                        "count": histogram["count"],
+                        "mean": round(histogram["sum"] / histogram["count"], 2),
+                        "max": round(histogram["max"], 2),
+                        "p50": self.percentile(histogram, 0.5),
+                        "p95": self.percentile(histogram, 0.95),
+                        "p99": self.percentile(histogram, 0.99),
+                        "buckets": list(histogram["buckets"])
+                    }
+                actions[action] = {
+                    "count": entry["count"],
+                    "rate": round(entry["count"] / uptime, 2) if uptime else 0,
+                    "stages": stages
+                }
+        return {
+            "uptime": round(uptime, 1),
+            "bucketBounds": list(self.bucketBounds),
+            "actions": actions
+        }
+
+    def dump(self):
+        now = time.monotonic()
+        interval = now - self.lastDumpAt
+        snapshot = self.snapshot()
+        logging.info("RemotePykibStats: Uptime " + str(snapshot["uptime"]) + "s")
+        for action, entry in sorted(snapshot["actions"].items()):
+            count = entry["count"] - self.lastDumpCounts.get(action, 0)
+            self.lastDumpCounts[action] = entry["count"]
+            line = "  " + action + ": " + str(entry["count"]) + " total, " + str(round(count / interval, 2)) + "/s"
+            for stage in ('parse', 'handle', 'apply', 'total', 'frameLag'):
+                if stage in entry["stages"]:
+                    histogram = entry["stages"][stage]
+                    line += (", " + stage + " p50/p95/max " + str(histogram["p50"]) + "/" + str(histogram["p95"]) +
+                             "/" + str(histogram["max"]) + "ms")
+            logging.info(line)
+        logging.info("------------------------------------------------------------")
+        self.lastDumpAt = now
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+from pykib_base.pageHibernator import PageHibernator
+
+
+class RemotePykibTabHibernator(PageHibernator):
+    # Puts hidden remote tabs to sleep, see PageHibernator. The tabs are tracked by their tabId,
+    # a tab is in the background while its window is hidden.
+
+    def __init__(self, instances, freezeAfter, discardAfter, memoryBudget):
+        super(RemotePykibTabHibernator, self).__init__(freezeAfter, discardAfter, memoryBudget)
+        self.instances = instances
+
+    def viewOf(self, tabId):
+        window = self.instances.get(tabId)
+        if window is None:
+            return None
+        return window.tabs[0]['web']
+
+    def backgroundTabs(self, now):
+        tabIds = []
+        hiddenTabs = []
+        for tabId, windowId, window in self.instances.items():
+            tabIds.append(tabId)
+            try:
+                visible = window.isVisible()
+            except RuntimeError:
+                # Window was deleted, e.g. closed by the user with the context menu
+                continue
+            if visible or tabId not in self.lastUsed:
+                self.lastUsed[tabId] = now
+            if not visible:
+                hiddenTabs.append((self.lastUsed[tabId], tabId))
+        return tabIds, hiddenTabs
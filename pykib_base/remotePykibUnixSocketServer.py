@@ -20,23 +20,34 @@
 import asyncio
 
 import json
+import time
 import logging
 import os
-import socket
 
 
 from PyQt6 import QtCore
 from PyQt6.QtCore import pyqtSignal
 
-from pykib_base.remotePykibUnixSocketKeepAlive import RemotePykibUnixSocketKeepAlive
+from pykib_base import remotePykibLogging
+from pykib_base import remotePykibProtocol
+from pykib_base.remotePykibMoveCoalescer import RemotePykibMoveCoalescer
+from pykib_base.remotePykibPixmapDecoder import RemotePykibPixmapDecoder
+from pykib_base.remotePykibSession import RemotePykibSession
+from pykib_base.remotePykibStats import RemotePykibStats
+from pykib_base.remotePykibKeepAliveWatchdog import RemotePykibKeepAliveWatchdog
 
 class RemotePykibUnixSocketServer(QtCore.QThread):
     configureInstance = pyqtSignal(int, int, str)
     closeInstance = pyqtSignal(int, int)
     activateInstance = pyqtSignal(int, int)
-    moveInstance = pyqtSignal(int, int, list, float)
     changeTabWindow = pyqtSignal(int, int, int)
-    setPixmap = pyqtSignal(int, str)
+    preloadInstance = pyqtSignal(str, int)
+    setMaskRegions = pyqtSignal(int, list, list, bool)
+    runBatch = pyqtSignal(list)
+    listening = pyqtSignal()
+
+    # Maximum size of a single message or frame, large enough for encoded pixmaps
+    readLimit = 16 * 1024 * 1024
 
     def __init__(self, config, args):
         super(RemotePykibUnixSocketServer, self).__init__()
@@ -44,12 +55,25 @@ class RemotePykibUnixSocketServer(QtCore.QThread):
         self.config = config
         self.args = args
         self.openSockets = {}
+        # Closed connections whose keep alive is still watched -> their state, for the session of the connection
+        self.closedSockets = {}
+        self.moveCoalescer = RemotePykibMoveCoalescer(self.config["remoteBrowserMoveInterval"])
+        self.pixmapDecoder = RemotePykibPixmapDecoder()
+        self.stats = RemotePykibStats()
+        self.session = RemotePykibSession(self.config["remoteBrowserSessionResumeGrace"])
 
-        self.keepAliveThread = RemotePykibUnixSocketKeepAlive(self.args.remoteBrowserKeepAliveInterval, self.args.remoteBrowserKeepAliveErrorLimit)
-        self.keepAliveThread.daemon = True  # Daemonize thread
-        self.keepAliveThread.keepAliveExeeded.connect(self.keepAliveExeeded)
+        self.keepAliveWatchdog = RemotePykibKeepAliveWatchdog(self.args.remoteBrowserKeepAliveInterval,
+                                                              self.args.remoteBrowserKeepAliveErrorLimit,
+                                                              self.keepAliveExeeded)
 
     def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        # Runs on the thread of the server or, with the integrated event loop, on the Qt event loop
+        await self.startUnixSocket()
+
+    async def startUnixSocket(self):
         logging.info("UnixSocket: Starting UnixSocket Server:")
         logging.info("  Try creating Socket " + str(self.args.remoteBrowserSocketPath))
 
@@ -60,169 +84,279 @@ class RemotePykibUnixSocketServer(QtCore.QThread):
             if os.path.exists(self.args.remoteBrowserSocketPath):
                 raise
 
-        # try to open Socket
+        # try to open Socket, every connected client is served by its own handler coroutine
         try:
-            unixSocket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            unixSocket.bind(self.args.remoteBrowserSocketPath)
-            # Listen for incoming connections
-            unixSocket.listen(20)
+            self.server = await asyncio.start_unix_server(self.handler, path=self.args.remoteBrowserSocketPath,
+                                                          backlog=20, limit=self.readLimit)
         except Exception as e:
             logging.info(e)
+            return
 
-        while True:
-            try:
+        self.listening.emit()
+        await self.server.serve_forever()
+
+    async def handler(self, reader, writer):
+        logging.info("Client connected on Unix Socket")
+        # Per connection state, tabId and windowId are filled by tabAlive
+        self.openSockets[writer] = {
+            "protocolMode": remotePykibProtocol.PROTOCOL_MODE_JSON
+        }
+
+        self.keepAliveWatchdog.watch(writer)
+
+        try:
+            keepOpen = True
+            while keepOpen:
                 try:
-                    self.keepAliveThread.exit()
-                    logging.debug("Stopped Unix Socket KeepAliveThread")
-                except Exception as e:
+                    data, receivedAt = await self.readMessage(reader, writer)
+                except (asyncio.IncompleteReadError, ConnectionResetError) as e:
+                    logging.debug("no more data on unix socket...reset Connection")
+                    break
+                except asyncio.LimitOverrunError as e:
+                    logging.warning("UnixSocket: Message exceeds " + str(self.readLimit) + " bytes...reset Connection")
+                    break
+                except remotePykibProtocol.ProtocolError as e:
                     logging.debug(e)
+                    writer.write(self.encodeReply(writer, {"Error": str(e)}))
+                    await writer.drain()
+                    continue
+                except ValueError as e:
+                    logging.debug(e)
+                    writer.write(b'Unable to read request\n')
+                    await writer.drain()
+                    continue
 
-                keepOpen = True
-                connection, client_address = unixSocket.accept()
-                logging.info("Client connected on Unix Socket")
-
-                if(self.args.remoteBrowserKeepAliveInterval != 0):
-                    self.keepAliveThread.start()
-
-                while keepOpen:
-                    logging.info("Wait for Message")
-                    try:
-                        connection.settimeout(5)
-                        message = connection.recv(256)
-                        #receive message until it end with b'\r\n')
-                        while not message.endswith(b'\r\n') and message:
-                            message += connection.recv(256)
-
-                    except Exception as e:
-                        logging.debug(e)
-                        keepOpen = False
-                        connection.sendall(json.dumps([{
-                            "Timed Out": 5}
-                        ]).encode() + b'\n')
-                        connection.close()
-                        continue
-
-                    logging.info("Message Received")
-                    if not message:
-                        logging.debug("no more data on unix socket...reset Connection")
-                        keepOpen = False
-                    else:
-                        try:
-                            logging.debug(message)
-                            data = json.loads(message)
-                        except Exception as e:
-                            logging.debug(e)
-                            connection.sendall(b'Unable to read request\n')
-                            continue
-                        try:
-                            if data['action']:
-                                True
-                        except Exception as e:
-                            logging.debug('Action Missing')
-                            connection.sendall(b'Action Missing\n')
-                            keepOpen = False
-                            continue
-
-                        if data['action'] == 'tabAlive':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  Tab registered")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    WindowID: " + str(data["windowId"]))
-                            logging.debug("------------------------------------------------------------")
-                            tab = {
-                                "tabId": data["tabId"],
-                                "windowId": data["windowId"]
-                            }
-                            self.openSockets[unixSocket] = tab
-                        if data['action'] == 'keepAlive':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  KeepAliveReceived")
-                            logging.debug("------------------------------------------------------------")
-                            try:
-                                self.keepAliveThread.resetKeepAliveTimer()
-                            except Exception as e:
-                                logging.debug(e)
-                                keepOpen = False
-                        elif data['action'] == 'setPixmap':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  Apply Pixmap on Tab: " + str(data["tabId"]))
-                            self.setPixmap.emit(int(data["tabId"]), str(data['pixmap']))
-                            logging.info("------------------------------------------------------------")
-                            #connection.sendall(json.dumps([self.config]).encode()+b'\n')
-                            #keepOpen = False
-                            #continue
-                        elif data['action'] == 'register':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  Register:Return config")
-                            logging.debug("    Return config")
-                            logging.debug("    First Start - Closing all may opened Sessions")
-                            self.closeInstance.emit(0, 0)
-                            logging.info("------------------------------------------------------------")
-                            connection.sendall(json.dumps([self.config]).encode()+b'\n')
-                            continue
-                        elif data['action'] == 'setTab':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  set Tab:")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    WindowID: " + str(data["windowId"]))
-                            logging.debug("    URL: " + data['url'])
-                            logging.debug("------------------------------------------------------------")
-                            self.configureInstance.emit(int(data["tabId"]), int(data["windowId"]), data['url'])
-                        elif data['action'] == 'setTabActive':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  set Tab Active:")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    WindowID: " + str(data["windowId"]))
-                            logging.debug("------------------------------------------------------------")
-                            self.activateInstance.emit(int(data["tabId"]), int(data["windowId"]))
-                        elif data['action'] == 'closeTab':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  Closing Tab:")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    WindowID: " + str(data["windowId"]))
-                            logging.debug("------------------------------------------------------------")
-                            self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]))
-                        elif data['action'] == 'moveTab':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  Moving Tab:")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    WindowID: " + str(data["windowId"]))
-                            logging.debug("------------------------------------------------------------")
-                            if data['geometry'][1] < 0:
-                                self.activateInstance.emit(0, int(data["windowId"]))
-                            else:
-                                self.moveInstance.emit(int(data["tabId"]), int(data["windowId"]), data['geometry'],
-                                                       float(data['zoomFactor']))
-                        elif data['action'] == 'changeTabWindow':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  change Tab Window:")
-                            logging.debug("    TabID: " + str(data["tabId"]))
-                            logging.debug("    oldWindowId: " + str(data["oldWindowId"]))
-                            logging.debug("    newWindowId: " + str(data['newWindowId']))
-                            logging.debug("------------------------------------------------------------")
-                            self.changeTabWindow.emit(int(data["tabId"]), int(data["oldWindowId"]),
-                                                      int(data['newWindowId']))
-                            self.openSockets[unixSocket]["windowId"] = data['newWindowId']
-                        elif data['action'] == 'getRemoteBrowserKeepAliveInterval':
-                            logging.debug("UnixSocket:")
-                            logging.debug("  RemoteBrowserKeepAliveInterval Requests")
-                            logging.debug("------------------------------------------------------------")
-                            connection.sendall(str(self.args.remoteBrowserKeepAliveInterval).encode()+b'\n')
-                            continue
-
-                        connection.sendall(json.dumps([{
-                            "Ack": True}
-                        ]).encode() + b'\n')
+                # Heartbeats only refresh the keep alive deadline and are not answered
+                if data is None:
+                    logging.debug("UnixSocket heartbeat", extra={"action": "heartbeat"})
+                    self.keepAliveWatchdog.heartbeat(writer)
+                    continue
 
-            except Exception as e:
+                parsedAt = time.monotonic()
                 try:
-                    logging.info(e)
-                    self.closeInstance.emit(self.openSockets[unixSocket]["tabId"], self.openSockets[unixSocket]["windowId"])
-                    logging.debug("Socket:")
-                    logging.debug("  Connection to Tab lost. Closing")
-                except Exception as e2:
-                    logging.warning(e2)
-                    logging.warning(e)
-
-    def keepAliveExeeded(self):
-        self.closeInstance.emit(0, 0)
\ No newline at end of file
+                    reply, keepOpen = self.handleMessage(writer, data)
+                except remotePykibProtocol.ProtocolError as e:
+                    logging.debug(e)
+                    reply = [{"Error": str(e)}]
+                self.stats.handled(data.get('action') if isinstance(data, dict) else None, receivedAt, parsedAt)
+                # Replies of pipelined messages carry the request id of the message
+                if reply is not None and isinstance(data, dict) and 'requestId' in data:
+                    reply = remotePykibProtocol.attachRequestId(reply, data['requestId'])
+                if reply is not None:
+                    writer.write(self.encodeReply(writer, reply))
+                    # drain only waits if the client does not read its replies fast enough
+                    await writer.drain()
+
+                # Protocol mode switch negotiated by register takes effect after its reply
+                if "nextProtocolMode" in self.openSockets[writer]:
+                    self.openSockets[writer]["protocolMode"] = self.openSockets[writer].pop("nextProtocolMode")
+
+        except Exception as e:
+            try:
+                logging.info(e)
+                self.closeInstance.emit(self.openSockets[writer]["tabId"], self.openSockets[writer]["windowId"])
+                logging.debug("Socket:")
+                logging.debug("  Connection to Tab lost. Closing")
+            except Exception as e2:
+                logging.warning(e2)
+                logging.warning(e)
+        finally:
+            self.keepAliveWatchdog.closed(writer)
+            closedSocket = self.openSockets.pop(writer)
+            for closedWriter in [closedWriter for closedWriter in self.closedSockets
+                                 if closedWriter not in self.keepAliveWatchdog.deadlines]:
+                del self.closedSockets[closedWriter]
+            if writer in self.keepAliveWatchdog.deadlines:
+                self.closedSockets[writer] = closedSocket
+            try:
+                writer.close()
+            except Exception as e:
+                logging.debug(e)
+
+    async def readMessage(self, reader, connection):
+        # Returns the decoded message and the time it was received completely.
+        # Empty frames and empty lines are heartbeats, they are returned as None.
+        if self.openSockets[connection]["protocolMode"] == remotePykibProtocol.PROTOCOL_MODE_BINARY:
+            payload = await remotePykibProtocol.readFrame(reader, self.readLimit)
+            receivedAt = time.monotonic()
+            if not payload:
+                return None, receivedAt
+            return remotePykibProtocol.decodePayload(payload), receivedAt
+
+        # receive message until it end with b'\r\n'
+        message = await reader.readuntil(b'\r\n')
+        receivedAt = time.monotonic()
+        if message == b'\r\n':
+            return None, receivedAt
+        logging.debug("UnixSocket received %s", remotePykibLogging.RemotePykibLogPayload(message), extra={"action": "message"})
+        return json.loads(message), receivedAt
+
+    def encodeReply(self, connection, reply):
+        if self.openSockets[connection]["protocolMode"] == remotePykibProtocol.PROTOCOL_MODE_BINARY:
+            return remotePykibProtocol.encodeFrame(reply)
+        if isinstance(reply, str):
+            return reply.encode() + b'\n'
+        return json.dumps(reply).encode() + b'\n'
+
+    def handleMessage(self, connection, data):
+        # Handles one decoded message of a connection.
+        # Returns the reply which should be sent back and if the connection should stay open.
+        try:
+            if data['action']:
+                True
+        except Exception as e:
+            logging.debug('Action Missing')
+            return 'Action Missing', False
+
+        if data['action'] == 'tabAlive':
+            logging.debug("UnixSocket tabAlive tabId=%s windowId=%s", data["tabId"], data["windowId"],
+                          extra={"action": "tabAlive"})
+            self.openSockets[connection]["tabId"] = data["tabId"]
+            self.openSockets[connection]["windowId"] = data["windowId"]
+        if data['action'] == 'keepAlive':
+            logging.debug("UnixSocket keepAlive", extra={"action": "keepAlive"})
+            self.keepAliveWatchdog.heartbeat(connection)
+        elif data['action'] == 'setPixmap':
+            logging.debug("UnixSocket setPixmap tabId=%s", data["tabId"], extra={"action": "setPixmap"})
+            self.pixmapDecoder.push(int(data["tabId"]), data['pixmap'])
+        elif data['action'] == 'setMaskRegions':
+            logging.debug("UnixSocket setMaskRegions tabId=%s", data["tabId"], extra={"action": "setMaskRegions"})
+            self.setMaskRegions.emit(*remotePykibProtocol.maskRegionsArguments(data))
+        elif data['action'] == 'register':
+            logging.debug("UnixSocket:")
+            logging.debug("  Register:Return config")
+            logging.debug("    Return config")
+            if len(self.openSockets) == 1:
+                logging.debug("    First Start - Suspending all may opened Sessions")
+                self.suspendSession(allTabs=True)
+            elif self.openSockets[connection].get("sessionId"):
+                # The previous session of the connection is replaced
+                self.suspendSession(self.openSockets[connection]["sessionId"])
+            protocolMode = remotePykibProtocol.negotiateProtocolMode(data.get('protocolMode'))
+            self.openSockets[connection]["nextProtocolMode"] = protocolMode
+            logging.debug("    Protocol Mode: " + protocolMode)
+            logging.info("------------------------------------------------------------")
+            config = dict(self.config)
+            config["protocolMode"] = protocolMode
+            config["supportedProtocolModes"] = remotePykibProtocol.supportedProtocolModes()
+            config["sessionId"] = self.session.register()
+            self.openSockets[connection]["sessionId"] = config["sessionId"]
+            return [config], True
+        elif data['action'] == 'resume':
+            return [self.resumeReply(connection, data)], True
+        elif data['action'] == 'setTab':
+            logging.debug("UnixSocket:")
+            logging.debug("  set Tab:")
+            logging.debug("    TabID: " + str(data["tabId"]))
+            logging.debug("    WindowID: " + str(data["windowId"]))
+            logging.debug("    URL: " + data['url'])
+            logging.debug("------------------------------------------------------------")
+            self.session.claim(int(data["tabId"]), self.openSockets[connection].get("sessionId"))
+            self.configureInstance.emit(int(data["tabId"]), int(data["windowId"]), data['url'])
+        elif data['action'] == 'preloadTab':
+            logging.debug("UnixSocket preloadTab url=%s", data['url'], extra={"action": "preloadTab"})
+            self.preloadInstance.emit(data['url'], int(data.get("windowId", 0)))
+        elif data['action'] == 'setTabActive':
+            logging.debug("UnixSocket:")
+            logging.debug("  set Tab Active:")
+            logging.debug("    TabID: " + str(data["tabId"]))
+            logging.debug("    WindowID: " + str(data["windowId"]))
+            logging.debug("------------------------------------------------------------")
+            self.activateInstance.emit(int(data["tabId"]), int(data["windowId"]))
+        elif data['action'] == 'closeTab':
+            logging.debug("UnixSocket:")
+            logging.debug("  Closing Tab:")
+            logging.debug("    TabID: " + str(data["tabId"]))
+            logging.debug("    WindowID: " + str(data["windowId"]))
+            logging.debug("------------------------------------------------------------")
+            self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]))
+        elif data['action'] == 'moveTab':
+            logging.debug("UnixSocket moveTab tabId=%s windowId=%s geometry=%s", data["tabId"], data["windowId"],
+                          data['geometry'], extra={"action": "moveTab"})
+            if data['geometry'][1] < 0:
+                self.moveCoalescer.discardWindow(int(data["windowId"]))
+                self.activateInstance.emit(0, int(data["windowId"]))
+            else:
+                self.moveCoalescer.push(int(data["tabId"]), int(data["windowId"]), data['geometry'],
+                                        float(data['zoomFactor']))
+            # Report the measured apply latency, so the client can adapt its move interval
+            ack = {"Ack": True}
+            ack.update(self.moveCoalescer.feedback())
+            return [ack], True
+        elif data['action'] == 'changeTabWindow':
+            logging.debug("UnixSocket:")
+            logging.debug("  change Tab Window:")
+            logging.debug("    TabID: " + str(data["tabId"]))
+            logging.debug("    oldWindowId: " + str(data["oldWindowId"]))
+            logging.debug("    newWindowId: " + str(data['newWindowId']))
+            logging.debug("------------------------------------------------------------")
+            self.changeTabWindow.emit(int(data["tabId"]), int(data["oldWindowId"]),
+                                      int(data['newWindowId']))
+            if "windowId" in self.openSockets[connection]:
+                self.openSockets[connection]["windowId"] = data['newWindowId']
+        elif data['action'] == 'batch':
+            logging.debug("UnixSocket:")
+            logging.debug("  Batch with " + str(len(data['actions'])) + " Actions")
+            logging.debug("------------------------------------------------------------")
+            commands = remotePykibProtocol.batchCommands(data['actions'], self.openSockets[connection]["protocolMode"])
+            commands, moves = self.moveCoalescer.splitBatch(commands)
+            for command, arguments in commands:
+                if command == 'changeTabWindow' and "windowId" in self.openSockets[connection]:
+                    self.openSockets[connection]["windowId"] = arguments[2]
+                elif command == 'configureInstance':
+                    self.session.claim(arguments[0], self.openSockets[connection].get("sessionId"))
+            self.runBatch.emit(commands)
+            for move in moves:
+                self.moveCoalescer.push(*move)
+        elif data['action'] == 'getStats':
+            logging.debug("UnixSocket:")
+            logging.debug("  Stats Requested")
+            logging.debug("------------------------------------------------------------")
+            return [self.statsReply()], True
+        elif data['action'] == 'getLog':
+            lines = remotePykibLogging.ringBufferLines()
+            if lines is None:
+                return [{"Error": "Log ring buffer is disabled"}], True
+            return [{"action": "log", "lines": lines}], True
+        elif data['action'] == 'getRemoteBrowserKeepAliveInterval':
+            logging.debug("UnixSocket:")
+            logging.debug("  RemoteBrowserKeepAliveInterval Requests")
+            logging.debug("------------------------------------------------------------")
+            return str(self.args.remoteBrowserKeepAliveInterval), True
+
+        return [{
+            "Ack": True}
+        ], True
+
+    def statsReply(self):
+        stats = {"action": "stats"}
+        stats.update(self.stats.snapshot())
+        stats["moves"] = dict(self.moveCoalescer.feedback(), coalescedMoves=self.moveCoalescer.coalescedMoves)
+        stats["openConnections"] = len(self.openSockets)
+        return stats
+
+    def resumeReply(self, connection, data):
+        tabs = self.session.resume(data.get('sessionId'))
+        logging.info("UnixSocket: Resume session " + ("succeeded with " + str(len(tabs)) + " tabs" if tabs is not None else "failed"))
+        if tabs is None:
+            return {"action": "resume", "resumed": False}
+        self.openSockets[connection]["sessionId"] = data['sessionId']
+        return {"action": "resume", "resumed": True, "sessionId": data['sessionId'], "tabs": tabs}
+
+    def suspendSession(self, sessionId=None, allTabs=False):
+        # The tabs are kept for the session resume grace period, without it they are closed
+        if self.session.suspend(sessionId, allTabs):
+            return
+        if allTabs:
+            self.closeInstance.emit(0, 0)
+            return
+        for tabId, windowId in self.session.tabsOf(sessionId):
+            self.closeInstance.emit(tabId, windowId)
+
+    def keepAliveExeeded(self, connection):
+        state = self.openSockets.get(connection) or self.closedSockets.pop(connection, {})
+        if not [openSocket for openSocket in self.openSockets if openSocket is not connection]:
+            # A single legacy client is lost with all its tabs
+            self.suspendSession(allTabs=True)
+        else:
+            self.suspendSession(state.get("sessionId"))
\ No newline at end of file
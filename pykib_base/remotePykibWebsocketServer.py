@@ -20,20 +20,36 @@
 import asyncio
 
 import websockets
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 import json
+import time
 import logging
 
 from PyQt6 import QtCore
 from PyQt6.QtCore import pyqtSignal
 
+from pykib_base import remotePykibLogging
+from pykib_base import remotePykibProtocol
+from pykib_base.remotePykibMoveCoalescer import RemotePykibMoveCoalescer
+from pykib_base.remotePykibPixmapDecoder import RemotePykibPixmapDecoder
+from pykib_base.remotePykibSession import RemotePykibSession
+from pykib_base.remotePykibStats import RemotePykibStats
+
 
 class RemotePykibWebsocketServer(QtCore.QThread):
     configureInstance = pyqtSignal(int, int, str)
     closeInstance = pyqtSignal(int, int)
     activateInstance = pyqtSignal(int, int)
-    moveInstance = pyqtSignal(int, int, list, float)
     changeTabWindow = pyqtSignal(int, int, int)
-    setPixmap = pyqtSignal(int, str)
+    preloadInstance = pyqtSignal(str, int)
+    setMaskRegions = pyqtSignal(int, list, list, bool)
+    runBatch = pyqtSignal(list)
+    listening = pyqtSignal()
+
+    # Maximum size of a single message, large enough for encoded pixmaps
+    maxMessageSize = 16 * 1024 * 1024
+    # Number of received messages buffered per connection before reading from the socket pauses
+    maxQueue = 16
 
     def __init__(self, config, sessionToken, port):
         super(RemotePykibWebsocketServer, self).__init__()
@@ -41,127 +57,242 @@ class RemotePykibWebsocketServer(QtCore.QThread):
         self.port = port
         self.sessionToken = sessionToken
         self.openSockets = {}
+        self.moveCoalescer = RemotePykibMoveCoalescer(self.config["remoteBrowserMoveInterval"])
+        self.pixmapDecoder = RemotePykibPixmapDecoder()
+        self.stats = RemotePykibStats()
+        self.session = RemotePykibSession(self.config["remoteBrowserSessionResumeGrace"])
 
     def run(self):
-        asyncio.run(self.startWebsocket())
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        # Runs on the thread of the server or, with the integrated event loop, on the Qt event loop
+        await self.startWebsocket()
 
     async def startWebsocket(self):
         logging.info("Websocket: Starting Websocket Server:")
         logging.info("  Listening on 0.0.0.0:" + str(self.port))
-        self.server = await websockets.serve(self.handler, "0.0.0.0", self.port)
+        # Smaller deflate windows keep the memory per connection low, large pixmaps still compress well
+        compression = ServerPerMessageDeflateFactory(server_max_window_bits=12, client_max_window_bits=12,
+                                                     compress_settings={"memLevel": 5})
+        self.server = await websockets.serve(self.handler, "0.0.0.0", self.port, extensions=[compression],
+                                             compression=None, max_size=self.maxMessageSize,
+                                             max_queue=self.maxQueue)
+        self.listening.emit()
         await self.server.wait_closed()
 
+    async def send(self, websocket, data, binary=False):
+        # Replies use the encoding of the received message
+        if binary:
+            await websocket.send(remotePykibProtocol.encodePayload(data))
+        else:
+            await websocket.send(json.dumps(data))
+
     async def handler(self, websocket):
+        self.openSockets[websocket] = {}
         try:
             keepOpen = True
             while keepOpen:
                 message = await websocket.recv()
-                data = json.loads(message)
-                if (not self.sessionToken or self.sessionToken == data['sessionToken']):
-                    if (data['action'] == 'tabAlive'):
-                        logging.info("Websocket:")
-                        logging.info("  Tab registered")
-                        logging.info("    TabID: " + str(data["tabId"]))
-                        logging.info("    WindowID: " + str(data["windowId"]))
-                        logging.info("------------------------------------------------------------")
-                        tab = {
-                            "tabId": data["tabId"],
-                            "windowId": data["windowId"]
-                        }
-                        self.openSockets[websocket] = tab
-                    if (data['action'] == 'register'):
-                        logging.info("Websocket:")
-                        logging.info("  Register:Return config")
-                        logging.info("    Return config")
-                        logging.info("    First Start - Closing all may opened Sessions")
-                        # self.closeInstance.emit(0,0)
-                        logging.info("------------------------------------------------------------")
-                        await websocket.send(json.dumps(self.config))
-                        keepOpen = False
-                    elif data['action'] == 'setPixmap':
-                        logging.debug(data)
-                        logging.debug("Websocket:")
-                        logging.debug("  Apply Pixmap on Tab: " + str(data["tabId"]))
-                        self.setPixmap.emit(int(data["tabId"]), str(data['pixmap']))
-                        logging.info("------------------------------------------------------------")
-                        keepOpen = False
-                    elif (data['action'] == 'setTab'):
-                        logging.info("Websocket:")
-                        logging.info("  set Tab:")
-                        logging.info("    TabID: " + str(data["tabId"]))
-                        logging.info("    WindowID: " + str(data["windowId"]))
-                        logging.info("    URL: " + data['url'])
-                        logging.info("------------------------------------------------------------")
-                        keepOpen = False
-                        self.configureInstance.emit(int(data["tabId"]), int(data["windowId"]), data['url'])
-                    elif (data['action'] == 'setTabActive'):
-                        logging.info("Websocket:")
-                        logging.info("  set Tab Active:")
-                        logging.info("    TabID: " + str(data["tabId"]))
-                        logging.info("    WindowID: " + str(data["windowId"]))
-                        logging.info("------------------------------------------------------------")
-                        self.activateInstance.emit(int(data["tabId"]), int(data["windowId"]))
-                    elif (data['action'] == 'closeTab'):
-                        logging.info("Websocket:")
-                        logging.info("  Closing Tab:")
-                        logging.info("    TabID: " + str(data["tabId"]))
-                        logging.info("    WindowID: " + str(data["windowId"]))
-                        logging.info("------------------------------------------------------------")
-                        try:
-                            data["windowId"]["windowId"]
-                            self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]["windowId"]))
-                        except:
-                            self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]))
-                    elif (data['action'] == 'closeAllTabs'):
-                        logging.info("Websocket:")
-                        logging.info("  Closing All Tabs:")
-                        logging.info("    WindowID: " + str(data["windowId"]))
-                        logging.info("------------------------------------------------------------")
-                        self.closeInstance.emit(0, int(data["windowId"]))
-                    elif (data['action'] == 'moveTab'):
-                        logging.debug("Websocket:")
-                        logging.debug("  Moving Tab:")
-                        logging.debug("    TabID: " + str(data["tabId"]))
-                        logging.debug("    WindowID: " + str(data["windowId"]))
-                        logging.debug("------------------------------------------------------------")
-                        if (data['geometry'][1] < 0):
-                            self.activateInstance.emit(0, int(data["windowId"]))
-                        else:
-                            self.moveInstance.emit(int(data["tabId"]), int(data["windowId"]), data['geometry'],
-                                                   float(data['zoomFactor']))
-                    elif (data['action'] == 'changeTabWindow'):
-                        logging.info("Websocket:")
-                        logging.info("  change Tab Window:")
-                        logging.info("    TabID: " + str(data["tabId"]))
-                        logging.info("    oldWindowId: " + str(data["oldWindowId"]))
-                        logging.info("    newWindowId: " + str(data['newWindowId']))
-                        logging.info("------------------------------------------------------------")
-                        self.changeTabWindow.emit(int(data["tabId"]), int(data["oldWindowId"]),
-                                                  int(data['newWindowId']))
-                        self.openSockets[websocket]["windowId"] = data['newWindowId']
+                receivedAt = time.monotonic()
+                # Binary messages are msgpack encoded, text messages are json
+                binary = isinstance(message, bytes)
+                if binary:
+                    try:
+                        data = remotePykibProtocol.decodePayload(message)
+                    except remotePykibProtocol.ProtocolError as e:
+                        logging.debug(e)
+                        await self.send(websocket, {"Error": str(e)}, binary)
+                        continue
+                else:
+                    data = json.loads(message)
+                parsedAt = time.monotonic()
+                if (not self.sessionToken or self.sessionToken == data.get('sessionToken')):
+                    try:
+                        reply, keepOpen = self.handleMessage(websocket, data, binary)
+                    except remotePykibProtocol.ProtocolError as e:
+                        logging.debug(e)
+                        reply = {"Error": str(e)}
+                    self.stats.handled(data.get('action'), receivedAt, parsedAt)
+                    # Persistent sessions multiplex all actions over one connection
+                    if (self.openSockets[websocket].get("persistentSession")):
+                        keepOpen = True
+                    # Messages with a request id are always answered and never end the session,
+                    # so clients can pipeline them and match the replies by id
+                    if ('requestId' in data):
+                        keepOpen = True
+                        if reply is None:
+                            reply = {"Ack": True}
+                        reply = remotePykibProtocol.attachRequestId(reply, data['requestId'])
+                    if reply is not None:
+                        await self.send(websocket, reply, binary)
                 else:
-                    await websocket.send(json.dumps({"ErrorCode": 1}))
+                    await self.send(websocket, {"ErrorCode": 1}, binary)
                     logging.warning("Websocket:")
                     logging.warning("  Invalid Session Token Received:")
                     logging.warning("------------------------------------------------------------")
         except Exception as e:
-            try:
-                self.closeInstance.emit(self.openSockets[websocket]["tabId"], self.openSockets[websocket]["windowId"])
-                logging.info("Websocket:")
-                logging.info("  Connection to Tab lost. Closing")
-                logging.info(e)
-                logging.info(self.openSockets[websocket]["tabId"])
-                logging.info(self.openSockets[websocket]["windowId"])
-            except Exception as e2:
-                logging.warning(e2)
-            if (e == websockets.exceptions.ConnectionClosedError):
+            # Only the loss of a persistent session affects all windows, legacy clients connect per action
+            suspendSession = (isinstance(e, websockets.exceptions.ConnectionClosedError) and
+                              self.openSockets.get(websocket, {}).get("persistentSession"))
+            # The tab of a suspended session is kept for the resume grace period like all others
+            if not suspendSession and "tabId" in self.openSockets.get(websocket, {}):
+                try:
+                    self.closeInstance.emit(self.openSockets[websocket]["tabId"], self.openSockets[websocket]["windowId"])
+                    logging.info("Websocket:")
+                    logging.info("  Connection to Tab lost. Closing")
+                    logging.info(e)
+                    logging.info(self.openSockets[websocket]["tabId"])
+                    logging.info(self.openSockets[websocket]["windowId"])
+                except Exception as e2:
+                    logging.warning(e2)
+            if (suspendSession):
                 logging.warning("Websocket:")
-                logging.warning("  Connection closed with error - Closing all Windows")
+                logging.warning("  Connection closed with error - Suspending the Windows of the session")
                 logging.warning("------------------------------------------------------------")
-                self.closeInstance.emit(0, 0)
-            elif (e.__class__ != websockets.exceptions.ConnectionClosedOK):
+                sessionId = self.openSockets[websocket].get("sessionId")
+                # Other clients keep their tabs
+                if not self.session.suspend(sessionId):
+                    for tabId, windowId in self.session.tabsOf(sessionId):
+                        self.closeInstance.emit(tabId, windowId)
+            elif (isinstance(e, websockets.exceptions.ConnectionClosedOK)):
                 logging.info("Websocket:")
                 logging.info("  Connection closed cleanly")
                 logging.info("------------------------------------------------------------")
             else:
                 logging.warning(e)
+        finally:
+            self.openSockets.pop(websocket, None)
+
+    def handleMessage(self, websocket, data, binary=False):
+        # Handles one decoded message of a connection.
+        # Returns the reply which should be sent back and if the connection should stay open.
+        if (data['action'] == 'tabAlive'):
+            logging.info("Websocket tabAlive tabId=%s windowId=%s", data["tabId"], data["windowId"],
+                         extra={"action": "tabAlive"})
+            self.openSockets[websocket]["tabId"] = data["tabId"]
+            self.openSockets[websocket]["windowId"] = data["windowId"]
+        if (data['action'] == 'register'):
+            logging.info("Websocket:")
+            logging.info("  Register:Return config")
+            logging.info("    Return config")
+            logging.info("    First Start - Closing all may opened Sessions")
+            # self.closeInstance.emit(0,0)
+            logging.info("------------------------------------------------------------")
+            config = dict(self.config)
+            config["supportedProtocolModes"] = remotePykibProtocol.supportedProtocolModes()
+            # Legacy clients expect the connection to be closed after the reply
+            persistentSession = bool(data.get('persistentSession'))
+            self.openSockets[websocket]["persistentSession"] = persistentSession
+            config["persistentSession"] = persistentSession
+            config["sessionId"] = self.session.register()
+            self.openSockets[websocket]["sessionId"] = config["sessionId"]
+            return config, persistentSession
+        elif data['action'] == 'setPixmap':
+            logging.debug("Websocket setPixmap tabId=%s", data["tabId"], extra={"action": "setPixmap"})
+            self.pixmapDecoder.push(int(data["tabId"]), data['pixmap'])
+            return None, False
+        elif (data['action'] == 'setMaskRegions'):
+            logging.debug("Websocket setMaskRegions tabId=%s", data["tabId"], extra={"action": "setMaskRegions"})
+            self.setMaskRegions.emit(*remotePykibProtocol.maskRegionsArguments(data))
+        elif (data['action'] == 'setTab'):
+            logging.info("Websocket:")
+            logging.info("  set Tab:")
+            logging.info("    TabID: " + str(data["tabId"]))
+            logging.info("    WindowID: " + str(data["windowId"]))
+            logging.info("    URL: " + data['url'])
+            logging.info("------------------------------------------------------------")
+            self.session.claim(int(data["tabId"]), self.openSockets[websocket].get("sessionId"))
+            self.configureInstance.emit(int(data["tabId"]), int(data["windowId"]), data['url'])
+            return None, False
+        elif (data['action'] == 'preloadTab'):
+            logging.debug("Websocket preloadTab url=%s", data['url'], extra={"action": "preloadTab"})
+            self.preloadInstance.emit(data['url'], int(data.get("windowId", 0)))
+        elif (data['action'] == 'setTabActive'):
+            logging.info("Websocket:")
+            logging.info("  set Tab Active:")
+            logging.info("    TabID: " + str(data["tabId"]))
+            logging.info("    WindowID: " + str(data["windowId"]))
+            logging.info("------------------------------------------------------------")
+            self.activateInstance.emit(int(data["tabId"]), int(data["windowId"]))
+        elif (data['action'] == 'closeTab'):
+            logging.info("Websocket:")
+            logging.info("  Closing Tab:")
+            logging.info("    TabID: " + str(data["tabId"]))
+            logging.info("    WindowID: " + str(data["windowId"]))
+            logging.info("------------------------------------------------------------")
+            try:
+                data["windowId"]["windowId"]
+                self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]["windowId"]))
+            except:
+                self.closeInstance.emit(int(data["tabId"]), int(data["windowId"]))
+        elif (data['action'] == 'closeAllTabs'):
+            logging.info("Websocket:")
+            logging.info("  Closing All Tabs:")
+            logging.info("    WindowID: " + str(data["windowId"]))
+            logging.info("------------------------------------------------------------")
+            self.closeInstance.emit(0, int(data["windowId"]))
+        elif (data['action'] == 'moveTab'):
+            logging.debug("Websocket moveTab tabId=%s windowId=%s geometry=%s", data["tabId"], data["windowId"],
+                          data['geometry'], extra={"action": "moveTab"})
+            if (data['geometry'][1] < 0):
+                self.moveCoalescer.discardWindow(int(data["windowId"]))
+                self.activateInstance.emit(0, int(data["windowId"]))
+            else:
+                self.moveCoalescer.push(int(data["tabId"]), int(data["windowId"]), data['geometry'],
+                                        float(data['zoomFactor']))
+            # moveTab is not acknowledged, feedback is only sent on request
+            if (data.get('requestFeedback') or 'requestId' in data):
+                feedback = {"action": "moveFeedback"}
+                feedback.update(self.moveCoalescer.feedback())
+                return feedback, True
+        elif (data['action'] == 'changeTabWindow'):
+            logging.info("Websocket:")
+            logging.info("  change Tab Window:")
+            logging.info("    TabID: " + str(data["tabId"]))
+            logging.info("    oldWindowId: " + str(data["oldWindowId"]))
+            logging.info("    newWindowId: " + str(data['newWindowId']))
+            logging.info("------------------------------------------------------------")
+            self.changeTabWindow.emit(int(data["tabId"]), int(data["oldWindowId"]),
+                                      int(data['newWindowId']))
+            self.openSockets[websocket]["windowId"] = data['newWindowId']
+        elif (data['action'] == 'getStats'):
+            logging.debug("Websocket:")
+            logging.debug("  Stats Requested")
+            logging.debug("------------------------------------------------------------")
+            return self.statsReply(), True
+        elif (data['action'] == 'resume'):
+            tabs = self.session.resume(data.get('sessionId'))
+            logging.info("Websocket: Resume session " + ("succeeded with " + str(len(tabs)) + " tabs" if tabs is not None else "failed"))
+            if tabs is None:
+                return {"action": "resume", "resumed": False}, True
+            self.openSockets[websocket]["sessionId"] = data['sessionId']
+            return {"action": "resume", "resumed": True, "sessionId": data['sessionId'], "tabs": tabs}, True
+        elif (data['action'] == 'getLog'):
+            lines = remotePykibLogging.ringBufferLines()
+            if lines is None:
+                return {"Error": "Log ring buffer is disabled"}, True
+            return {"action": "log", "lines": lines}, True
+        elif (data['action'] == 'batch'):
+            logging.debug("Websocket:")
+            logging.debug("  Batch with " + str(len(data['actions'])) + " Actions")
+            logging.debug("------------------------------------------------------------")
+            protocolMode = remotePykibProtocol.PROTOCOL_MODE_BINARY if binary else remotePykibProtocol.PROTOCOL_MODE_JSON
+            commands = remotePykibProtocol.batchCommands(data['actions'], protocolMode)
+            commands, moves = self.moveCoalescer.splitBatch(commands)
+            for command, arguments in commands:
+                if (command == 'changeTabWindow' and websocket in self.openSockets):
+                    self.openSockets[websocket]["windowId"] = arguments[2]
+                elif (command == 'configureInstance'):
+                    self.session.claim(arguments[0], self.openSockets[websocket].get("sessionId"))
+            self.runBatch.emit(commands)
+            for move in moves:
+                self.moveCoalescer.push(*move)
+        return None, True
+
+    def statsReply(self):
+        stats = {"action": "stats"}
+        stats.update(self.stats.snapshot())
+        stats["moves"] = dict(self.moveCoalescer.feedback(), coalescedMoves=self.moveCoalescer.coalescedMoves)
+        stats["openConnections"] = len(self.openSockets)
+        return stats
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+import time
+from collections import OrderedDict
+
+from PyQt6.QtCore import QTimer, QUrl
+
+
+class RemotePykibWindowPool():
+    # Keeps a number of hidden MainWindows ready for the remote daemon, so a new remote tab
+    # only has to navigate instead of building a whole window. Closed tabs are returned to the pool.
+    # Urls announced with preloadTab are loaded into hidden windows, a new tab with the same url adopts
+    # the window. Preloads which are not used within preloadTimeout seconds are returned to the pool.
+    blankUrl = 'about:blank'
+    # The oldest preload is dropped when a further url is preloaded
+    maxPreloads = 4
+
+    def __init__(self, args, dirname, tray, size, preloadTimeout=0):
+        self.args = args
+        self.dirname = dirname
+        self.tray = tray
+        self.size = size
+        self.preloadTimeout = preloadTimeout
+        self.browserProfile = None
+        self.idleWindows = []
+        # url -> (window, expiresAt), oldest first
+        self.preloadedWindows = OrderedDict()
+        self.preloadTimer = QTimer()
+        self.preloadTimer.timeout.connect(self.expirePreloads)
+
+    def fill(self):
+        # Creates one window per call and reschedules itself, so the event loop keeps running
+        # between the window creations
+        if not self.size and self.browserProfile is None:
+            # Without pool QtWebEngine and the browser profile are still loaded before the first tab, by a
+            # window which is closed again
+            logging.debug("RemotePykibWindowPool: Prewarming QtWebEngine")
+            window = self.createWindow(self.blankUrl)
+            window.tabs[0]['web'].close()
+            window.close()
+            return
+        if len(self.idleWindows) < self.size:
+            logging.debug("RemotePykibWindowPool: Prewarming window " + str(len(self.idleWindows) + 1) + "/" + str(self.size))
+            self.idleWindows.append(self.createWindow(self.blankUrl))
+            QTimer.singleShot(0, self.fill)
+
+    def createWindow(self, url):
+        # QtWebEngine is loaded with the first window, not when the daemon starts
+        import pykib_base.mainWindow
+        self.args.url = [url]
+        if self.browserProfile:
+            window = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray, self.browserProfile)
+        else:
+            startedAt = time.monotonic()
+            window = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray)
+            self.browserProfile = window.browserProfile
+            logging.info("RemotePykibWindowPool: Loaded QtWebEngine and browser profile in " +
+                         str(int((time.monotonic() - startedAt) * 1000)) + "ms")
+        return window
+
+    def acquire(self, url):
+        window = self.takePreload(url)
+        if window:
+            return window
+        if self.idleWindows:
+            logging.debug("RemotePykibWindowPool: Reusing prewarmed window")
+            window = self.idleWindows.pop()
+            # The blank page of the pool ended the first run, the first run JS injections and the
+            # autologon belong to the first load of the url
+            window.firstRun = True
+            window.tabs[0]['web'].load(url)
+            QTimer.singleShot(0, self.fill)
+        else:
+            window = self.createWindow(url)
+        return window
+
+    def preload(self, url):
+        if not self.preloadTimeout:
+            return
+        if url in self.preloadedWindows:
+            window = self.preloadedWindows.pop(url)[0]
+        else:
+            while len(self.preloadedWindows) >= self.maxPreloads:
+                self.release(self.preloadedWindows.popitem(last=False)[1][0])
+            logging.debug("RemotePykibWindowPool: Preloading " + url)
+            window = self.acquire(url)
+        self.preloadedWindows[url] = (window, time.monotonic() + self.preloadTimeout)
+        if not self.preloadTimer.isActive():
+            self.preloadTimer.start(1000)
+
+    def takePreload(self, url):
+        preload = self.preloadedWindows.pop(url, None)
+        if preload is None:
+            return None
+        logging.debug("RemotePykibWindowPool: Adopting preloaded window for " + url)
+        return preload[0]
+
+    def expirePreloads(self):
+        now = time.monotonic()
+        for url in [url for url, (window, expiresAt) in self.preloadedWindows.items() if expiresAt <= now]:
+            logging.debug("RemotePykibWindowPool: Preload of " + url + " expired")
+            self.release(self.preloadedWindows.pop(url)[0])
+        if not self.preloadedWindows:
+            self.preloadTimer.stop()
+
+    def release(self, window):
+        if len(self.idleWindows) >= self.size:
+            window.tabs[0]['web'].close()
+            window.close()
+            return
+
+        try:
+            window.hide()
+            window.clearMask()
+            window.remoteMaskRects = []
+            window.remoteMaskDigest = None
+            # The next tab has not been moved yet, it must not be restored at the geometry of the previous one
+            window.remoteGeometry = (None, 1)
+            window.tabs[0]['web'].setZoomFactor(1)
+            # Hibernated pages have to be active again before they are reused
+            page = window.tabs[0]['web'].page()
+            page.setLifecycleState(page.LifecycleState.Active)
+            window.tabs[0]['web'].setUrl(QUrl(self.blankUrl))
+            window.tabs[0]['web'].history().clear()
+        except RuntimeError as e:
+            # Window was already deleted, e.g. closed by the user with the context menu
+            logging.debug(e)
+            return
+        logging.debug("RemotePykibWindowPool: Returned window to pool")
+        self.idleWindows.append(window)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import json
+import logging
+import os
+import sys
+import time
+
+from PyQt6 import QtCore
+from PyQt6.QtCore import pyqtSignal, QProcess, QProcessEnvironment, QTimer
+from PyQt6.QtNetwork import QLocalSocket
+
+from pykib_base import remotePykibProtocol
+
+
+class RemotePykibWorker(QtCore.QObject):
+    # Worker process of a sharded remote daemon. The worker is a remote daemon of its own, listening on a
+    # private unix socket. Keep alive and session handling stay with the router, so they are disabled in
+    # the worker. A crashed worker is restarted, connected is emitted whenever the router is connected to
+    # a new worker process, so the router can send the state of its windows again.
+    connected = pyqtSignal(int)
+
+    # Options of the router which must not be passed to the workers
+    routerFlags = ('-sp', '--storePid', '-ro', '--runOnce')
+    routerOptions = ('-spp', '--storePidPath')
+
+    connectRetryInterval = 100
+    maxRestartDelay = 30000
+    # A worker running this long is considered healthy again, its next crash is restarted immediately
+    healthyAfter = 60
+
+    def __init__(self, index, dirname, arguments, socketPath):
+        super(RemotePykibWorker, self).__init__()
+        self.index = index
+        self.dirname = dirname
+        self.arguments = self.workerArguments(arguments, socketPath)
+        self.socketPath = socketPath
+        self.stopping = False
+        self.restarts = 0
+        self.startedAt = 0
+
+        self.process = QProcess()
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.ForwardedChannels)
+        # The worker exits when the router is gone, even if the router was killed
+        environment = QProcessEnvironment.systemEnvironment()
+        environment.insert("PYKIB_ROUTER_PID", str(os.getpid()))
+        self.process.setProcessEnvironment(environment)
+        self.process.finished.connect(self.processFinished)
+
+        self.socket = QLocalSocket()
+        self.socket.connected.connect(self.socketConnected)
+        self.socket.errorOccurred.connect(self.socketError)
+        # Every message is answered by the worker, the replies are only read to keep the socket flowing
+        self.socket.readyRead.connect(self.socket.readAll)
+
+        self.connectTimer = QTimer()
+        self.connectTimer.setSingleShot(True)
+        self.connectTimer.timeout.connect(self.connectToWorker)
+        self.restartTimer = QTimer()
+        self.restartTimer.setSingleShot(True)
+        self.restartTimer.timeout.connect(self.start)
+
+        self.binary = remotePykibProtocol.PROTOCOL_MODE_BINARY in remotePykibProtocol.supportedProtocolModes()
+
+    def workerArguments(self, arguments, socketPath):
+        workerArguments = []
+        skipValue = False
+        for argument in arguments:
+            if skipValue:
+                skipValue = False
+            elif argument in self.routerFlags or argument.split("=")[0] in self.routerOptions:
+                skipValue = argument in self.routerOptions
+            else:
+                workerArguments.append(argument)
+        # Later options override the ones of the router. The router restores the tabs of a restarted worker,
+        # the workers keep no state snapshot of their own.
+        return workerArguments + ["-rbsp", socketPath, "-rbkai", "0", "-rbsrg", "0", "-rbw", "0", "-rbsf", ""]
+
+    def start(self):
+        logging.info("RemotePykibWorker " + str(self.index) + ": Starting on " + self.socketPath)
+        self.startedAt = time.monotonic()
+        if getattr(sys, 'frozen', False):
+            # In a packaged build the executable is pykib itself
+            self.process.start(sys.executable, self.arguments)
+        else:
+            self.process.start(sys.executable, [os.path.join(self.dirname, "pykib.py")] + self.arguments)
+        self.connectTimer.start(self.connectRetryInterval)
+
+    def stop(self):
+        self.stopping = True
+        self.connectTimer.stop()
+        self.restartTimer.stop()
+        self.socket.abort()
+        if self.process.state() != QProcess.ProcessState.NotRunning:
+            self.process.terminate()
+            if not self.process.waitForFinished(3000):
+                self.process.kill()
+
+    def isConnected(self):
+        return self.socket.state() == QLocalSocket.LocalSocketState.ConnectedState
+
+    def pid(self):
+        return self.process.processId()
+
+    def connectToWorker(self):
+        if self.process.state() == QProcess.ProcessState.NotRunning:
+            return
+        self.socket.abort()
+        self.socket.connectToServer(self.socketPath)
+
+    def socketError(self, error):
+        # The worker does not listen yet, try again until it does or exits
+        if not self.stopping and not self.isConnected():
+            self.connectTimer.start(self.connectRetryInterval)
+
+    def socketConnected(self):
+        logging.info("RemotePykibWorker " + str(self.index) + ": Connected after " +
+                     str(int((time.monotonic() - self.startedAt) * 1000)) + "ms")
+        # The register reply is sent in json, all following messages use the negotiated mode
+        self.socket.write(json.dumps({"action": "register", "protocolMode": "binary" if self.binary else "json"}).encode() + b'\r\n')
+        self.connected.emit(self.index)
+
+    def send(self, data):
+        # Messages are dropped while the worker is not connected, the router sends its state after connecting
+        if not self.isConnected():
+            return False
+        if self.binary:
+            self.socket.write(remotePykibProtocol.encodeFrame(data))
+        else:
+            self.socket.write(json.dumps(data).encode() + b'\r\n')
+        return True
+
+    def processFinished(self, exitCode, exitStatus):
+        self.socket.abort()
+        if self.stopping:
+            return
+        if time.monotonic() - self.startedAt >= self.healthyAfter:
+            self.restarts = 0
+        delay = min(self.maxRestartDelay, 1000 * (2 ** self.restarts) if self.restarts else 0)
+        self.restarts += 1
+        logging.warning("RemotePykibWorker " + str(self.index) + ": Exited with " + str(exitCode) + " (" +
+                        exitStatus.name + "), restarting in " + str(delay) + "ms")
+        self.restartTimer.start(delay)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import logging
+
+from pykib_base.pageHibernator import PageHibernator
+
+
+class TabHibernator(PageHibernator):
+    # Puts the background tabs of a MainWindow with enableTabs to sleep, see PageHibernator. Additionally
+    # background tabs are discarded least recently used first while more than maxLiveTabs tabs are not discarded.
+    # Tabs are tracked by their view, the tab indexes change when tabs are closed or moved.
+
+    def __init__(self, window, freezeAfter, discardAfter, memoryBudget, maxLiveTabs):
+        super(TabHibernator, self).__init__(freezeAfter, discardAfter, memoryBudget)
+        self.window = window
+        self.maxLiveTabs = maxLiveTabs
+
+    def enabled(self):
+        return bool(super(TabHibernator, self).enabled() or self.maxLiveTabs)
+
+    def settings(self):
+        return super(TabHibernator, self).settings() + ", Max live tabs " + str(self.maxLiveTabs)
+
+    def viewOf(self, view):
+        return view
+
+    def tabName(self, view):
+        return str(getattr(view, 'tabIndex', ''))
+
+    def backgroundTabs(self, now):
+        currentTab = self.window.tabs.get(self.window.currentTabIndex)
+        views = [tab['web'] for tab in self.window.tabs.values()]
+        backgroundTabs = []
+        for view in views:
+            if (currentTab and view is currentTab['web']) or view not in self.lastUsed:
+                self.lastUsed[view] = now
+            else:
+                backgroundTabs.append((self.lastUsed[view], view))
+        return views, backgroundTabs
+
+    def enforceLimits(self, views, backgroundTabs):
+        if self.maxLiveTabs:
+            self.enforceMaxLiveTabs(views, backgroundTabs)
+        super(TabHibernator, self).enforceLimits(views, backgroundTabs)
+
+    def enforceMaxLiveTabs(self, views, backgroundTabs):
+        liveTabs = len([view for view in views if not self.isDiscarded(view)])
+        for lastUsed, view in backgroundTabs:
+            if liveTabs <= self.maxLiveTabs:
+                return
+            if self.isDiscarded(view):
+                continue
+            logging.info("TabHibernator: " + str(liveTabs) + " live tabs exceed the maximum of " + str(self.maxLiveTabs))
+            self.discard(view)
+            liveTabs -= 1
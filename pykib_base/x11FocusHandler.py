@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import ctypes
+import ctypes.util
+import logging
+import subprocess
+import threading
+import time
+
+from PyQt6 import QtCore
+
+# xcb constants
+XCB_INPUT_FOCUS_PARENT = 2
+XCB_CURRENT_TIME = 0
+XCB_GET_PROPERTY_TYPE_ANY = 0
+
+handler = None
+
+
+class XcbCookie(ctypes.Structure):
+    _fields_ = [("sequence", ctypes.c_uint)]
+
+
+class XcbScreenIterator(ctypes.Structure):
+    _fields_ = [("data", ctypes.POINTER(ctypes.c_uint32)), ("rem", ctypes.c_int), ("index", ctypes.c_int)]
+
+
+class XcbInternAtomReply(ctypes.Structure):
+    _fields_ = [("responseType", ctypes.c_uint8), ("pad0", ctypes.c_uint8), ("sequence", ctypes.c_uint16),
+                ("length", ctypes.c_uint32), ("atom", ctypes.c_uint32)]
+
+
+class XcbGetPropertyReply(ctypes.Structure):
+    _fields_ = [("responseType", ctypes.c_uint8), ("format", ctypes.c_uint8), ("sequence", ctypes.c_uint16),
+                ("length", ctypes.c_uint32), ("type", ctypes.c_uint32), ("bytesAfter", ctypes.c_uint32),
+                ("valueLength", ctypes.c_uint32), ("pad0", ctypes.c_uint8 * 12)]
+
+
+class X11FocusHandler(QtCore.QThread):
+    # Gives the focus back to the active X11 window when the mouse leaves a remote browser window.
+    # Applications like VMWare View do not grab the focus when they are clicked, so the window manager
+    # focus is set again like "xdotool windowfocus $(xdotool getactivewindow)" did before.
+    # The focus is set by this thread through its own xcb connection, errors like a vanished window are
+    # returned to the request instead of ending the process like with the default Xlib error handler.
+    # A leave is only applied after debounce ms, an enter in between cancels it, so fast enter/leave
+    # sequences result in one focus change.
+    debounce = 50
+
+    def __init__(self):
+        super(X11FocusHandler, self).__init__()
+        self.condition = threading.Condition()
+        self.focusAt = None
+        self.xcb = None
+        self.connection = None
+
+    def requestFocus(self):
+        with self.condition:
+            self.focusAt = time.monotonic() + self.debounce / 1000
+            self.condition.notify()
+
+    def cancel(self):
+        with self.condition:
+            self.focusAt = None
+            # The thread waits until the next request again instead of the cancelled deadline
+            self.condition.notify()
+
+    def run(self):
+        try:
+            self.connect()
+        except (OSError, AttributeError) as e:
+            logging.debug(e)
+            self.xcb = None
+        if self.xcb is None:
+            logging.info("X11FocusHandler: Unable to connect to the X11 display, using xdotool")
+        while True:
+            with self.condition:
+                while self.focusAt is None or time.monotonic() < self.focusAt:
+                    self.condition.wait(None if self.focusAt is None else self.focusAt - time.monotonic())
+                self.focusAt = None
+            try:
+                self.focusActiveWindow()
+            except Exception as e:
+                logging.warning("X11FocusHandler: " + str(e))
+
+    def connect(self):
+        xcbPath = ctypes.util.find_library("xcb")
+        if not xcbPath:
+            return
+        xcb = ctypes.cdll.LoadLibrary(xcbPath)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        self.libc.free.argtypes = [ctypes.c_void_p]
+
+        xcb.xcb_connect.restype = ctypes.c_void_p
+        xcb.xcb_connect.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_int)]
+        xcb.xcb_connection_has_error.argtypes = [ctypes.c_void_p]
+        xcb.xcb_disconnect.argtypes = [ctypes.c_void_p]
+        xcb.xcb_get_setup.restype = ctypes.c_void_p
+        xcb.xcb_get_setup.argtypes = [ctypes.c_void_p]
+        xcb.xcb_setup_roots_iterator.restype = XcbScreenIterator
+        xcb.xcb_setup_roots_iterator.argtypes = [ctypes.c_void_p]
+        xcb.xcb_screen_next.argtypes = [ctypes.POINTER(XcbScreenIterator)]
+        xcb.xcb_intern_atom.restype = XcbCookie
+        xcb.xcb_intern_atom.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint16, ctypes.c_char_p]
+        xcb.xcb_intern_atom_reply.restype = ctypes.POINTER(XcbInternAtomReply)
+        xcb.xcb_intern_atom_reply.argtypes = [ctypes.c_void_p, XcbCookie, ctypes.POINTER(ctypes.c_void_p)]
+        xcb.xcb_get_property.restype = XcbCookie
+        xcb.xcb_get_property.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32,
+                                         ctypes.c_uint32, ctypes.c_uint32, ctypes.c_uint32]
+        xcb.xcb_get_property_reply.restype = ctypes.POINTER(XcbGetPropertyReply)
+        xcb.xcb_get_property_reply.argtypes = [ctypes.c_void_p, XcbCookie, ctypes.POINTER(ctypes.c_void_p)]
+        xcb.xcb_get_property_value.restype = ctypes.POINTER(ctypes.c_uint32)
+        xcb.xcb_get_property_value.argtypes = [ctypes.POINTER(XcbGetPropertyReply)]
+        xcb.xcb_set_input_focus_checked.restype = XcbCookie
+        xcb.xcb_set_input_focus_checked.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32]
+        xcb.xcb_request_check.restype = ctypes.c_void_p
+        xcb.xcb_request_check.argtypes = [ctypes.c_void_p, XcbCookie]
+
+        screenNumber = ctypes.c_int()
+        connection = xcb.xcb_connect(None, ctypes.byref(screenNumber))
+        if not connection or xcb.xcb_connection_has_error(connection):
+            if connection:
+                xcb.xcb_disconnect(connection)
+            return
+        screens = xcb.xcb_setup_roots_iterator(xcb.xcb_get_setup(connection))
+        for i in range(screenNumber.value):
+            xcb.xcb_screen_next(ctypes.byref(screens))
+        self.xcb = xcb
+        self.connection = connection
+        # root is the first field of xcb_screen_t
+        self.root = screens.data[0]
+
+        name = b"_NET_ACTIVE_WINDOW"
+        error = ctypes.c_void_p()
+        reply = xcb.xcb_intern_atom_reply(connection, xcb.xcb_intern_atom(connection, 0, len(name), name), ctypes.byref(error))
+        self.freeError(error)
+        self.activeWindowAtom = reply.contents.atom if reply else 0
+        if reply:
+            self.libc.free(reply)
+        logging.debug("X11FocusHandler: Using xcb, root window " + hex(self.root))
+
+    def freeError(self, error):
+        if error.value:
+            self.libc.free(error)
+
+    def activeWindow(self):
+        # Reads _NET_ACTIVE_WINDOW of the root window like xdotool getactivewindow
+        error = ctypes.c_void_p()
+        cookie = self.xcb.xcb_get_property(self.connection, 0, self.root, self.activeWindowAtom,
+                                           XCB_GET_PROPERTY_TYPE_ANY, 0, 1)
+        reply = self.xcb.xcb_get_property_reply(self.connection, cookie, ctypes.byref(error))
+        self.freeError(error)
+        if not reply:
+            return 0
+        try:
+            if reply.contents.format != 32 or reply.contents.valueLength < 1:
+                return 0
+            return self.xcb.xcb_get_property_value(reply)[0]
+        finally:
+            self.libc.free(reply)
+
+    def focusActiveWindow(self):
+        if self.xcb is None:
+            subprocess.run("activeWindow=$(xdotool getactivewindow) && xdotool windowfocus $activeWindow", shell=True)
+            return
+        if self.xcb.xcb_connection_has_error(self.connection):
+            raise OSError("Connection to the X11 display lost")
+        window = self.activeWindow()
+        if not window:
+            logging.debug("X11FocusHandler: No active window")
+            return
+        logging.debug("X11FocusHandler: Focus window " + hex(window))
+        cookie = self.xcb.xcb_set_input_focus_checked(self.connection, XCB_INPUT_FOCUS_PARENT, window, XCB_CURRENT_TIME)
+        error = self.xcb.xcb_request_check(self.connection, cookie)
+        if error:
+            # e.g. the window is not viewable
+            logging.debug("X11FocusHandler: Focusing window " + hex(window) + " failed")
+            self.libc.free(error)
+
+
+def sharedHandler():
+    # All windows share one handler, it is started with the first use
+    global handler
+    if handler is None:
+        handler = X11FocusHandler()
+        handler.daemon = True  # Daemonize thread
+        handler.start()
+    return handler
@@ -16,36 +16,71 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
-import base64
+import asyncio
 import sys
 import logging
 import random
 import string
 import tempfile
+import os
+import time
+
+import psutil
 
-import pykib_base.ui
-import pykib_base.arguments
-import pykib_base.mainWindow
 import pykib_base.remotePykibWebsocketServer
 import pykib_base.remotePykibUnixSocketServer
-
-from PyQt6.QtGui import QAction, QPixmap
+import pykib_base.remotePykibWindowPool
+import pykib_base.remotePykibInstanceRegistry
+import pykib_base.remotePykibTabHibernator
+import pykib_base.remotePykibLogging
+import pykib_base.remotePykibMoveScheduler
+import pykib_base.remotePykibRouter
+import pykib_base.remotePykibStateSnapshot
+
+try:
+    import qasync
+except ImportError:
+    qasync = None
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QAction, QBitmap, QRegion
 from PyQt6.QtWidgets import QApplication, QMenu
 
 
 #Workaround for Problem with relative File Paths
 class RemotePykib():
+    # Size of the region the mask rectangles are cut out of (QWIDGETSIZE_MAX)
+    maxMaskSize = 16777215
+
     def __init__(self, args, dirname, tray):
         self.args = args
         self.dirname = dirname
-        self.app = QApplication(sys.argv)
+        # The QApplication is created by Pykib
+        self.app = QApplication.instance()
+        self.firstTabConfigured = False
+        self.router = None
+        self.snapshot = None
+        # tabId -> {"windowId", "url", "geometry", "zoomFactor"} of the tabs restored from the state
+        # snapshot which were not shown since the restart
+        self.restoredTabs = {}
+        # Set when this daemon is a worker of a router
+        self.routerPid = int(os.environ.get("PYKIB_ROUTER_PID", 0))
         self.tray = tray
-        self.pykibInstances = {}
-        self.browserProfile = None
+        self.instances = pykib_base.remotePykibInstanceRegistry.RemotePykibInstanceRegistry(self.args.remoteBrowserKeepComposited)
+        self.windowPool = pykib_base.remotePykibWindowPool.RemotePykibWindowPool(self.args, self.dirname, self.tray,
+                                                                                 self.args.remoteBrowserWindowPoolSize,
+                                                                                 self.args.remoteBrowserPreloadTimeout)
+        self.hibernator = pykib_base.remotePykibTabHibernator.RemotePykibTabHibernator(self.instances,
+                                                                                      self.args.remoteBrowserHibernateFreezeAfter,
+                                                                                      self.args.remoteBrowserHibernateDiscardAfter,
+                                                                                      self.args.remoteBrowserMemoryBudget)
 
         self.startRemotePykib()
 
     def startRemotePykib(self):
+        # Log records are written by a listener thread, so the socket servers are not slowed down by logging
+        pykib_base.remotePykibLogging.setup(logging.getLogger().level, self.args.remoteBrowserLogRateLimit,
+                                            self.args.remoteBrowserLogRingBuffer)
         logging.info("Pykib Remote Browser Daemon Mode")
 
         self.app.setQuitOnLastWindowClosed(False)
@@ -57,6 +92,8 @@ class RemotePykib():
             "remoteBrowserMoveInterval": self.args.remoteBrowserMoveInterval,
             "remoteDaemonProtocolVersion": self.args.remoteDaemonProtocolVersion,
             "remoteBrowserPixmapMonitorInterval": self.args.remoteBrowserPixmapMonitorInterval,
+            "remoteBrowserSessionResumeGrace": self.args.remoteBrowserSessionResumeGrace,
+            "remoteBrowserPreloadTimeout": self.args.remoteBrowserPreloadTimeout,
         }
 
         # Configure a Remote Pykib Tray App
@@ -102,103 +139,255 @@ class RemotePykib():
                                                                            self.args.remoteBrowserPort)
 
         socketServer.daemon = True  # Daemonize thread
+        socketServer.listening.connect(self.serverListening)
+        self.stats = socketServer.stats
+        self.stats.startDump(self.args.remoteBrowserStatsInterval)
+        if (self.args.remoteBrowserWorkers):
+            if (self.args.remoteBrowserStateFile):
+                logging.warning("RemotePykib: --remoteBrowserStateFile is not supported with --remoteBrowserWorkers, "
+                                "no state snapshot is kept")
+            self.startRouter(socketServer)
+            sys.exit(self.execute(socketServer))
+
         socketServer.configureInstance.connect(self.configureInstance)
         socketServer.closeInstance.connect(self.closeInstance)
         socketServer.activateInstance.connect(self.activateInstance)
-        socketServer.moveInstance.connect(self.moveInstance)
         socketServer.changeTabWindow.connect(self.changeTabWindow)
-        socketServer.setPixmap.connect(self.setPixmap)
+        socketServer.preloadInstance.connect(self.preloadInstance)
+        self.moveCoalescer = socketServer.moveCoalescer
+        self.moveScheduler = pykib_base.remotePykibMoveScheduler.RemotePykibMoveScheduler(self.moveCoalescer, self.stats,
+                                                                                         self.moveInstance,
+                                                                                         self.args.remoteBrowserMoveExtrapolation)
+        self.moveCoalescer.movesPending.connect(self.moveScheduler.wake)
+        self.pixmapDecoder = socketServer.pixmapDecoder
+        self.pixmapDecoder.maskDecoded.connect(self.applyDecodedMask)
+        self.pixmapDecoder.daemon = True  # Daemonize thread
+        self.pixmapDecoder.start()
+        socketServer.setMaskRegions.connect(self.setMaskRegions)
+        socketServer.runBatch.connect(self.runBatch)
+        self.session = socketServer.session
+        self.session.suspended.connect(self.suspendSession)
+        self.session.resumed.connect(self.resumeSession)
+        self.graceTimer = QTimer()
+        self.graceTimer.setSingleShot(True)
+        self.graceTimer.timeout.connect(self.expireSession)
+        if (self.args.remoteBrowserStateFile):
+            self.startSnapshot()
+        self.hibernator.start()
+        if self.routerPid:
+            self.routerTimer = QTimer()
+            self.routerTimer.timeout.connect(self.checkRouter)
+            self.routerTimer.start(1000)
+
+        sys.exit(self.execute(socketServer))
+
+    def execute(self, socketServer):
+        # Starts the socket server and runs the event loop until the daemon quits
+        if (self.args.remoteBrowserIntegratedEventLoop):
+            if qasync is None:
+                logging.warning("RemotePykib: qasync is not installed, the socket server runs in its own thread")
+            else:
+                # The socket server runs as coroutine on the Qt event loop. Its signals are emitted in the
+                # GUI thread, so they are direct calls and every action is applied before the next one is read.
+                logging.info("RemotePykib: Socket server runs on the Qt event loop")
+                loop = qasync.QEventLoop(self.app)
+                asyncio.set_event_loop(loop)
+                self.exitCode = 0
+                with loop:
+                    self.serverTask = loop.create_task(socketServer.serve())
+                    self.serverTask.add_done_callback(self.serverFinished)
+                    loop.run_forever()
+                return self.exitCode
         socketServer.start()
-
-        sys.exit(self.app.exec())
+        return self.app.exec()
+
+    def serverFinished(self, task):
+        # The socket server only returns when it could not be started, e.g. when the socket path is in use.
+        # Without it the daemon is not reachable.
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logging.error("RemotePykib: Socket server failed: " + repr(task.exception()))
+        else:
+            logging.error("RemotePykib: Socket server stopped")
+        self.exitCode = 1
+        self.app.exit(1)
+
+    def startRouter(self, socketServer):
+        # Sharded mode, the windows are opened by worker processes. This process only keeps the socket
+        # of the connector and never loads QtWebEngine.
+        logging.info("RemotePykib: Router for " + str(self.args.remoteBrowserWorkers) + " worker processes")
+        self.router = pykib_base.remotePykibRouter.RemotePykibRouter(self.args.remoteBrowserWorkers, self.dirname,
+                                                                    sys.argv[1:], socketServer.moveCoalescer,
+                                                                    self.stats, socketServer.session)
+        # Pixmaps are forwarded undecoded
+        socketServer.pixmapDecoder = self.router
+        socketServer.configureInstance.connect(self.router.configureInstance)
+        socketServer.closeInstance.connect(self.router.closeInstance)
+        socketServer.activateInstance.connect(self.router.activateInstance)
+        socketServer.changeTabWindow.connect(self.router.changeTabWindow)
+        socketServer.preloadInstance.connect(self.router.preloadInstance)
+        socketServer.setMaskRegions.connect(self.router.setMaskRegions)
+        socketServer.runBatch.connect(self.router.runBatch)
+        self.app.aboutToQuit.connect(self.router.stop)
+
+    def startSnapshot(self):
+        self.snapshot = pykib_base.remotePykibStateSnapshot.RemotePykibStateSnapshot(self.args.remoteBrowserStateFile,
+                                                                                    self.collectSnapshotState)
+        state = self.snapshot.load()
+        if state:
+            try:
+                for tab in state["tabs"]:
+                    # Snapshots of older versions only have the session id of all tabs
+                    self.restoredTabs[int(tab["tabId"])] = {"windowId": int(tab["windowId"]), "url": tab["url"],
+                                                            "geometry": tab.get("geometry"),
+                                                            "zoomFactor": tab.get("zoomFactor", 1),
+                                                            "sessionId": tab.get("sessionId", state.get("sessionId"))}
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning("RemotePykib: Invalid state snapshot: " + str(e))
+                self.restoredTabs = {}
+            else:
+                logging.info("RemotePykib: Restored " + str(len(self.restoredTabs)) + " Tabs from " + self.args.remoteBrowserStateFile)
+                self.session.restore([(tabId, tab["windowId"], tab["url"], tab["sessionId"])
+                                      for tabId, tab in self.restoredTabs.items()])
+                # The restored tabs are kept like the tabs of lost clients, until they resume them or the grace period ends
+                if not self.session.suspend(allTabs=True):
+                    self.restoredTabs = {}
+                    self.updateSessionTabs()
+        self.snapshot.markDirty()
+        self.snapshot.startWriting()
+
+    def collectSnapshotState(self):
+        tabs = []
+        for tabId, windowId, window in self.instances.items():
+            try:
+                url = window.tabs[0]['web'].url().toString()
+            except (RuntimeError, AttributeError, IndexError, KeyError):
+                continue
+            geometry, zoomFactor = getattr(window, 'remoteGeometry', (None, 1))
+            tabs.append({"tabId": tabId, "windowId": windowId, "url": url, "geometry": geometry, "zoomFactor": zoomFactor,
+                         "sessionId": self.session.ownerOf(tabId)})
+        for tabId, tab in self.restoredTabs.items():
+            tabs.append(dict(tab, tabId=tabId, sessionId=self.session.ownerOf(tabId)))
+        return {"tabs": tabs}
+
+    def materializeRestoredTab(self, tabId, windowId):
+        # Opens a restored tab when it is shown for the first time after the restart
+        restoredTab = self.restoredTabs.get(tabId)
+        if restoredTab is None or restoredTab["windowId"] != windowId or tabId in self.instances:
+            return None
+        del self.restoredTabs[tabId]
+        logging.info("RemotePykib: Loading restored Tab " + str(tabId) + " " + restoredTab["url"])
+        currentView = self.windowPool.acquire(restoredTab["url"])
+        self.instances.add(windowId, tabId, currentView)
+        if restoredTab["geometry"]:
+            self.applyGeometry(currentView, restoredTab["geometry"], restoredTab["zoomFactor"])
+        return currentView
+
+    def forgetRestoredTabs(self, tabId, windowId):
+        for restoredTabId, restoredTab in list(self.restoredTabs.items()):
+            if (tabId == 0 and windowId in (0, restoredTab["windowId"])) or (tabId == restoredTabId and windowId == restoredTab["windowId"]):
+                del self.restoredTabs[restoredTabId]
+
+    def checkRouter(self):
+        if os.getppid() != self.routerPid:
+            logging.warning("RemotePykib: Router " + str(self.routerPid) + " is gone, exiting")
+            self.app.quit()
+
+    def serverListening(self):
+        logging.info("RemotePykib: Listening " + str(self.timeSinceStart()) + "ms after process start")
+        if self.router:
+            self.router.start()
+            return
+        # QtWebEngine, the browser profile and the first windows are loaded after the daemon is reachable
+        QTimer.singleShot(0, self.windowPool.fill)
+
+    def timeSinceStart(self):
+        return int((time.time() - psutil.Process(os.getpid()).create_time()) * 1000)
 
     def configureInstance(self, tabId, windowId, url):
         logging.info("RemotePykib:")
+        self.restoredTabs.pop(tabId, None)
 
-        #Create Window Array if not exist
-        if windowId in self.pykibInstances:
-            logging.info("  Instance exists: " + str(windowId))
-        else:
-            logging.info("  Create new Instance: " + str(windowId))
-            self.pykibInstances[windowId] = {}
+        # Tab ids are unique, a known tab reported for another window was moved there
+        if (tabId in self.instances and self.instances.windowOf(tabId) != windowId):
+            self.instances.move(tabId, windowId)
 
-        if(tabId in self.pykibInstances[windowId] and self.pykibInstances[windowId][tabId] and self.pykibInstances[windowId][tabId].tabs[0]['web']):
+        currentView = self.instances.get(tabId, windowId)
+        if(currentView and currentView.tabs[0]['web']):
             logging.info("  Tab found, set as CurrentView:"+str(tabId))
             logging.info("    TabID: " + str(tabId))
             logging.info("    WindowID: " + str(windowId))
-            currentView = self.pykibInstances[windowId][tabId]
             try:
-                self.loadInCurrentTab(currentView, url)
+                # A new url is loaded, the scroll position of a hibernated tab is obsolete
+                self.hibernator.wake(tabId)
+                preloadedView = self.windowPool.takePreload(url)
+                if preloadedView:
+                    logging.info("    Adopting preloaded window")
+                    shown = self.instances.isShown(tabId) and currentView.isVisible()
+                    # Removing unparks the window, so its geometry is the position on the screen
+                    self.instances.remove(tabId)
+                    self.adoptWindowState(currentView, preloadedView)
+                    self.closeCurrentTab(currentView)
+                    currentView = preloadedView
+                    self.instances.add(windowId, tabId, currentView)
+                    if shown:
+                        self.instances.showTab(tabId)
+                else:
+                    self.loadInCurrentTab(currentView, url)
             except:
                 logging.info("    Tab should be available but is not. May be closed manually. creating new: " + str(tabId))
-                self.args.url = [url]
-                if self.browserProfile:
-                    currentView = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray, self.browserProfile)
-                else:
-                    currentView = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray)
-                    self.browserProfile = currentView.browserProfile
-                self.pykibInstances[windowId][tabId] = currentView
+                currentView = self.windowPool.acquire(url)
+                self.instances.add(windowId, tabId, currentView)
         else:
             logging.info("  Tab not found, create new an set as CurrentView:" + str(tabId))
             logging.info("    TabID: " + str(tabId))
             logging.info("    WindowID: " + str(windowId))
-            self.args.url = [url]
-            if self.browserProfile:
-                currentView = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray,
-                                                               self.browserProfile)
-            else:
-                currentView = pykib_base.mainWindow.MainWindow(self.args, self.dirname, None, self.tray)
-                self.browserProfile = currentView.browserProfile
-            self.pykibInstances[windowId][tabId] = currentView
-
-        for key in self.pykibInstances[windowId]:
-            if(key != tabId):
-                logging.info("  Hiding Tabs with:")
-                logging.info("    TabID: " + str(key))
-                logging.info("    WindowID: " + str(windowId))
-                self.pykibInstances[windowId][key].hide()
+            currentView = self.windowPool.acquire(url)
+            self.instances.add(windowId, tabId, currentView)
 
         logging.info("  Showing CurrenView")
         logging.info("------------------------------------------------------------")
-        currentView.show()
+        self.instances.activate(windowId, tabId)
+        self.hibernator.touch(tabId)
+        self.session.reclaim(tabId)
+        self.updateSessionTabs()
+
+        if not self.firstTabConfigured:
+            self.firstTabConfigured = True
+            logging.info("RemotePykib: First tab shown " + str(self.timeSinceStart()) + "ms after process start")
 
     def closeInstance(self, tabId, windowId):
         logging.info("RemotePykib:")
         try:
+            self.forgetRestoredTabs(tabId, windowId)
+            # Closed windows may be handed out again by the pool, so they are unregistered first
             if(tabId == 0 and windowId == 0):
                 logging.info("  Closing All Tabs")
-                try:
-                    for window in self.pykibInstances:
-                        try:
-                            for tab in self.pykibInstances[window]:
-                                try:
-                                    self.closeCurrentTab(self.pykibInstances[window][tab])
-                                except Exception as f:
-                                    logging.debug(f)
-                        except Exception as i:
-                            logging.warning(i)
-                except Exception as e:
-                    logging.warning(e)
-                self.pykibInstances = {}
+                closedWindows = self.instances.removeAll()
             elif(tabId == 0):
                 logging.info("  Closing All Tabs:")
                 logging.info("    WindowID: " + str(windowId))
-                try:
-                    for tab in self.pykibInstances[windowId]:
-                        logging.info("      Tab closed: " + str(tab))
-                        self.closeCurrentTab(self.pykibInstances[windowId][tab])
-                except Exception as e:
-                    logging.warning(e)
-            elif (tabId in self.pykibInstances[windowId]):
+                closedWindows = self.instances.removeWindow(windowId)
+            elif (self.instances.get(tabId, windowId)):
                 logging.info("  Closing Tabs:")
                 logging.info("    TabID: " + str(tabId))
                 logging.info("    WindowID: " + str(windowId))
-                self.closeCurrentTab(self.pykibInstances[windowId][tabId])
-                #self.pykibInstances[windowId][tabId].close()
-                #del self.pykibInstances[windowId][tabId]
+                closedWindows = [self.instances.remove(tabId)]
+            else:
+                closedWindows = []
+
+            for closedTabId in [closedTabId for closedTabId in self.hibernator.lastUsed if closedTabId not in self.instances]:
+                self.hibernator.forget(closedTabId)
+            for closedWindow in closedWindows:
+                try:
+                    self.closeCurrentTab(closedWindow)
+                except Exception as e:
+                    logging.debug(e)
         except Exception as e:
             logging.warning(e)
             return False
+        self.updateSessionTabs()
         logging.info("------------------------------------------------------------")
 
     def activateInstance(self, tabId, windowId):
@@ -207,50 +396,63 @@ class RemotePykib():
         logging.info("    TabID: " + str(tabId))
         logging.info("    WindowID: " + str(windowId))
 
-        try:
-            for tab in self.pykibInstances[windowId]:
-                if (tab != tabId):
-                    logging.info("  Hiding Tabs with:")
-                    logging.info("    TabID: " + str(tab))
-                    logging.info("    WindowID: " + str(windowId))
-                    try:
-                        self.pykibInstances[windowId][tab].hide()
-                    except Exception as e:
-                        logging.info("  Error, Tab not found")
-
-            if (tabId in self.pykibInstances[windowId]):
-                logging.info("      Tab found. Show Tab")
-                self.pykibInstances[windowId][tabId].show()
-            else:
-                logging.info("      Tab not found - Nothing to bring in Front.")
-
-        except Exception as e:
-            logging.error(e)
+        # Moving tabs of the window which are hidden now must not be shown by their next move
+        self.moveCoalescer.discardWindow(windowId, tabId)
+        self.moveScheduler.discardWindow(windowId, tabId)
+        self.materializeRestoredTab(tabId, windowId)
+        if not self.instances.hasWindow(windowId):
             logging.info("  Error, WindowID not configured")
+        elif (self.instances.activate(windowId, tabId)):
+            logging.info("      Tab found. Show Tab")
+            self.hibernator.restore(tabId)
+        else:
+            logging.info("      Tab not found - Nothing to bring in Front.")
+        if self.snapshot:
+            self.snapshot.markDirty()
         logging.info("------------------------------------------------------------")
 
     def moveInstance(self, tabId, windowId, geometry, zoomFactor = 1):
-        logging.debug("RemotePykib:")
-        logging.debug("  Moving/Resizing Tab")
-        logging.debug("    TabID: " + str(tabId))
-        logging.debug("    WindowID: " + str(windowId))
+        currentView = self.instances.get(tabId, windowId) or self.materializeRestoredTab(tabId, windowId)
+        if not currentView:
+            logging.debug("RemotePykib moveTab tabId=%s windowId=%s not found", tabId, windowId, extra={"action": "moveTab"})
+            return
         try:
-            if(tabId in self.pykibInstances[windowId]):
-                logging.debug("      Tab found. Moving/Resizing")
-                if(self.args.ignoreSystemDpiSettings == True):
-                    self.args.setZoomFactor = zoomFactor * 100
-                    dpi = 1
-                else:
-                    dpi = self.pykibInstances[windowId][tabId].devicePixelRatio()
-                logging.debug(geometry)
-                logging.debug(self.args.screenOffsetLeft)
-                self.pykibInstances[windowId][tabId].setGeometry(int(geometry[0] / dpi + self.args.screenOffsetLeft), int(geometry[1] / dpi), int(geometry[2] / dpi), int(geometry[3] / dpi))
-                self.pykibInstances[windowId][tabId].show()
-            else:
-                logging.debug("      Tab not found.")
+            logging.debug("RemotePykib moveTab tabId=%s windowId=%s geometry=%s offset=%s", tabId, windowId, geometry,
+                          self.args.screenOffsetLeft, extra={"action": "moveTab"})
+            self.applyGeometry(currentView, geometry, zoomFactor)
+            self.instances.showTab(tabId)
+            self.hibernator.restore(tabId)
         except Exception as e:
             logging.info(e)
-            logging.info("  Error, WindowID not found")
+            logging.info("  Error, Tab not available")
+        if self.snapshot:
+            self.snapshot.markDirty()
+
+    def applyGeometry(self, currentView, geometry, zoomFactor):
+        if(self.args.ignoreSystemDpiSettings == True):
+            self.args.setZoomFactor = zoomFactor * 100
+            dpi = 1
+        else:
+            dpi = currentView.devicePixelRatio()
+        currentView.setGeometry(int(geometry[0] / dpi + self.args.screenOffsetLeft), int(geometry[1] / dpi), int(geometry[2] / dpi), int(geometry[3] / dpi))
+        # Kept for the state snapshot
+        currentView.remoteGeometry = (list(geometry), zoomFactor)
+
+    def adoptWindowState(self, currentView, preloadedView):
+        # The preloaded window replaces the window of the tab with its geometry, zoom and mask
+        preloadedView.setGeometry(currentView.geometry())
+        preloadedView.remoteGeometry = getattr(currentView, 'remoteGeometry', (None, 1))
+        preloadedView.tabs[0]['web'].setZoomFactor(currentView.tabs[0]['web'].zoomFactor())
+        preloadedView.remoteMaskRects = list(getattr(currentView, 'remoteMaskRects', []))
+        preloadedView.remoteMaskDigest = getattr(currentView, 'remoteMaskDigest', None)
+        if currentView.mask().isEmpty():
+            preloadedView.clearMask()
+        else:
+            preloadedView.setMask(currentView.mask())
+
+    def preloadInstance(self, url, windowId=0):
+        logging.debug("RemotePykib preloadTab url=%s", url, extra={"action": "preloadTab"})
+        self.windowPool.preload(url)
 
     def changeTabWindow(self, tabId, oldWindowId, newWindowId):
         logging.info("RemotePykib:")
@@ -258,45 +460,124 @@ class RemotePykib():
         logging.info("    TabID: " + str(tabId))
         logging.info("    oldWindowId: " + str(oldWindowId))
         logging.info("    newWindowId: " + str(newWindowId))
-        try:
-            if(tabId in self.pykibInstances[oldWindowId]):
-                logging.debug("      Tab found. Move to new Window")
-                try:
-                    # Array for newWindowId found
-                    self.pykibInstances[newWindowId]
-                except:
-                    # No Array for newWindowId exist, creating one
-                    self.pykibInstances[newWindowId] = {}
-
-                #Move Tab from old to new Window Id
-                self.pykibInstances[newWindowId][tabId] = self.pykibInstances[oldWindowId][tabId]
-                del self.pykibInstances[oldWindowId][tabId]
-            else:
-                logging.info("      Tab not found.")
-        except Exception as e:
-            logging.info(e)
+        if(self.instances.get(tabId, oldWindowId)):
+            logging.debug("      Tab found. Move to new Window")
+            self.instances.move(tabId, newWindowId)
+            self.updateSessionTabs()
+        elif(tabId in self.restoredTabs and self.restoredTabs[tabId]["windowId"] == oldWindowId):
+            logging.debug("      Restored Tab found. Move to new Window")
+            self.restoredTabs[tabId]["windowId"] = newWindowId
+            self.updateSessionTabs()
+        else:
+            logging.info("      Tab not found.")
 
+    def suspendSession(self, tabIds):
+        logging.info("RemotePykib:")
+        logging.info("  Client lost - Hiding " + str(len(tabIds)) + " Tabs for " + str(self.session.resumeGrace) + "s")
+        logging.info("------------------------------------------------------------")
+        for tabId in tabIds:
+            windowId = self.instances.windowOf(tabId)
+            if windowId is None:
+                continue
+            self.moveCoalescer.discardWindow(windowId)
+            self.moveScheduler.discardWindow(windowId)
+            self.instances.hideTab(tabId)
+        self.scheduleSessionExpiry()
+
+    def resumeSession(self):
+        logging.info("RemotePykib: Session resumed")
+        self.scheduleSessionExpiry()
+
+    def scheduleSessionExpiry(self):
+        # The timer runs until the grace period of the next suspended session ends
+        expiry = self.session.nextExpiry()
+        if expiry is None:
+            self.graceTimer.stop()
+        else:
+            self.graceTimer.start(expiry)
 
-    def setPixmap(self, tabId, pixmapData):
+    def expireSession(self):
         logging.info("RemotePykib:")
-        logging.info("  Apply Pixmap")
-        logging.info("    TabID: " + str(tabId))
-        try:
-            for pykibInstance in self.pykibInstances:
-                if(tabId in self.pykibInstances[pykibInstance]):
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(base64.b64decode(pixmapData))
-                    if 0 in self.pykibInstances[pykibInstance][tabId].tabs:
-                        self.pykibInstances[pykibInstance][tabId].setMask(pixmap.mask())
-                        self.pykibInstances[pykibInstance][tabId].mask()
+        logging.info("  Session resume grace period ended")
+        for tabId in self.session.expire():
+            if tabId in self.instances:
+                self.closeInstance(tabId, self.instances.windowOf(tabId))
+            elif tabId in self.restoredTabs:
+                self.closeInstance(tabId, self.restoredTabs[tabId]["windowId"])
+        self.scheduleSessionExpiry()
+
+    def updateSessionTabs(self):
+        tabs = []
+        for tabId, windowId, window in self.instances.items():
+            try:
+                url = window.tabs[0]['web'].url().toString()
+            except (RuntimeError, AttributeError, IndexError, KeyError):
+                # Window was deleted, e.g. closed by the user with the context menu
+                url = ""
+            tabs.append((tabId, windowId, url))
+        # Restored tabs are reported to resuming clients before they are loaded
+        for tabId, restoredTab in self.restoredTabs.items():
+            tabs.append((tabId, restoredTab["windowId"], restoredTab["url"]))
+        self.session.updateTabs(tabs)
+        if self.snapshot:
+            self.snapshot.markDirty()
 
+    def setPixmap(self, tabId, pixmapData):
+        # Decoding happens on the pixmap decoder thread, the mask is applied by applyDecodedMask
+        self.pixmapDecoder.push(tabId, pixmapData)
+
+    def applyDecodedMask(self, tabId, digest, mask, receivedAt):
+        self.stats.applied('setPixmap', receivedAt)
+        currentView = self.instances.get(tabId)
+        if not currentView:
+            return
+        # Clients resend the same pixmap regularly, an unchanged mask is not applied again
+        if getattr(currentView, 'remoteMaskDigest', None) == digest:
+            logging.debug("RemotePykib setPixmap tabId=%s unchanged", tabId, extra={"action": "setPixmap"})
+            return
+        logging.info("RemotePykib setPixmap tabId=%s", tabId, extra={"action": "setPixmap"})
+        try:
+            if 0 in currentView.tabs:
+                currentView.setMask(QBitmap.fromImage(mask))
+                currentView.remoteMaskRects = []
+                currentView.remoteMaskDigest = digest
         except Exception as e:
             logging.info(e)
 
+    def setMaskRegions(self, tabId, rects, removeRects=(), delta=False):
+        logging.debug("RemotePykib setMaskRegions tabId=%s", tabId, extra={"action": "setMaskRegions"})
+        currentView = self.instances.get(tabId)
+        if not currentView:
+            return
+        if delta:
+            previousRects = getattr(currentView, 'remoteMaskRects', [])
+            maskRects = [rect for rect in previousRects if rect not in removeRects] + list(rects)
+        else:
+            maskRects = list(rects)
+        currentView.remoteMaskRects = maskRects
+        currentView.remoteMaskDigest = None
+
+        if not maskRects:
+            currentView.clearMask()
+            return
+        # The rectangles are cut out of a region larger than any window, so resizing the
+        # window never clips the page
+        region = QRegion(0, 0, self.maxMaskSize, self.maxMaskSize)
+        for rect in maskRects:
+            region = region.subtracted(QRegion(*rect))
+        currentView.setMask(region)
+
+    def runBatch(self, commands):
+        # Applies all actions of a batch message in one pass
+        logging.debug("RemotePykib batch with %s actions", len(commands))
+        for command, arguments in commands:
+            try:
+                getattr(self, command)(*arguments)
+            except Exception as e:
+                logging.warning(e)
 
     def loadInCurrentTab(self, mainWindow, url):
         mainWindow.tabs[0]['web'].load(url)
 
     def closeCurrentTab(self, mainWindow):
-        mainWindow.tabs[0]['web'].close()
-        mainWindow.close()
+        self.windowPool.release(mainWindow)
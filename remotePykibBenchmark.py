@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Synthetic load generator for the remote browser daemon.
+#
+# Acts as a connector client over the unix socket or the websocket. The daemon is started with the offscreen
+# Qt platform unless --noDaemon is set, the tabs load pages of a local HTTP fixture server, so the benchmark
+# runs offline. After registering, every window gets its tabs with setTab. For --duration seconds the active
+# tab of every window is dragged with moveTab, pixmaps are sent, keep alives are sent and tabs are closed and
+# opened again, each at its own interval (0 disables it).
+#
+# Every message carries a requestId, so the round trip latency of each action is measured from the replies.
+# Messages without a reply after --replyTimeout ms are counted as dropped. The report contains the client
+# latency percentiles, the throughput, the daemon side latencies of getStats and the RSS of the daemon
+# including its renderer processes.
+#
+#   QT_QPA_PLATFORM=offscreen python3 remotePykibBenchmark.py -t unix -pm binary -w 2 -tb 3 -d 20
+
+import argparse
+import asyncio
+import base64
+import http.server
+import json
+import os
+import random
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import psutil
+
+from pykib_base.remotePykibClient import UnixSocketTransport, WebsocketTransport
+
+dirname = os.path.dirname(os.path.abspath(__file__))
+
+
+def getArguments():
+    parser = argparse.ArgumentParser(description="Synthetic load generator and latency benchmark for the remote browser daemon")
+    parser.add_argument("-t", "--transport", dest="transport", choices=['unix', 'websocket'], default='unix',
+                        help="Transport used to connect to the daemon - Default unix")
+    parser.add_argument("-pm", "--protocolMode", dest="protocolMode", choices=['json', 'binary'], default='json',
+                        help="Protocol mode requested with register - Default json")
+    parser.add_argument("-sp", "--socketPath", dest="socketPath",
+                        default=os.path.join(tempfile.gettempdir(), "pykibBenchmark.sock"),
+                        help="Path of the unix socket - Default <tempdir>/pykibBenchmark.sock")
+    parser.add_argument("-p", "--port", dest="port", type=int, default=18765,
+                        help="Port of the websocket - Default 18765")
+    parser.add_argument("-st", "--sessionToken", dest="sessionToken", default=None,
+                        help="Session token of the websocket daemon")
+    parser.add_argument("-nd", "--noDaemon", dest="noDaemon", action='store_true',
+                        help="Connect to a running daemon instead of starting one")
+    parser.add_argument("-dp", "--daemonPid", dest="daemonPid", type=int, default=0,
+                        help="Process id of a running daemon, used for the RSS with --noDaemon")
+    parser.add_argument("-da", "--daemonArguments", dest="daemonArguments", default="",
+                        help="Additional arguments for the started daemon")
+    parser.add_argument("-w", "--windows", dest="windows", type=int, default=2,
+                        help="Number of windows - Default 2")
+    parser.add_argument("-tb", "--tabs", dest="tabs", type=int, default=3,
+                        help="Number of tabs per window - Default 3")
+    parser.add_argument("-d", "--duration", dest="duration", type=int, default=10,
+                        help="Duration of the load phase in seconds - Default 10")
+    parser.add_argument("-mi", "--moveInterval", dest="moveInterval", type=int, default=50,
+                        help="Interval in ms of the moveTab messages per window - Default 50")
+    parser.add_argument("-pi", "--pixmapInterval", dest="pixmapInterval", type=int, default=1000,
+                        help="Interval in ms of the setPixmap messages per window - Default 1000")
+    parser.add_argument("-kai", "--keepAliveInterval", dest="keepAliveInterval", type=int, default=1000,
+                        help="Interval in ms of the keepAlive messages - Default 1000")
+    parser.add_argument("-ci", "--churnInterval", dest="churnInterval", type=int, default=2000,
+                        help="Interval in ms in which a tab is closed and opened again - Default 2000")
+    parser.add_argument("-rt", "--replyTimeout", dest="replyTimeout", type=int, default=2000,
+                        help="Time in ms after which a message without reply is counted as dropped - Default 2000")
+    parser.add_argument("-o", "--output", dest="output", default=None,
+                        help="Write the report as json to this file")
+    return parser.parse_args()
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    # Serves a small page for every path, so tabs load without network access
+    def do_GET(self):
+        body = ("<html><head><title>" + self.path + "</title></head><body style='background:#eee'>"
+                "<h1>pykib benchmark " + self.path + "</h1>" + "<p>Lorem ipsum dolor sit amet.</p>" * 200 +
+                "</body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def startFixtureServer():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "http://127.0.0.1:" + str(server.server_address[1])
+
+
+def createPng(width, height, hole):
+    # RGBA png with an opaque rectangle on a transparent background, its alpha channel becomes the window mask
+    x, y, w, h = hole
+    opaque = b'\x00\x00\x00\x00' * width
+    rows = []
+    for row in range(height):
+        if y <= row < y + h:
+            line = bytearray(opaque)
+            line[x * 4:(x + w) * 4] = b'\xff\xff\xff\xff' * w
+            rows.append(b'\x00' + bytes(line))
+        else:
+            rows.append(b'\x00' + opaque)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) +
+            chunk(b'IEND', b''))
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def at(fraction):
+        return round(samples[min(len(samples) - 1, int(len(samples) * fraction))], 2)
+
+    return {"count": len(samples), "mean": round(sum(samples) / len(samples), 2), "p50": at(0.5),
+            "p95": at(0.95), "p99": at(0.99), "max": round(samples[-1], 2)}
+
+
+class RemotePykibBenchmark():
+    width = 800
+    height = 600
+
+    def __init__(self, args, baseUrl):
+        self.args = args
+        self.baseUrl = baseUrl
+        self.nextRequestId = 0
+        # requestId -> (action, sentAt)
+        self.pending = {}
+        self.latencies = {}
+        self.sent = {}
+        self.errors = 0
+        self.dropped = 0
+        self.rssSamples = []
+        self.tabCounter = 0
+        # windowId -> tabIds, the first one is dragged
+        self.windows = {}
+
+        if args.transport == 'unix':
+            self.connection = UnixSocketTransport(args.socketPath)
+        else:
+            self.connection = WebsocketTransport(args.port, args.sessionToken)
+
+        # A few pixmaps with different holes, so the daemon cannot serve all of them from its mask cache
+        self.pixmaps = [createPng(self.width, self.height, (50 + i * 40, 50 + i * 30, 200, 150)) for i in range(8)]
+
+    async def request(self, action, **data):
+        self.nextRequestId += 1
+        data["action"] = action
+        data["requestId"] = self.nextRequestId
+        self.pending[self.nextRequestId] = (action, time.monotonic())
+        self.sent[action] = self.sent.get(action, 0) + 1
+        await self.connection.send(data)
+
+    async def receiveReplies(self):
+        while True:
+            reply = await self.connection.receive()
+            receivedAt = time.monotonic()
+            if not isinstance(reply, dict):
+                continue
+            if "Error" in reply or "ErrorCode" in reply:
+                self.errors += 1
+            pending = self.pending.pop(reply.get("requestId"), None)
+            if pending is None:
+                continue
+            action, sentAt = pending
+            self.latencies.setdefault(action, []).append((receivedAt - sentAt) * 1000)
+            if action == 'getStats':
+                self.daemonStats = reply
+
+    async def register(self):
+        await self.connection.open()
+        register = {"action": "register", "protocolMode": self.args.protocolMode, "persistentSession": True}
+        await self.connection.send(register)
+        config = await self.connection.receive()
+        if isinstance(config, list):
+            config = config[0]
+        if config.get("ErrorCode"):
+            raise SystemExit("Register failed, wrong session token?")
+        # Messages after the register reply use the negotiated protocol mode
+        self.connection.binary = config.get("protocolMode", self.args.protocolMode) == 'binary'
+        return config
+
+    def newUrl(self, windowId):
+        self.tabCounter += 1
+        return self.baseUrl + "/window" + str(windowId) + "/tab" + str(self.tabCounter)
+
+    async def openTabs(self):
+        for windowId in range(1, self.args.windows + 1):
+            self.windows[windowId] = []
+            for tab in range(self.args.tabs):
+                tabId = windowId * 1000 + tab
+                self.windows[windowId].append(tabId)
+                await self.request("setTab", tabId=tabId, windowId=windowId, url=self.newUrl(windowId))
+
+    async def every(self, interval, action, deadline):
+        # Runs action on a fixed schedule, a slow send does not shift the following ones
+        nextRun = time.monotonic()
+        while interval and nextRun < deadline:
+            await action()
+            nextRun += interval / 1000
+            await asyncio.sleep(max(0, min(nextRun, deadline) - time.monotonic()))
+
+    async def drag(self, windowId, deadline):
+        step = 0
+
+        async def move():
+            nonlocal step
+            step += 1
+            x = int(200 + 150 * ((step % 100) / 50 - 1) ** 2)
+            await self.request("moveTab", tabId=self.windows[windowId][0], windowId=windowId,
+                               geometry=[x + windowId * 50, 100 + step % 200, self.width, self.height], zoomFactor=1)
+
+        await self.every(self.args.moveInterval, move, deadline)
+
+    async def sendPixmaps(self, windowId, deadline):
+        async def pixmap():
+            data = random.choice(self.pixmaps)
+            # json clients send the image base64 encoded, binary clients the raw image
+            if not self.connection.binary:
+                data = base64.b64encode(data).decode()
+            await self.request("setPixmap", tabId=self.windows[windowId][0], pixmap=data)
+
+        await self.every(self.args.pixmapInterval, pixmap, deadline)
+
+    async def churn(self, deadline):
+        async def reopen():
+            windowId = random.choice(list(self.windows))
+            # The dragged tab stays open
+            tabId = random.choice(self.windows[windowId][1:] or self.windows[windowId])
+            await self.request("closeTab", tabId=tabId, windowId=windowId)
+            await self.request("setTab", tabId=tabId, windowId=windowId, url=self.newUrl(windowId))
+
+        await self.every(self.args.churnInterval, reopen, deadline)
+
+    async def sampleRss(self, process, deadline):
+        while process and time.monotonic() < deadline:
+            try:
+                processes = [process] + process.children(recursive=True)
+                self.rssSamples.append(sum(p.memory_info().rss for p in processes if p.is_running()) / 1024 / 1024)
+            except psutil.Error:
+                pass
+            await asyncio.sleep(min(1, max(0, deadline - time.monotonic())))
+
+    async def run(self, process):
+        config = await self.register()
+        receiver = asyncio.create_task(self.receiveReplies())
+        await self.openTabs()
+
+        startedAt = time.monotonic()
+        deadline = startedAt + self.args.duration
+        load = [self.every(self.args.keepAliveInterval, lambda: self.request("keepAlive"), deadline),
+                self.churn(deadline), self.sampleRss(process, deadline)]
+        for windowId in self.windows:
+            load.append(self.drag(windowId, deadline))
+            load.append(self.sendPixmaps(windowId, deadline))
+        await asyncio.gather(*load)
+        duration = time.monotonic() - startedAt
+
+        # Wait for the outstanding replies, the remaining ones are dropped
+        self.daemonStats = None
+        await self.request("getStats")
+        waitUntil = time.monotonic() + self.args.replyTimeout / 1000
+        while self.pending and time.monotonic() < waitUntil:
+            await asyncio.sleep(0.05)
+        self.dropped = len(self.pending)
+        if receiver.done():
+            # The receiver only ends with an error
+            receiver.result()
+        receiver.cancel()
+
+        for windowId in self.windows:
+            await self.connection.send({"action": "closeAllTabs", "windowId": windowId})
+        await self.connection.close()
+        return self.report(config, duration)
+
+    def report(self, config, duration):
+        sent = sum(self.sent.values())
+        replies = sum(len(samples) for samples in self.latencies.values())
+        report = {
+            "transport": self.args.transport,
+            "protocolMode": "binary" if self.connection.binary else "json",
+            "protocolVersion": config.get("remoteDaemonProtocolVersion"),
+            "windows": self.args.windows,
+            "tabs": self.args.tabs,
+            "duration": round(duration, 2),
+            "sent": self.sent,
+            "throughput": {"sent": round(sent / duration, 1), "replies": round(replies / duration, 1)},
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "latency": {action: percentiles(samples) for action, samples in sorted(self.latencies.items())},
+            "rss": {"peak": round(max(self.rssSamples), 1), "last": round(self.rssSamples[-1], 1)} if self.rssSamples else None,
+        }
+        if self.daemonStats:
+            report["daemon"] = {action: {stage: {key: histogram[key] for key in ("count", "p50", "p95", "p99", "max")}
+                                         for stage, histogram in entry["stages"].items()}
+                                for action, entry in self.daemonStats.get("actions", {}).items()}
+            report["moves"] = self.daemonStats.get("moves")
+        return report
+
+
+def printReport(report):
+    print("Remote Browser Daemon Benchmark")
+    print("  Transport: " + report["transport"] + " (" + report["protocolMode"] + "), Protocol " +
+          str(report["protocolVersion"]))
+    print("  " + str(report["windows"]) + " Windows with " + str(report["tabs"]) + " Tabs for " +
+          str(report["duration"]) + "s")
+    print("  Throughput: " + str(report["throughput"]["sent"]) + " msg/s sent, " +
+          str(report["throughput"]["replies"]) + " replies/s")
+    print("  Dropped: " + str(report["dropped"]) + ", Errors: " + str(report["errors"]))
+    if report["rss"]:
+        print("  Daemon RSS: peak " + str(report["rss"]["peak"]) + "MB, last " + str(report["rss"]["last"]) + "MB")
+    print("  Round trip latency in ms (count mean/p50/p95/p99/max):")
+    for action, latency in report["latency"].items():
+        print("    " + action + ": " + str(latency["count"]) + " " + "/".join(
+            str(latency[key]) for key in ("mean", "p50", "p95", "p99", "max")))
+    if report.get("daemon"):
+        print("  Daemon latency in ms (received until applied, p50/p95/p99/max):")
+        for action, stages in sorted(report["daemon"].items()):
+            if "total" in stages:
+                total = stages["total"]
+                print("    " + action + ": " + "/".join(str(total[key]) for key in ("p50", "p95", "p99", "max")))
+    if report.get("moves"):
+        print("  Moves: " + json.dumps(report["moves"]))
+    print("------------------------------------------------------------")
+
+
+def startDaemon(args):
+    command = [sys.executable, os.path.join(dirname, "pykib.py"), "-rbd"]
+    if args.transport == 'unix':
+        command += ["-rbsp", args.socketPath]
+    else:
+        command += ["-rbp", str(args.port)]
+        if args.sessionToken:
+            command += ["-rbst", args.sessionToken]
+    # Without keep alives the watchdog of the daemon would suspend the session
+    if not args.keepAliveInterval:
+        command += ["-rbkai", "0"]
+    command += args.daemonArguments.split()
+    environment = dict(os.environ)
+    environment.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def waitForDaemon(args, daemon, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if daemon and daemon.poll() is not None:
+            raise SystemExit("Daemon exited with " + str(daemon.returncode))
+        try:
+            if args.transport == 'unix':
+                reader, writer = await asyncio.open_unix_connection(args.socketPath)
+            else:
+                reader, writer = await asyncio.open_connection("127.0.0.1", args.port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise SystemExit("Daemon not reachable after " + str(timeout) + "s")
+
+
+async def main(args):
+    fixtureServer, baseUrl = startFixtureServer()
+    daemon = None
+    if not args.noDaemon:
+        daemon = startDaemon(args)
+    try:
+        await waitForDaemon(args, daemon)
+        process = None
+        if daemon:
+            process = psutil.Process(daemon.pid)
+        elif args.daemonPid:
+            process = psutil.Process(args.daemonPid)
+        report = await RemotePykibBenchmark(args, baseUrl).run(process)
+    finally:
+        if daemon:
+            daemon.send_signal(signal.SIGTERM)
+            try:
+                daemon.wait(10)
+            except subprocess.TimeoutExpired:
+                daemon.kill()
+        fixtureServer.shutdown()
+
+    printReport(report)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            json.dump(report, outputFile, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(getArguments()))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+from PyQt6.QtCore import QPoint, QRect
+
+from pykib_base.remotePykibInstanceRegistry import RemotePykibInstanceRegistry
+
+
+class FakeScreen():
+    def virtualGeometry(self):
+        return QRect(0, 0, 1920, 1080)
+
+
+class FakeWindow():
+    # Stands in for a MainWindow, the registry only shows, hides and moves it
+    def __init__(self, position=QPoint(10, 20)):
+        self.position = position
+        self.visible = False
+
+    def pos(self):
+        return self.position
+
+    def move(self, *position):
+        self.position = position[0] if len(position) == 1 else QPoint(*position)
+
+    def screen(self):
+        return FakeScreen()
+
+    def isVisible(self):
+        return self.visible
+
+    def show(self):
+        self.visible = True
+
+    def hide(self):
+        self.visible = False
+
+
+class RemotePykibInstanceRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = RemotePykibInstanceRegistry()
+        self.windows = {tabId: FakeWindow() for tabId in (1, 2, 3)}
+        self.registry.add(10, 1, self.windows[1])
+        self.registry.add(10, 2, self.windows[2])
+        self.registry.add(20, 3, self.windows[3])
+
+    def testLookup(self):
+        self.assertIs(self.registry.get(1), self.windows[1])
+        self.assertIs(self.registry.get(1, 10), self.windows[1])
+        self.assertIsNone(self.registry.get(1, 20))
+        self.assertEqual(self.registry.windowOf(3), 20)
+        self.assertEqual(len(self.registry), 3)
+
+    def testActivateHidesTheOtherTabsOfTheWindow(self):
+        self.assertTrue(self.registry.activate(10, 1))
+        self.assertTrue(self.registry.activate(20, 3))
+        self.assertTrue(self.registry.activate(10, 2))
+        self.assertFalse(self.windows[1].isVisible())
+        self.assertTrue(self.windows[2].isVisible())
+        self.assertTrue(self.windows[3].isVisible())
+        self.assertEqual(self.registry.activeTab(10), 2)
+
+    def testActivateTabZeroHidesTheWindow(self):
+        self.registry.activate(10, 1)
+        self.assertFalse(self.registry.activate(10, 0))
+        self.assertFalse(self.windows[1].isVisible())
+        self.assertIsNone(self.registry.activeTab(10))
+
+    def testActivateTabOfAnotherWindow(self):
+        self.assertFalse(self.registry.activate(10, 3))
+        self.assertFalse(self.windows[3].isVisible())
+
+    def testMoveKeepsShownState(self):
+        self.registry.activate(10, 1)
+        self.assertTrue(self.registry.move(1, 20))
+        self.assertEqual(self.registry.windowOf(1), 20)
+        self.assertIsNone(self.registry.activeTab(10))
+        self.registry.activate(20, 3)
+        self.assertFalse(self.windows[1].isVisible())
+
+    def testRemove(self):
+        self.registry.activate(10, 1)
+        self.assertIs(self.registry.remove(1), self.windows[1])
+        self.assertNotIn(1, self.registry)
+        self.assertIsNone(self.registry.activeTab(10))
+        self.assertEqual(len(self.registry.removeWindow(10)), 1)
+        self.assertFalse(self.registry.hasWindow(10) and self.registry.tabs(10))
+
+
+class RemotePykibInstanceRegistryParkingTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = RemotePykibInstanceRegistry(keepComposited=1)
+        self.windows = {tabId: FakeWindow() for tabId in (1, 2, 3)}
+        for tabId, window in self.windows.items():
+            self.registry.add(10, tabId, window)
+
+    def isParked(self, tabId):
+        return self.windows[tabId].isVisible() and self.windows[tabId].pos().x() > 1920
+
+    def testHiddenTabIsParked(self):
+        self.registry.activate(10, 1)
+        self.registry.activate(10, 2)
+        self.assertTrue(self.isParked(1))
+        self.assertFalse(self.isParked(2))
+
+    def testOnlyKeepCompositedTabsStayParked(self):
+        self.registry.activate(10, 1)
+        self.registry.activate(10, 2)
+        self.registry.activate(10, 3)
+        self.assertTrue(self.isParked(2))
+        # The tab parked first is hidden at its previous position
+        self.assertFalse(self.windows[1].isVisible())
+        self.assertEqual(self.windows[1].pos(), QPoint(10, 20))
+
+    def testShowingAParkedTabMovesItBack(self):
+        self.registry.activate(10, 1)
+        self.registry.activate(10, 2)
+        self.registry.activate(10, 1)
+        self.assertTrue(self.windows[1].isVisible())
+        self.assertEqual(self.windows[1].pos(), QPoint(10, 20))
+        self.assertTrue(self.isParked(2))
+
+    def testRemoveUnparks(self):
+        self.registry.activate(10, 1)
+        self.registry.activate(10, 2)
+        self.registry.remove(1)
+        self.assertFalse(self.windows[1].isVisible())
+        self.assertEqual(self.windows[1].pos(), QPoint(10, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+from pykib_base.remotePykibMoveCoalescer import RemotePykibMoveCoalescer
+
+
+class RemotePykibMoveCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = RemotePykibMoveCoalescer(50)
+
+    def testLatestMoveWins(self):
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(1, 10, [5, 5, 100, 100], 1)
+        pendingMoves = self.coalescer.takePendingMoves()
+        self.assertEqual(list(pendingMoves), [(10, 1)])
+        self.assertEqual(pendingMoves[(10, 1)][0], [5, 5, 100, 100])
+        self.assertEqual(self.coalescer.coalescedMoves, 1)
+        self.assertEqual(self.coalescer.takePendingMoves(), {})
+
+    def testMovesPendingIsEmittedOncePerTake(self):
+        emitted = []
+        self.coalescer.movesPending.connect(lambda: emitted.append(True))
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(2, 10, [0, 0, 100, 100], 1)
+        self.assertEqual(len(emitted), 1)
+        self.coalescer.takePendingMoves()
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.assertEqual(len(emitted), 2)
+
+    def testDiscardWindow(self):
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(2, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(3, 20, [0, 0, 100, 100], 1)
+        self.coalescer.discardWindow(10)
+        self.assertEqual(list(self.coalescer.takePendingMoves()), [(20, 3)])
+
+    def testDiscardWindowKeepsActivatedTab(self):
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(2, 10, [0, 0, 100, 100], 1)
+        self.coalescer.discardWindow(10, keepTabId=2)
+        self.assertEqual(list(self.coalescer.takePendingMoves()), [(10, 2)])
+
+    def testSplitBatchDropsMovesOfTabsHiddenByActivation(self):
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        commands, moves = self.coalescer.splitBatch([
+            ('moveInstance', [1, 10, [0, 0, 100, 100], 1]),
+            ('moveInstance', [2, 10, [0, 0, 100, 100], 1]),
+            ('moveInstance', [3, 20, [0, 0, 100, 100], 1]),
+            ('activateInstance', [2, 10]),
+        ])
+        self.assertEqual(commands, [('activateInstance', [2, 10])])
+        self.assertEqual([move[:2] for move in moves], [[2, 10], [3, 20]])
+        self.assertEqual(self.coalescer.takePendingMoves(), {})
+
+
+    def testSplitBatchSeparatesMoves(self):
+        commands, moves = self.coalescer.splitBatch([
+            ('configureInstance', [1, 10, 'https://example.com']),
+            ('moveInstance', [1, 10, [0, 0, 100, 100], 1]),
+            ('setPixmap', [1, 'pixmap']),
+        ])
+        self.assertEqual(commands, [('configureInstance', [1, 10, 'https://example.com']), ('setPixmap', [1, 'pixmap'])])
+        self.assertEqual(moves, [[1, 10, [0, 0, 100, 100], 1]])
+
+    def testSplitBatchKeepsMovesAfterActivation(self):
+        commands, moves = self.coalescer.splitBatch([
+            ('activateInstance', [2, 10]),
+            ('moveInstance', [1, 10, [0, 0, 100, 100], 1]),
+        ])
+        self.assertEqual(moves, [[1, 10, [0, 0, 100, 100], 1]])
+
+    def testSplitBatchHideDropsAllMovesOfWindow(self):
+        # tabId 0 hides every tab of the window
+        self.coalescer.push(1, 10, [0, 0, 100, 100], 1)
+        self.coalescer.push(3, 20, [0, 0, 100, 100], 1)
+        commands, moves = self.coalescer.splitBatch([
+            ('moveInstance', [1, 10, [0, 0, 100, 100], 1]),
+            ('moveInstance', [2, 10, [0, 0, 100, 100], 1]),
+            ('activateInstance', [0, 10]),
+        ])
+        self.assertEqual(commands, [('activateInstance', [0, 10])])
+        self.assertEqual(moves, [])
+        self.assertEqual(list(self.coalescer.takePendingMoves()), [(20, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
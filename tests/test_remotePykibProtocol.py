@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import unittest
+
+from pykib_base.remotePykibProtocol import (PROTOCOL_MODE_BINARY, PROTOCOL_MODE_JSON, ProtocolError, attachRequestId,
+                                            batchCommands, maskRegionsArguments, parseRects, validateMessage)
+
+
+class ValidateMessageTest(unittest.TestCase):
+    def testValidMessages(self):
+        validateMessage({'action': 'setTab', 'tabId': 1, 'windowId': 2, 'url': 'https://example.com'})
+        validateMessage({'action': 'moveTab', 'tabId': 1, 'windowId': 2, 'geometry': [0, 0, 100.5, 100],
+                         'zoomFactor': 1})
+        validateMessage({'action': 'keepAlive'})
+        # Actions without schema are passed to the servers
+        validateMessage({'action': 'register', 'protocolMode': 'binary'})
+
+    def testMessageIsNoMap(self):
+        with self.assertRaises(ProtocolError):
+            validateMessage(['setTab'])
+
+    def testActionMissing(self):
+        with self.assertRaises(ProtocolError):
+            validateMessage({'tabId': 1})
+        with self.assertRaises(ProtocolError):
+            validateMessage({'action': 1})
+
+    def testFieldMissing(self):
+        with self.assertRaisesRegex(ProtocolError, "url"):
+            validateMessage({'action': 'setTab', 'tabId': 1, 'windowId': 2})
+
+    def testInvalidFieldType(self):
+        with self.assertRaisesRegex(ProtocolError, "tabId"):
+            validateMessage({'action': 'setTab', 'tabId': '1', 'windowId': 2, 'url': 'https://example.com'})
+        with self.assertRaisesRegex(ProtocolError, "tabId"):
+            validateMessage({'action': 'setTab', 'tabId': True, 'windowId': 2, 'url': 'https://example.com'})
+
+    def testInvalidGeometry(self):
+        with self.assertRaises(ProtocolError):
+            validateMessage({'action': 'moveTab', 'tabId': 1, 'windowId': 2, 'geometry': [0, 0, 100],
+                             'zoomFactor': 1})
+        with self.assertRaises(ProtocolError):
+            validateMessage({'action': 'moveTab', 'tabId': 1, 'windowId': 2, 'geometry': [0, 0, 100, '100'],
+                             'zoomFactor': 1})
+
+
+class ParseRectsTest(unittest.TestCase):
+    def testFlatList(self):
+        self.assertEqual(parseRects([0, 0, 10, 20, 5, 5, 1, 1]), [(0, 0, 10, 20), (5, 5, 1, 1)])
+        self.assertEqual(parseRects([]), [])
+
+    def testIncompleteRect(self):
+        with self.assertRaises(ProtocolError):
+            parseRects([0, 0, 10])
+
+    def testInvalidValues(self):
+        with self.assertRaises(ProtocolError):
+            parseRects([0, 0, 10, 1.5])
+        with self.assertRaises(ProtocolError):
+            parseRects([0, 0, 10, True])
+        with self.assertRaises(ProtocolError):
+            parseRects("0,0,10,10")
+
+    def testMaskRegionsArguments(self):
+        self.assertEqual(maskRegionsArguments({'tabId': 1, 'regions': [0, 0, 10, 10]}),
+                         [1, [(0, 0, 10, 10)], [], False])
+        self.assertEqual(maskRegionsArguments({'tabId': 1, 'delta': True, 'add': [0, 0, 10, 10],
+                                               'remove': [5, 5, 1, 1]}),
+                         [1, [(0, 0, 10, 10)], [(5, 5, 1, 1)], True])
+
+
+class AttachRequestIdTest(unittest.TestCase):
+    def testMapReply(self):
+        self.assertEqual(attachRequestId({'status': 'ok'}, 7), {'status': 'ok', 'requestId': 7})
+
+    def testListReply(self):
+        # The id is added to the first entry, e.g. the reply of register
+        self.assertEqual(attachRequestId([{'status': 'ok'}, {'tabId': 1}], 7),
+                         [{'status': 'ok', 'requestId': 7}, {'tabId': 1}])
+
+    def testOtherReply(self):
+        self.assertEqual(attachRequestId(True, 7), {'requestId': 7, 'result': True})
+        self.assertEqual(attachRequestId([], 7), {'requestId': 7, 'result': []})
+
+
+class BatchCommandsTest(unittest.TestCase):
+    def testCommands(self):
+        commands = batchCommands([
+            {'action': 'setTab', 'tabId': 1, 'windowId': 2, 'url': 'https://example.com'},
+            {'action': 'moveTab', 'tabId': 1, 'windowId': 2, 'geometry': [0, 0, 100, 100], 'zoomFactor': 1},
+            {'action': 'moveTab', 'tabId': 1, 'windowId': 2, 'geometry': [0, -1, 100, 100], 'zoomFactor': 1},
+            {'action': 'setTabActive', 'tabId': 1, 'windowId': 2},
+            {'action': 'closeTab', 'tabId': 1, 'windowId': {'windowId': 2}},
+            {'action': 'closeAllTabs', 'windowId': 2},
+            {'action': 'preloadTab', 'url': 'https://example.com'},
+        ])
+        self.assertEqual(commands, [
+            ('configureInstance', [1, 2, 'https://example.com']),
+            ('moveInstance', [1, 2, [0, 0, 100, 100], 1.0]),
+            ('activateInstance', [0, 2]),
+            ('activateInstance', [1, 2]),
+            ('closeInstance', [1, 2]),
+            ('closeInstance', [0, 2]),
+            ('preloadInstance', ['https://example.com', 0]),
+        ])
+
+    def testBinaryModeValidatesActions(self):
+        with self.assertRaises(ProtocolError):
+            batchCommands([{'action': 'setTab', 'tabId': '1', 'windowId': '2', 'url': 'https://example.com'}],
+                          PROTOCOL_MODE_BINARY)
+
+    def testJsonModeAcceptsStringIds(self):
+        self.assertEqual(batchCommands([{'action': 'setTab', 'tabId': '1', 'windowId': '2',
+                                         'url': 'https://example.com'}], PROTOCOL_MODE_JSON),
+                         [('configureInstance', [1, 2, 'https://example.com'])])
+
+    def testJsonModeInvalidAction(self):
+        with self.assertRaises(ProtocolError):
+            batchCommands([{'tabId': 1}], PROTOCOL_MODE_JSON)
+        with self.assertRaisesRegex(ProtocolError, "invalid setTab"):
+            batchCommands([{'action': 'setTab', 'tabId': 'one', 'windowId': 2, 'url': 'https://example.com'}],
+                          PROTOCOL_MODE_JSON)
+
+    def testActionsNoList(self):
+        with self.assertRaises(ProtocolError):
+            batchCommands({'action': 'keepAlive'})
+
+    def testActionNotAllowed(self):
+        with self.assertRaisesRegex(ProtocolError, "not allowed"):
+            batchCommands([{'action': 'batch', 'actions': []}])
+
+
+if __name__ == '__main__':
+    unittest.main()
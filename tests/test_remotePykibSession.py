@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+from pykib_base.remotePykibSession import RemotePykibSession
+
+
+class RemotePykibSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.session = RemotePykibSession(10)
+        self.suspendedTabs = []
+        self.session.suspended.connect(self.suspendedTabs.append)
+        self.firstSessionId = self.session.register()
+        self.secondSessionId = self.session.register()
+        self.session.claim(1, self.firstSessionId)
+        self.session.claim(2, self.secondSessionId)
+        self.session.claim(3, None)
+        self.session.updateTabs([(1, 10, "a"), (2, 20, "b"), (3, 30, "c")])
+
+    def expireNow(self):
+        for suspendedSession in self.session.suspendedSessions.values():
+            suspendedSession[1] = 0
+        return sorted(self.session.expire())
+
+    def testRegisterReturnsNewSessionIds(self):
+        self.assertNotEqual(self.firstSessionId, self.secondSessionId)
+
+    def testSuspendOnlyAffectsTheSession(self):
+        self.assertTrue(self.session.suspend(self.firstSessionId))
+        self.assertEqual(self.suspendedTabs, [[1]])
+        self.assertEqual(self.expireNow(), [1])
+        # The other client can still resume its session
+        self.assertEqual(self.session.resume(self.secondSessionId), [{"tabId": 2, "windowId": 20, "url": "b"}])
+        self.assertIsNone(self.session.resume(self.firstSessionId))
+
+    def testSuspendAllTabs(self):
+        self.session.suspend(allTabs=True)
+        self.assertEqual(sorted(self.suspendedTabs[0]), [1, 2, 3])
+        self.session.resume(self.secondSessionId)
+        self.assertEqual(self.expireNow(), [1, 3])
+
+    def testResumeKeepsTheTabs(self):
+        self.session.suspend(self.firstSessionId)
+        self.assertEqual(self.session.resume(self.firstSessionId), [{"tabId": 1, "windowId": 10, "url": "a"}])
+        self.assertIsNone(self.session.nextExpiry())
+        self.assertEqual(self.expireNow(), [])
+
+    def testResumeWithUnknownSessionId(self):
+        self.assertIsNone(self.session.resume("unknown"))
+        self.assertIsNone(self.session.resume(None))
+
+    def testClaimedTabIsKept(self):
+        self.session.suspend(self.firstSessionId)
+        self.session.claim(1, self.secondSessionId)
+        self.assertEqual(self.expireNow(), [])
+        self.assertEqual(self.session.ownerOf(1), self.secondSessionId)
+
+    def testClaimWithoutSessionKeepsTheOwner(self):
+        self.session.claim(1, None)
+        self.assertEqual(self.session.ownerOf(1), self.firstSessionId)
+
+    def testTabsOf(self):
+        self.assertEqual(self.session.tabsOf(self.firstSessionId), [(1, 10)])
+        self.assertEqual(self.session.tabsOf(None), [(3, 30)])
+
+    def testNoGracePeriod(self):
+        session = RemotePykibSession(0)
+        self.assertFalse(session.suspend(session.register()))
+
+    def testClosedTabsAreForgotten(self):
+        self.session.suspend(self.firstSessionId)
+        self.session.updateTabs([(2, 20, "b"), (3, 30, "c")])
+        self.assertIsNone(self.session.ownerOf(1))
+        self.assertEqual(self.expireNow(), [])
+
+    def testRestore(self):
+        session = RemotePykibSession(10)
+        session.restore([(1, 10, "a", "restored"), (2, 20, "b", None)])
+        self.assertTrue(session.suspend(allTabs=True))
+        self.assertEqual(session.resume("restored"), [{"tabId": 1, "windowId": 10, "url": "a"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
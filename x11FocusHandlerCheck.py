@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# pykib - A PyQt6 based kiosk browser with a minimum set of functionality
+# Copyright (C) 2026 Tobias Wintrich
+#
+# This file is part of pykib.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Checks the X11FocusHandler against an Xvfb display.
+#
+# Xvfb is started on a free display unless --display is set. Xvfb runs without window manager, so the check
+# creates its own windows and sets _NET_ACTIVE_WINDOW of the root window itself, like a window manager would.
+# It verifies that
+#   - a focus request gives the input focus to the active window,
+#   - a burst of requests within the debounce time results in one focus change,
+#   - a cancelled request does not change the focus,
+#   - an active window that vanished does not end the handler thread.
+#
+#   python3 x11FocusHandlerCheck.py
+#   python3 x11FocusHandlerCheck.py --display :0
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from pykib_base.x11FocusHandler import X11FocusHandler, XcbCookie, XcbInternAtomReply, XcbScreenIterator
+
+# xcb constants
+XCB_WINDOW_CLASS_INPUT_OUTPUT = 1
+XCB_COPY_FROM_PARENT = 0
+XCB_PROP_MODE_REPLACE = 0
+XCB_ATOM_WINDOW = 33
+XCB_INPUT_FOCUS_POINTER_ROOT = 1
+XCB_CURRENT_TIME = 0
+
+
+class XcbGetInputFocusReply(ctypes.Structure):
+    _fields_ = [("responseType", ctypes.c_uint8), ("revertTo", ctypes.c_uint8), ("sequence", ctypes.c_uint16),
+                ("length", ctypes.c_uint32), ("focus", ctypes.c_uint32)]
+
+
+def getArguments():
+    parser = argparse.ArgumentParser(description="Checks the X11 focus handling of the remote browser daemon with Xvfb")
+    parser.add_argument("-d", "--display", dest="display", help="Use this X11 display instead of starting Xvfb")
+    parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=20,
+                        help="Number of focus requests of the burst check - Default 20")
+    return parser.parse_args()
+
+
+def freeDisplay():
+    display = 99
+    while os.path.exists("/tmp/.X11-unix/X" + str(display)) or os.path.exists("/tmp/.X" + str(display) + "-lock"):
+        display += 1
+    return ":" + str(display)
+
+
+def startXvfb():
+    if shutil.which("Xvfb") is None:
+        print("Xvfb not found, install it or use --display")
+        sys.exit(1)
+    display = freeDisplay()
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists("/tmp/.X11-unix/X" + display[1:]):
+        if process.poll() is not None or time.monotonic() > deadline:
+            print("Xvfb could not be started on " + display)
+            sys.exit(1)
+        time.sleep(0.05)
+    return display, process
+
+
+class X11Display():
+    # The window manager side of the check on its own xcb connection
+    def __init__(self):
+        xcb = ctypes.cdll.LoadLibrary(ctypes.util.find_library("xcb"))
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        self.libc.free.argtypes = [ctypes.c_void_p]
+
+        xcb.xcb_connect.restype = ctypes.c_void_p
+        xcb.xcb_connect.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.c_int)]
+        xcb.xcb_connection_has_error.argtypes = [ctypes.c_void_p]
+        xcb.xcb_disconnect.argtypes = [ctypes.c_void_p]
+        xcb.xcb_flush.argtypes = [ctypes.c_void_p]
+        xcb.xcb_get_setup.restype = ctypes.c_void_p
+        xcb.xcb_get_setup.argtypes = [ctypes.c_void_p]
+        xcb.xcb_setup_roots_iterator.restype = XcbScreenIterator
+        xcb.xcb_setup_roots_iterator.argtypes = [ctypes.c_void_p]
+        xcb.xcb_screen_next.argtypes = [ctypes.POINTER(XcbScreenIterator)]
+        xcb.xcb_generate_id.restype = ctypes.c_uint32
+        xcb.xcb_generate_id.argtypes = [ctypes.c_void_p]
+        xcb.xcb_create_window.restype = XcbCookie
+        xcb.xcb_create_window.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32,
+                                          ctypes.c_int16, ctypes.c_int16, ctypes.c_uint16, ctypes.c_uint16,
+                                          ctypes.c_uint16, ctypes.c_uint16, ctypes.c_uint32, ctypes.c_uint32,
+                                          ctypes.c_void_p]
+        xcb.xcb_map_window.restype = XcbCookie
+        xcb.xcb_map_window.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        xcb.xcb_destroy_window.restype = XcbCookie
+        xcb.xcb_destroy_window.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        xcb.xcb_change_property.restype = XcbCookie
+        xcb.xcb_change_property.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32,
+                                            ctypes.c_uint32, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_void_p]
+        xcb.xcb_set_input_focus.restype = XcbCookie
+        xcb.xcb_set_input_focus.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32]
+        xcb.xcb_get_input_focus.restype = XcbCookie
+        xcb.xcb_get_input_focus.argtypes = [ctypes.c_void_p]
+        xcb.xcb_get_input_focus_reply.restype = ctypes.POINTER(XcbGetInputFocusReply)
+        xcb.xcb_get_input_focus_reply.argtypes = [ctypes.c_void_p, XcbCookie, ctypes.POINTER(ctypes.c_void_p)]
+        xcb.xcb_intern_atom.restype = XcbCookie
+        xcb.xcb_intern_atom.argtypes = [ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint16, ctypes.c_char_p]
+        xcb.xcb_intern_atom_reply.restype = ctypes.POINTER(XcbInternAtomReply)
+        xcb.xcb_intern_atom_reply.argtypes = [ctypes.c_void_p, XcbCookie, ctypes.POINTER(ctypes.c_void_p)]
+
+        screenNumber = ctypes.c_int()
+        self.connection = xcb.xcb_connect(None, ctypes.byref(screenNumber))
+        if not self.connection or xcb.xcb_connection_has_error(self.connection):
+            raise OSError("Unable to connect to the X11 display " + os.environ.get("DISPLAY", ""))
+        screens = xcb.xcb_setup_roots_iterator(xcb.xcb_get_setup(self.connection))
+        for i in range(screenNumber.value):
+            xcb.xcb_screen_next(ctypes.byref(screens))
+        self.xcb = xcb
+        # root is the first field of xcb_screen_t
+        self.root = screens.data[0]
+
+        name = b"_NET_ACTIVE_WINDOW"
+        reply = xcb.xcb_intern_atom_reply(self.connection, xcb.xcb_intern_atom(self.connection, 0, len(name), name), None)
+        self.activeWindowAtom = reply.contents.atom
+        self.libc.free(reply)
+
+    def createWindow(self):
+        window = self.xcb.xcb_generate_id(self.connection)
+        self.xcb.xcb_create_window(self.connection, XCB_COPY_FROM_PARENT, window, self.root, 0, 0, 200, 200, 0,
+                                   XCB_WINDOW_CLASS_INPUT_OUTPUT, XCB_COPY_FROM_PARENT, 0, None)
+        self.xcb.xcb_map_window(self.connection, window)
+        self.sync()
+        return window
+
+    def destroyWindow(self, window):
+        self.xcb.xcb_destroy_window(self.connection, window)
+        self.sync()
+
+    def setActiveWindow(self, window):
+        value = ctypes.c_uint32(window)
+        self.xcb.xcb_change_property(self.connection, XCB_PROP_MODE_REPLACE, self.root, self.activeWindowAtom,
+                                     XCB_ATOM_WINDOW, 32, 1, ctypes.byref(value))
+        self.sync()
+
+    def setFocus(self, window):
+        self.xcb.xcb_set_input_focus(self.connection, XCB_INPUT_FOCUS_POINTER_ROOT, window, XCB_CURRENT_TIME)
+        self.sync()
+
+    def focus(self):
+        reply = self.xcb.xcb_get_input_focus_reply(self.connection, self.xcb.xcb_get_input_focus(self.connection), None)
+        try:
+            return reply.contents.focus
+        finally:
+            self.libc.free(reply)
+
+    def sync(self):
+        # A round trip, all former requests are processed by the server
+        self.focus()
+
+
+class CountingFocusHandler(X11FocusHandler):
+    def __init__(self):
+        super(CountingFocusHandler, self).__init__()
+        self.focusChanges = 0
+
+    def focusActiveWindow(self):
+        self.focusChanges += 1
+        super(CountingFocusHandler, self).focusActiveWindow()
+
+
+def settle(handler):
+    # Waits until the debounced request is applied
+    time.sleep(handler.debounce / 1000 + 0.25)
+
+
+def check(name, ok, detail=""):
+    print(("OK     " if ok else "FAILED ") + name + (" (" + detail + ")" if detail else ""))
+    return ok
+
+
+def main():
+    args = getArguments()
+    xvfb = None
+    if args.display:
+        os.environ["DISPLAY"] = args.display
+    else:
+        os.environ["DISPLAY"], xvfb = startXvfb()
+
+    results = []
+    try:
+        display = X11Display()
+        handler = CountingFocusHandler()
+        handler.start()
+        # Wait for the connection of the handler thread
+        deadline = time.monotonic() + 5
+        while handler.connection is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        results.append(check("Handler uses xcb", handler.xcb is not None))
+
+        firstWindow = display.createWindow()
+        secondWindow = display.createWindow()
+
+        display.setFocus(firstWindow)
+        display.setActiveWindow(secondWindow)
+        handler.requestFocus()
+        settle(handler)
+        results.append(check("Request focuses the active window", display.focus() == secondWindow,
+                             "focus " + hex(display.focus()) + ", active window " + hex(secondWindow)))
+
+        display.setFocus(firstWindow)
+        handler.focusChanges = 0
+        for i in range(args.repeat):
+            handler.requestFocus()
+            handler.cancel()
+        handler.requestFocus()
+        settle(handler)
+        results.append(check("Burst results in one focus change", handler.focusChanges == 1,
+                             str(handler.focusChanges) + " focus changes for " + str(args.repeat + 1) + " requests"))
+        results.append(check("Burst focuses the active window", display.focus() == secondWindow))
+
+        display.setFocus(firstWindow)
+        handler.focusChanges = 0
+        handler.requestFocus()
+        handler.cancel()
+        settle(handler)
+        results.append(check("Cancelled request keeps the focus",
+                             handler.focusChanges == 0 and display.focus() == firstWindow))
+
+        display.destroyWindow(secondWindow)
+        handler.requestFocus()
+        settle(handler)
+        display.setActiveWindow(firstWindow)
+        handler.requestFocus()
+        settle(handler)
+        results.append(check("Vanished active window is ignored", handler.isRunning() and display.focus() == firstWindow))
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    print(str(results.count(True)) + "/" + str(len(results)) + " checks passed")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())